@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -55,7 +57,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'management.metrics.MetricsMiddleware',
+    'management.instrumentation.QueryInstrumentationMiddleware',
+    'management.profiling.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'management.routing.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -95,6 +101,62 @@ DATABASES = {
     }
 }
 
+# DB_PROFILE=production tunes SQLite for many concurrent users:
+# - WAL lets readers carry on while one writer commits;
+# - synchronous=NORMAL is durable in WAL mode up to a power cut;
+# - connections stay open between requests (CONN_MAX_AGE) so the pragmas and
+#   page cache survive;
+# - writers start with BEGIN IMMEDIATE, so two transactions that read and then
+#   write queue on the busy timeout instead of one failing "database is locked".
+DB_PROFILE = os.environ.get("DB_PROFILE", "default")
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,       # KiB, i.e. 64 MB of page cache per connection
+    "mmap_size": 268435456,     # 256 MB
+    "busy_timeout": 20000,      # ms
+    "temp_store": "MEMORY",
+}
+
+if DB_PROFILE == "production":
+    DATABASES['default'].update({
+        'ENGINE': 'management.sqlite',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS["busy_timeout"] / 1000,
+            'init_command': ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+        },
+    })
+
+# Read replicas of 'default': DB_REPLICAS="/srv/replica1.sqlite3,/srv/replica2.sqlite3"
+# adds the aliases replica1, replica2, ... Safe-method requests read from a
+# replica no more than MAX_REPLICA_LAG seconds behind; a client that wrote
+# reads from the primary for the next REPLICA_STICKY_SECONDS (management.routing).
+DATABASE_REPLICAS = []
+for n, name in enumerate(filter(None, os.environ.get("DB_REPLICAS", "").split(",")), start=1):
+    DATABASES[f'replica{n}'] = {**DATABASES['default'], 'NAME': name.strip()}
+    DATABASE_REPLICAS.append(f'replica{n}')
+
+DATABASE_ROUTERS = ['management.routing.PrimaryReplicaRouter']
+MAX_REPLICA_LAG = 10
+REPLICA_STICKY_SECONDS = 5
+# Cache alias (see CACHES) holding which clients wrote in the last REPLICA_STICKY_SECONDS.
+REPLICA_STICKY_CACHE = "routing"
+
+
+# Django's defaults, with PBKDF2 swapped for a subclass that times every hash
+# for /metrics. It must replace the stock one: hashers are looked up by
+# algorithm name, and the last one listed with a name wins.
+PASSWORD_HASHERS = [
+    'management.hashers.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,21 +202,103 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'management.authentication.ClaimsJWTAuthentication',
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_PAGINATION_CLASS": "management.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
 }
+
+# Lists are only paginated when the client asks for it (?page_size= or ?cursor=).
+# Turn this off once the frontend reads paginated responses everywhere.
+KEYSET_PAGINATION_OPT_IN = True
 CORS_ALLOW_ALL_ORIGINS = True   
 
 
 from datetime import timedelta
 
 SIMPLE_JWT = {
-    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
+    # Access tokens are trusted without a DB lookup, so keep them short-lived;
+    # account deletion and role changes are enforced on refresh.
+    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
-}
\ No newline at end of file
+    "TOKEN_USER_CLASS": "management.authentication.ClaimsUser",
+}
+# Fan-out for /notifications/stream/. The in-memory broker only reaches
+# streams in the same process; with several ASGI workers use
+# "management.pubsub.DatabasePollingBroker".
+NOTIFICATION_BROKER = "management.pubsub.InMemoryBroker"
+
+# Serve the dashboard read endpoints from management.async_views. asgi.py
+# turns this on; WSGI deployments keep the DRF views.
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS") == "1"
+
+# Per-request SQL cost (management.instrumentation): query count and time in
+# Server-Timing headers plus a JSON line per request on the management.sql
+# logger. A query shape run more than SQL_REPEAT_THRESHOLD times in one request
+# is flagged as a likely N+1. Off unless SQL_INSTRUMENTATION=1; when off the
+# middleware unloads itself.
+SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION") == "1"
+SQL_REPEAT_THRESHOLD = 5
+
+# On-demand cProfile of single requests (management.profiling): admins send
+# "X-Profile: 1" or ?profile=1, and PROFILING_SAMPLE_RATE of all requests are
+# picked at random. Dumps go to PROFILING_DIR, newest PROFILING_KEEP kept, and
+# are summarised at /api/profiles/. Off unless PROFILING_DIR is set.
+PROFILING_DIR = os.environ.get("PROFILING_DIR") or None
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_KEEP = 200
+
+# Prometheus metrics at /metrics (management.metrics), served only to clients
+# in METRICS_ALLOWED_NETWORKS. With several worker processes set the
+# PROMETHEUS_MULTIPROC_DIR environment variable to an empty shared directory
+# before starting them; /metrics then adds up every process.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# The address checked is REMOTE_ADDR. Behind a reverse proxy on the same host
+# that is always loopback, so every client passes: set METRICS_TOKEN and give
+# Prometheus the same value as its bearer token (authorization: credentials).
+METRICS_ALLOWED_NETWORKS = ["127.0.0.1", "::1"]
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "management.sql": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Attendance percentage below which the low_attendance_alerts command warns a student.
+LOW_ATTENDANCE_THRESHOLD = 75
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Cached course/student/teacher list and detail responses (management.response_cache).
+    # Local memory is per process: with several workers on one host switch to
+    # django.core.cache.backends.filebased.FileBasedCache so invalidations reach all of them.
+    "responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "responses",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # Read-your-own-writes pins for replica routing (REPLICA_STICKY_CACHE). Every
+    # worker must see the same pins, or a client's next request on another worker
+    # reads a replica that may not have its write yet. Files are shared by the
+    # workers of one host, which is where the SQLite replicas live; across hosts
+    # use Redis or Memcached. Local memory is only safe with a single process.
+    "routing": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("REPLICA_STICKY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "attendance-db-pins")),
+    },
+}
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Student, Teacher, Course, AttendanceRecord
+from django.db import transaction
+from . import counters, rollups
+from .models import User, Student, Teacher, Course, AttendanceRecord, Term
 
 
 @admin.register(User)
@@ -27,6 +29,7 @@ class CustomUserAdmin(UserAdmin):
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ("name", "dept", "get_email")
+    list_select_related = ("user",)
     search_fields = ("name",  "dept", "user__email")
 
     @admin.display(description="Email")
@@ -40,6 +43,7 @@ class StudentAdmin(admin.ModelAdmin):
 @admin.register(Teacher)
 class TeacherAdmin(admin.ModelAdmin):
     list_display = ("id","name", "get_email")
+    list_select_related = ("user",)
 
     @admin.display(description="Email")
     def get_email(self, obj):
@@ -53,6 +57,7 @@ class TeacherAdmin(admin.ModelAdmin):
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ("name", "teacher")
+    list_select_related = ("teacher",)
     list_filter = ("teacher",)
     search_fields = ("name",)
     filter_horizontal = ("students",)
@@ -64,5 +69,30 @@ class CourseAdmin(admin.ModelAdmin):
 @admin.register(AttendanceRecord)
 class AttendanceRecordAdmin(admin.ModelAdmin):
     list_display = ("student", "course", "date", "status")
+    list_select_related = ("student", "course")
     list_filter = ("status", "date", "course")
     search_fields = ("student__name", "course__name")
+
+    # Saves reach the counters through post_save; deletes have to say so
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            obj.delete()
+            counters.track(removed=[(obj.student_id, obj.course_id, obj.status)])
+            rollups.track(removed=[(obj.course_id, obj.date, obj.status)])
+
+    def delete_queryset(self, request, queryset):
+        keys = set(queryset.values_list("student_id", "course_id", "date"))
+        with transaction.atomic():
+            queryset.delete()
+            counters.refresh((s, c) for s, c, _ in keys)
+            rollups.refresh((c, d) for _, c, d in keys)
+
+
+# -------------------------
+# Term Admin
+# -------------------------
+@admin.register(Term)
+class TermAdmin(admin.ModelAdmin):
+    list_display = ("name", "start_date", "end_date", "status", "archived_at")
+    list_filter = ("status",)
+    readonly_fields = ("status", "archived_at")
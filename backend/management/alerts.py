@@ -0,0 +1,105 @@
+"""
+Low-attendance warnings.
+
+``run`` looks at every (student, course) counter that moved since the last
+run, compares its attendance percentage with the threshold in SQL, and
+sends each student who newly fell below it one personal notification
+listing those courses. ``AttendanceCounter.low_attendance`` remembers who
+has been warned, so a student is told once per crossing; it is cleared when
+they climb back above the threshold.
+
+Notifications are written with bulk_create and bump the feed versions of
+their recipients. Streams are not pushed to from here, since the job runs
+outside the ASGI workers; DatabasePollingBroker picks the rows up.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from . import counters, feed
+from .models import AttendanceCounter, LowAttendanceRun, Notification
+
+ALERT_BATCH_SIZE = 500
+# Re-examine counters stamped a little before the last run started, in case
+# their transaction committed after it read them. Warnings are idempotent.
+LOOKBACK = timedelta(minutes=5)
+
+
+def default_threshold():
+    return getattr(settings, "LOW_ATTENDANCE_THRESHOLD", 75)
+
+
+def below(threshold):
+    """Counters whose attendance percentage is under ``threshold``; empty counters never are."""
+    attended = F("present") + F("late")
+    total = attended + F("absent") + F("unmarked")
+    return LessThan(attended * 100, total * Value(float(threshold)))
+
+
+def changed_counters(threshold, full=False):
+    """Counters to look at: all of them, or those that moved since the last comparable run."""
+    qs = AttendanceCounter.objects.all()
+    last = (
+        LowAttendanceRun.objects.filter(finished_at__isnull=False)
+        .order_by("-started_at")
+        .first()
+    )
+    # A different threshold makes every earlier verdict stale
+    if full or last is None or last.threshold != threshold:
+        return qs
+    return qs.filter(changed_at__gte=last.started_at - LOOKBACK)
+
+
+def message_for(threshold, courses):
+    listed = ", ".join(f"{name} ({percentage}%)" for name, percentage in courses)
+    return f"Your attendance is below {threshold:g}% in: {listed}."
+
+
+def run(threshold=None, full=False):
+    """Run one pass. Returns the LowAttendanceRun recording it."""
+    threshold = default_threshold() if threshold is None else threshold
+    job = LowAttendanceRun(threshold=threshold, started_at=timezone.now())
+    candidates = changed_counters(threshold, full=full)
+    condition = below(threshold)
+
+    with transaction.atomic():
+        job.checked = candidates.count()
+
+        fell = list(
+            candidates.filter(condition, low_attendance=False, student__user__isnull=False)
+            .values("pk", "student__user_id", "course__name", *counters.COUNTER_FIELDS)
+            .order_by("student__user_id", "course__name")
+        )
+        job.recovered = candidates.filter(low_attendance=True).exclude(condition).update(low_attendance=False)
+        job.fell_below = len(fell)
+
+        pks = [row["pk"] for row in fell]
+        for start in range(0, len(pks), ALERT_BATCH_SIZE):
+            AttendanceCounter.objects.filter(pk__in=pks[start:start + ALERT_BATCH_SIZE]).update(low_attendance=True)
+
+        courses = defaultdict(list)
+        for row in fell:
+            courses[row["student__user_id"]].append((row["course__name"], counters.percentage(row)))
+
+        notifications = [
+            Notification(
+                title="Low attendance",
+                message=message_for(threshold, user_courses),
+                role="none",
+                recipient_id=user_id,
+            )
+            for user_id, user_courses in courses.items()
+        ]
+        for start in range(0, len(notifications), ALERT_BATCH_SIZE):
+            batch = Notification.objects.bulk_create(notifications[start:start + ALERT_BATCH_SIZE])
+            feed.bump(batch)
+        job.notified = len(notifications)
+
+        job.finished_at = timezone.now()
+        job.save()
+    return job
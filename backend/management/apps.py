@@ -4,4 +4,9 @@ from django.apps import AppConfig
 class ManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'management'
-    verbose_name = "Attendance Management"  
+    verbose_name = "Attendance Management"
+
+    def ready(self):
+        from . import signals  # noqa: F401  registers the cache invalidation handlers
+        # Before any connection opens, so each one gets the query recorder hook
+        from . import instrumentation  # noqa: F401
@@ -0,0 +1,140 @@
+"""
+Async twins of the read-heavy dashboard endpoints.
+
+Plain Django async views using the async ORM, with the same URLs, auth,
+query parameters and JSON bodies as the DRF actions they stand in for.
+Under ASGI (``settings.ASYNC_READ_VIEWS``) urls.py routes these paths here
+instead of to the viewsets, so a request waiting on the database holds a
+coroutine rather than a worker thread.
+"""
+from functools import wraps
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import counters, feed
+from .authentication import ClaimsJWTAuthentication
+from .models import AttendanceCounter, Course, Feedback, Teacher
+from .pagination import NewestFirstPagination
+from .serializers import CourseSerializer, FeedbackSerializer, NotificationSerializer, TeacherSerializer
+
+
+def json_response(data, status=200):
+    """Render ``data`` exactly as DRF's JSONRenderer would."""
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def async_endpoint(view):
+    """GET only, authenticated from the access token like the DRF views."""
+
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await ClaimsJWTAuthentication().aauthenticate(request)
+        if user is None:
+            response = json_response({"detail": "Authentication credentials were not provided."}, status=401)
+            response["WWW-Authenticate"] = 'Bearer realm="api"'
+            return response
+        # query_params, build_absolute_uri() and friends for the paginators
+        request = Request(request)
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def paginated(request, queryset, serializer_class):
+    """Serialize ``queryset``, keyset-paginated when the client asks for it."""
+    paginator = NewestFirstPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    if page is not None:
+        data = serializer_class(page, many=True).data
+        return paginator.get_paginated_response(data).data
+    return serializer_class([row async for row in queryset], many=True).data
+
+
+@async_endpoint
+async def attendance_summary(request):
+    user = request.user
+    if user.role != "student":
+        return json_response({"detail": "Only students allowed"}, status=403)
+
+    student_id = user.student_id
+    if not student_id:
+        return json_response({"detail": "Student profile not found"}, status=404)
+
+    rows = {
+        row["course_id"]: row
+        async for row in AttendanceCounter.objects.filter(student_id=student_id).values(
+            "course_id", *counters.COUNTER_FIELDS
+        )
+    }
+    courses = [pair async for pair in Course.objects.filter(students=student_id).values_list("id", "name")]
+    return json_response(counters.summarize(rows, courses))
+
+
+@async_endpoint
+async def my_courses(request):
+    if request.user.role != "student":
+        return json_response({"detail": "Not allowed"}, status=403)
+
+    courses = CourseSerializer.setup_eager_loading(
+        Course.objects.filter(students=request.user.student_id)
+    )
+    return json_response(CourseSerializer([course async for course in courses], many=True).data)
+
+
+@async_endpoint
+async def teacher_me(request):
+    if request.user.role != "teacher":
+        return json_response({"detail": "Not allowed"}, status=403)
+
+    try:
+        teacher = await Teacher.objects.select_related("user").aget(pk=request.user.teacher_id)
+    except Teacher.DoesNotExist:
+        return json_response({"detail": "Teacher profile not found"}, status=404)
+
+    return json_response(TeacherSerializer(teacher).data)
+
+
+@async_endpoint
+async def my_notifications(request):
+    user = request.user
+
+    etag = await feed.aetag_for(user, request)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponse(status=304)
+    else:
+        qs = feed.notifications_for(user)
+        since = request.query_params.get("since")
+        if since:
+            filters = feed.parse_since(since)
+            if filters is None:
+                return json_response(
+                    {"detail": "since must be a notification id or an ISO datetime"}, status=400
+                )
+            qs = qs.filter(**filters)
+        response = json_response(await paginated(request, qs, NotificationSerializer))
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+@async_endpoint
+async def my_feedback(request):
+    user = request.user
+    if user.role == "student":
+        qs = Feedback.objects.filter(student_id=user.student_id)
+    elif user.role == "teacher":
+        qs = Feedback.objects.filter(teacher_id=user.teacher_id)
+    else:
+        qs = Feedback.objects.none()
+
+    qs = FeedbackSerializer.setup_eager_loading(qs)
+    return json_response(await paginated(request, qs, FeedbackSerializer))
@@ -0,0 +1,145 @@
+from asgiref.sync import sync_to_async
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Student, Teacher, User
+
+PROFILE_CLAIMS = ("role", "student_id", "teacher_id")
+
+
+def claims_for(user):
+    """The role and profile ids we sign into every token issued for ``user``."""
+    return {
+        "role": user.role,
+        "student_id": Student.objects.filter(user_id=user.pk).values_list("id", flat=True).first(),
+        "teacher_id": Teacher.objects.filter(user_id=user.pk).values_list("id", flat=True).first(),
+    }
+
+
+class RoleRefreshToken(RefreshToken):
+    """Refresh token carrying role/profile claims; its access tokens copy them."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in claims_for(user).items():
+            token[claim] = value
+        return token
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless request.user built from signed claims.
+
+    Exposes the same ``role``/``student_id``/``teacher_id`` attributes as
+    the User model, so views can scope queries without loading any row.
+    """
+
+    @cached_property
+    def role(self):
+        return self.token.get("role")
+
+    @cached_property
+    def student_id(self):
+        return self.token.get("student_id")
+
+    @cached_property
+    def teacher_id(self):
+        return self.token.get("teacher_id")
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticate from token claims alone, without a database hit.
+
+    Tokens issued before role claims existed fall back to the regular
+    User lookup until they expire.
+    """
+
+    def get_user(self, validated_token):
+        if "role" not in validated_token:
+            return JWTAuthentication.get_user(self, validated_token)
+        return ClaimsUser(validated_token)
+
+    async def aauthenticate(self, request, token_param=None):
+        """
+        Async counterpart of authenticate() for plain Django async views.
+
+        Reads the Bearer header, or the ``token_param`` query parameter when
+        given. Returns the user, or None when no valid token was sent.
+        """
+        try:
+            header = self.get_header(request)
+            raw = self.get_raw_token(header) if header else None
+            if raw is None and token_param:
+                raw = request.GET.get(token_param)
+            if not raw:
+                return None
+            token = self.get_validated_token(raw)
+            if "role" in token:
+                return ClaimsUser(token)
+            return await sync_to_async(self._load_user)(token)
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+
+    def _load_user(self, validated_token):
+        user = self.get_user(validated_token)
+        # student_id/teacher_id are lazy queries on User; fill them in now,
+        # since async callers cannot run queries
+        claims = claims_for(user)
+        user.student_id = claims["student_id"]
+        user.teacher_id = claims["teacher_id"]
+        return user
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh only while the account still matches the claims it was issued with.
+
+    Access tokens are short-lived and never checked against the database,
+    so this is where deleted accounts, deactivated accounts and role or
+    profile changes take effect.
+    """
+    token_class = RoleRefreshToken
+
+    default_error_messages = {
+        **TokenRefreshSerializer.default_error_messages,
+        "account_changed": "Account changed since login, please log in again.",
+    }
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        current = claims_for(user)
+        if "role" in refresh.payload:
+            if any(refresh.payload.get(claim) != current[claim] for claim in PROFILE_CLAIMS):
+                raise AuthenticationFailed(self.error_messages["account_changed"], "account_changed")
+        else:
+            # Token issued before claims existed: upgrade it in place
+            for claim, value in current.items():
+                refresh[claim] = value
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data["refresh"] = str(refresh)
+
+        return data
@@ -0,0 +1,251 @@
+"""
+Endpoint benchmarks over a generated dataset.
+
+``ENDPOINTS`` lists requests covering the routes in management/urls.py,
+each sent as a user of a sensible role; routes that would destroy the
+dataset or never return are in ``EXCLUDED`` instead, and ``uncovered()``
+names any route in neither. ``measure`` runs each request through the DRF test client and
+records its query count and p50/p95 latency; ``compare`` checks the result
+against a stored baseline.
+
+Paths and bodies are filled in from the dict ``context()`` returns.
+"""
+import datetime
+import gc
+import json
+import statistics
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import bulk, dataset
+from .authentication import RoleRefreshToken
+from .models import AttendanceRecord, Course, Feedback, Notification, PurgeJob, Term, User
+
+# (url name, method, role sending it or None, path, body or None)
+ENDPOINTS = (
+    ("api-root", "get", "admin", "/api/", None),
+    ("login", "post", None, "/api/login/", lambda ctx: {
+        "username": ctx["student_user"].username, "password": bulk.DEFAULT_PASSWORDS["student"],
+    }),
+    ("token-refresh", "post", None, "/api/token/refresh/", lambda ctx: {
+        "refresh": str(RoleRefreshToken.for_user(ctx["student_user"])),
+    }),
+    ("cache-stats", "get", "admin", "/api/cache-stats/", None),
+    ("student-list", "get", "admin", "/api/students/", None),
+    ("student-detail", "get", "admin", "/api/students/{student}/", None),
+    ("student-my-courses", "get", "student", "/api/students/my-courses/", None),
+    ("teacher-list", "get", "admin", "/api/teachers/", None),
+    ("teacher-detail", "get", "admin", "/api/teachers/{teacher}/", None),
+    ("teacher-me", "get", "teacher", "/api/teachers/me/", None),
+    ("course-list", "get", "admin", "/api/courses/", None),
+    ("course-list", "get", "teacher", "/api/courses/", None),
+    ("course-detail", "get", "teacher", "/api/courses/{course}/", None),
+    ("course-enroll-student", "post", "teacher", "/api/courses/{course}/enroll-student/", lambda ctx: {
+        "student_id": ctx["student"],
+    }),
+    # Already the roster: measures validation and the diff without changing the dataset
+    ("course-roster", "put", "teacher", "/api/courses/{course}/roster/", lambda ctx: {
+        "studentIds": ctx["roster"],
+    }),
+    ("course-roster", "patch", "teacher", "/api/courses/{course}/roster/", lambda ctx: {
+        "add": [ctx["student"]],
+    }),
+    # Unpaged, the attendance list is every visible record; time a page instead
+    ("attendance-list", "get", "admin", "/api/attendance/?page_size=100", None),
+    ("attendance-list", "get", "teacher", "/api/attendance/?page_size=100", None),
+    ("attendance-list", "get", "student", "/api/attendance/?page_size=100", None),
+    ("attendance-detail", "get", "teacher", "/api/attendance/{record}/", None),
+    ("attendance-detail", "patch", "teacher", "/api/attendance/{record}/", lambda ctx: {"status": "late"}),
+    ("attendance-bulk-create", "post", "teacher", "/api/attendance/bulk/", lambda ctx: [
+        {"studentId": sid, "courseId": ctx["course"], "date": ctx["last_date"], "status": "present"}
+        for sid in ctx["roster"]
+    ]),
+    ("attendance-export", "get", "teacher", "/api/attendance/export/?courseId={course}", None),
+    ("attendance-summary", "get", "student", "/api/attendance/summary/", None),
+    ("attendance-analytics", "get", "teacher", "/api/attendance/analytics/", None),
+    ("attendance-analytics", "get", "teacher",
+     "/api/attendance/analytics/?courseId={course}&from={first_date}&to={last_date}", None),
+    ("attendance-session-list", "get", "teacher", "/api/attendance-sessions/", None),
+    ("attendance-session-summary", "get", "student", "/api/attendance-sessions/summary/", None),
+    ("purge-job-list", "get", "admin", "/api/purge-jobs/", None),
+    ("purge-job-detail", "get", "admin", "/api/purge-jobs/{job}/", None),
+    ("profile-list", "get", "admin", "/api/profiles/", None),
+    ("term-list", "get", "admin", "/api/terms/", None),
+    ("term-detail", "get", "admin", "/api/terms/{term}/", None),
+    ("feedback-list", "get", "teacher", "/api/feedback/", None),
+    ("feedback-list", "post", "student", "/api/feedback/", lambda ctx: {
+        "course": ctx["course"], "message": "Benchmark",
+    }),
+    ("feedback-detail", "get", "teacher", "/api/feedback/{feedback}/", None),
+    ("feedback-my-feedback", "get", "student", "/api/feedback/my/", None),
+    ("notifications-list", "get", "admin", "/api/notifications/", None),
+    ("notifications-list", "get", "student", "/api/notifications/", None),
+    ("notifications-list", "post", "admin", "/api/notifications/", lambda ctx: {
+        "title": "Benchmark", "message": "Benchmark", "role": "all",
+    }),
+    ("notifications-detail", "get", "admin", "/api/notifications/{notification}/", None),
+    ("notifications-my-notifications", "get", "student", "/api/notifications/my/", None),
+)
+
+# url name -> why it is not benchmarked
+EXCLUDED = {
+    "notification-stream": "never returns; see loadtest_notification_stream",
+    "logout": "revokes the token it is sent",
+    "reset-password": "changes credentials",
+    "profile-detail": "needs a stored profile; off unless PROFILING_DIR is set",
+    "student-import-csv": "needs an upload; see import_users",
+    "teacher-import-csv": "needs an upload; see import_users",
+    "student-delete-all": "destroys the dataset",
+    "teacher-delete-all": "destroys the dataset",
+    "course-delete-all": "destroys the dataset",
+    "user-delete-all-users": "destroys the dataset",
+    "attendance-delete-all": "destroys the dataset",
+    "attendance-delete-by-course": "destroys the dataset",
+    "feedback-delete-all": "destroys the dataset",
+}
+
+
+def key(name, method, role, path):
+    """Result key, e.g. ``GET attendance-analytics?courseId,from,to as teacher``."""
+    params = ",".join(param for param, _ in parse_qsl(urlsplit(path).query))
+    return f"{method.upper()} {name}{'?' + params if params else ''} as {role or 'anonymous'}"
+
+
+def _route_names(patterns):
+    for pattern in patterns:
+        if hasattr(pattern, "url_patterns"):
+            yield from _route_names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+
+def uncovered():
+    """Named routes of management/urls.py neither benchmarked nor excluded."""
+    from . import urls
+
+    covered = {name for name, *_ in ENDPOINTS} | set(EXCLUDED)
+    return sorted(set(_route_names(urls.urlpatterns)) - covered)
+
+
+def context(prefix="synthetic"):
+    """Ids the endpoint paths and bodies refer to, picked from the dataset with ``prefix``."""
+    teacher_user = User.objects.get(username=dataset.username(prefix, "teacher", 0))
+    course = Course.objects.filter(teacher__user=teacher_user).order_by("id").first()
+    if course is None:
+        # Teachers are picked at random per course; fall back to any teacher with one
+        course = Course.objects.filter(teacher__user__username__startswith=f"{prefix}-").order_by("id").first()
+        teacher_user = course.teacher.user
+    roster = list(course.students.order_by("id").values_list("id", flat=True))
+    student = course.students.select_related("user").order_by("id").first()
+    dates = AttendanceRecord.objects.filter(course=course).order_by("date").values_list("date", flat=True)
+    last_date = dates.last() or datetime.date.today()
+    job, _ = PurgeJob.objects.get_or_create(target="courses", status=PurgeJob.DONE)
+
+    return {
+        "users": {
+            "admin": User.objects.get(username=dataset.username(prefix, "admin", 0)),
+            "teacher": teacher_user,
+            "student": student.user,
+        },
+        "student_user": student.user,
+        "student": student.id,
+        "teacher": course.teacher_id,
+        "course": course.id,
+        "roster": roster,
+        "record": AttendanceRecord.objects.filter(course=course).order_by("-date", "id").values_list("id", flat=True).first(),
+        "first_date": (last_date - datetime.timedelta(days=89)).isoformat(),
+        "last_date": last_date.isoformat(),
+        "feedback": Feedback.objects.filter(teacher_id=course.teacher_id).order_by("id").values_list("id", flat=True).first(),
+        "notification": Notification.objects.order_by("id").values_list("id", flat=True).first(),
+        "term": Term.objects.order_by("id").values_list("id", flat=True).first(),
+        "job": job.id,
+    }
+
+
+def _send(client, method, path, body):
+    response = getattr(client, method)(path, body, format="json")
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response
+
+
+def measure(ctx, iterations=20, warmup=2, endpoints=ENDPOINTS):
+    """
+    Time every endpoint. Queries are counted on the last warm-up request,
+    latencies are taken without query capture. Returns {key: result}, where
+    a result has queries, p50_ms, p95_ms and the last status code.
+    """
+    clients = {None: APIClient()}
+    for role, user in ctx["users"].items():
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RoleRefreshToken.for_user(user).access_token}")
+        clients[role] = client
+
+    results = {}
+    for name, method, role, path_template, make_body in endpoints:
+        client = clients[role]
+        path = path_template.format(**ctx)
+        queries = 0
+        for _ in range(max(warmup, 1)):
+            body = make_body(ctx) if make_body else None
+            with CaptureQueriesContext(connection) as captured:
+                response = _send(client, method, path, body)
+            queries = len(captured)
+
+        # Start every endpoint with a clean heap, so one collection does not land on another's p95
+        gc.collect()
+        latencies = []
+        for _ in range(iterations):
+            body = make_body(ctx) if make_body else None
+            began = time.perf_counter()
+            response = _send(client, method, path, body)
+            latencies.append(time.perf_counter() - began)
+
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0
+        results[key(name, method, role, path_template)] = {
+            "status": response.status_code,
+            "queries": queries,
+            "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else 0,
+            "p95_ms": round(p95 * 1000, 2),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.5, tail_tolerance=1.0, slack_ms=2.0):
+    """
+    Regressions of ``results`` against ``baseline`` (both {key: result}):
+    any extra query, a p50 more than ``tolerance`` (a fraction) above the
+    baseline's, or a p95 more than ``tail_tolerance`` above it, each plus
+    ``slack_ms``. With 20 samples the p95 is close to the slowest request,
+    so it gets the wider margin. Returns a list of messages.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {before['queries']}")
+        for stat, allowed in (("p50_ms", tolerance), ("p95_ms", tail_tolerance)):
+            limit = before[stat] * (1 + allowed) + slack_ms
+            if result[stat] > limit:
+                regressions.append(
+                    f"{name}: {stat[:3]} {result[stat]:.1f} ms, baseline {before[stat]:.1f} ms (limit {limit:.1f})"
+                )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as fileobj:
+        return json.load(fileobj)
+
+
+def save_baseline(path, baseline):
+    with open(path, "w", encoding="utf-8") as fileobj:
+        json.dump(baseline, fileobj, indent=2, sort_keys=True)
+        fileobj.write("\n")
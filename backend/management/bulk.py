@@ -0,0 +1,395 @@
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from . import counters, response_cache, rollups, terms
+from .models import AttendanceRecord, Course, Student, Teacher, User
+from .parsing import MAX_ID, query_int
+from .signals import roster_changed
+
+CHUNK_SIZE = 500
+
+
+def _parse_id(value):
+    """An id from a JSON payload: an int or a string of digits, within MAX_ID."""
+    if isinstance(value, str):
+        return query_int(value)
+    # bool is an int subclass, and int() would truncate a float
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+    return value if 0 <= value <= MAX_ID else None
+
+
+def _parse_row(item):
+    """Validate the shape of one payload row without touching the database."""
+    if not isinstance(item, dict):
+        return None, {"non_field_errors": "Expected an object"}
+
+    errors = {}
+    student_id = _parse_id(item.get("studentId"))
+    course_id = _parse_id(item.get("courseId"))
+    status = item.get("status")
+
+    if student_id is None:
+        errors["studentId"] = "A valid integer is required"
+    if course_id is None:
+        errors["courseId"] = "A valid integer is required"
+    try:
+        date = parse_date(str(item.get("date", "")))
+    except ValueError:
+        date = None
+    if date is None:
+        errors["date"] = "Date has wrong format. Use YYYY-MM-DD"
+    if status not in AttendanceRecord.STATUS_CODES:
+        errors["status"] = f'"{status}" is not a valid status'
+
+    if errors:
+        return None, errors
+    return (student_id, course_id, date, AttendanceRecord.STATUS_CODES[status]), None
+
+
+def upsert_attendance(payload, teacher_id=None):
+    """
+    Insert or overwrite attendance rows in bulk.
+
+    ``payload`` is a list of ``{studentId, courseId, date, status}`` dicts.
+    When ``teacher_id`` is given, rows for courses they do not teach are
+    rejected. Returns one outcome dict per payload row, in order.
+    """
+    results = [None] * len(payload)
+    parsed = {}
+
+    for index, item in enumerate(payload):
+        row, errors = _parse_row(item)
+        if errors:
+            results[index] = {"index": index, "outcome": "error", "errors": errors}
+        else:
+            parsed[index] = row
+
+    # Resolve every referenced id with one query per table
+    student_ids = {row[0] for row in parsed.values()}
+    course_ids = {row[1] for row in parsed.values()}
+
+    known_students = set(
+        Student.objects.filter(id__in=student_ids).values_list("id", flat=True)
+    )
+    course_teachers = dict(
+        Course.objects.filter(id__in=course_ids).values_list("id", "teacher_id")
+    )
+    enrolled = set(
+        Course.students.through.objects.filter(
+            course_id__in=course_teachers.keys(),
+            student_id__in=known_students,
+        ).values_list("course_id", "student_id")
+    )
+
+    locked = terms.locked_terms()
+
+    # Validate in memory; later rows win over earlier rows for the same key
+    accepted = {}
+    for index, (student_id, course_id, date, status) in parsed.items():
+        errors = {}
+        term = terms.locked_term(date, locked)
+        if term:
+            errors["date"] = f"{term} is archived; its attendance can no longer change"
+        if student_id not in known_students:
+            errors["studentId"] = "Student not found"
+        if course_id not in course_teachers:
+            errors["courseId"] = "Course not found"
+        elif teacher_id is not None and course_teachers[course_id] != teacher_id:
+            errors["courseId"] = "Course is not taught by you"
+        elif student_id in known_students and (course_id, student_id) not in enrolled:
+            errors["studentId"] = "Student is not enrolled in this course"
+
+        if errors:
+            results[index] = {"index": index, "outcome": "error", "errors": errors}
+            continue
+
+        key = (student_id, course_id, date)
+        if key in accepted:
+            earlier, _ = accepted[key]
+            results[earlier] = {"index": earlier, "outcome": "skipped", "supersededBy": index}
+        accepted[key] = (index, status)
+
+    items = list(accepted.items())
+
+    with transaction.atomic():
+        for start in range(0, len(items), CHUNK_SIZE):
+            chunk = items[start:start + CHUNK_SIZE]
+            _write_chunk(chunk, results)
+
+    return results
+
+
+def _write_chunk(chunk, results):
+    keys = [key for key, _ in chunk]
+
+    existing = set(
+        AttendanceRecord.objects.filter(
+            student_id__in={k[0] for k in keys},
+            course_id__in={k[1] for k in keys},
+            date__in={k[2] for k in keys},
+        ).values_list("student_id", "course_id", "date")
+    )
+
+    records = AttendanceRecord.objects.bulk_create(
+        [
+            AttendanceRecord(student_id=s, course_id=c, date=d, status=status)
+            for (s, c, d), (_, status) in chunk
+        ],
+        update_conflicts=True,
+        unique_fields=["student", "course", "date"],
+        update_fields=["status"],
+    )
+
+    for ((key, (index, _)), record) in zip(chunk, records):
+        results[index] = {
+            "index": index,
+            "id": record.pk,
+            "outcome": "updated" if key in existing else "created",
+        }
+
+    counters.refresh((s, c) for s, c, _ in keys)
+    rollups.refresh((c, d) for _, c, d in keys)
+
+
+# -------------------------
+# Roster sync
+# -------------------------
+class RosterError(Exception):
+    """Rejected roster change; ``errors`` maps payload fields to messages."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _parse_ids(value, field):
+    if not isinstance(value, list):
+        raise RosterError({field: "Expected a list of student ids"})
+    ids = [_parse_id(item) for item in value]
+    if None in ids:
+        raise RosterError({field: "Student ids must be valid integers"})
+    return set(ids)
+
+
+def sync_roster(course, student_ids=None, add=(), remove=()):
+    """
+    Change who is enrolled in ``course``: to exactly ``student_ids`` when it
+    is given, otherwise by adding ``add`` and removing ``remove``.
+
+    Every id is checked with one query, and nothing changes if any is
+    unknown. The difference with the current roster is applied with bulk
+    inserts and deletes on the enrollment table, followed by one
+    ``roster_changed`` signal instead of an m2m_changed per student.
+    Returns the sorted (added, removed) student ids.
+    """
+    if student_ids is not None:
+        desired = _parse_ids(student_ids, "studentIds")
+        add, remove = desired, set()
+        referenced = desired
+    else:
+        add, remove = _parse_ids(add, "add"), _parse_ids(remove, "remove")
+        both = add & remove
+        if both:
+            raise RosterError({"non_field_errors": f"Both added and removed: {', '.join(map(str, sorted(both)))}"})
+        referenced = add | remove
+
+    unknown = referenced - set(Student.objects.filter(id__in=referenced).values_list("id", flat=True))
+    if unknown:
+        raise RosterError({"studentIds": f"Unknown student id(s): {', '.join(map(str, sorted(unknown)))}"})
+
+    Enrollment = Course.students.through
+    with transaction.atomic():
+        current = set(Enrollment.objects.filter(course_id=course.pk).values_list("student_id", flat=True))
+        if student_ids is not None:
+            remove = current - add
+        added = sorted(add - current)
+        removed = sorted(remove & current)
+
+        Enrollment.objects.bulk_create(
+            [Enrollment(course_id=course.pk, student_id=student_id) for student_id in added],
+            batch_size=CHUNK_SIZE,
+            # Someone else may have enrolled the same student meanwhile
+            ignore_conflicts=True,
+        )
+        for start in range(0, len(removed), CHUNK_SIZE):
+            Enrollment.objects.filter(
+                course_id=course.pk, student_id__in=removed[start:start + CHUNK_SIZE]
+            ).delete()
+
+        if added or removed:
+            roster_changed.send(sender=Course, course=course, added=added, removed=removed)
+    return added, removed
+
+
+# -------------------------
+# Bulk onboarding
+# -------------------------
+IMPORT_CHUNK_SIZE = 1000
+PARALLEL_HASH_THRESHOLD = 50
+
+PROFILE_MODELS = {
+    "student": Student,
+    "teacher": Teacher,
+}
+DEFAULT_PASSWORDS = {
+    "student": "student@123",
+    "teacher": "teacher@123",
+}
+PASSWORD_MODES = ("default", "unusable")
+# read_csv key for the values of a row longer than the header; not a string,
+# so no header can clash with it
+EXTRA_FIELDS = object()
+
+
+def read_csv(fileobj):
+    """
+    Yield (line_number, row dict) pairs from an uploaded or opened CSV file.
+
+    A row with more fields than the header keeps the surplus values, as a
+    list, under EXTRA_FIELDS.
+    """
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text, restkey=EXTRA_FIELDS)
+    for row in reader:
+        extra = row.pop(EXTRA_FIELDS, None)
+        fields = {
+            (key or "").strip().lower(): (value or "").strip()
+            for key, value in row.items()
+        }
+        if extra is not None:
+            fields[EXTRA_FIELDS] = extra
+        yield reader.line_num, fields
+
+
+def _init_hash_worker():
+    django.setup()
+
+
+def hash_passwords(password, count, workers=1):
+    """
+    Hash ``password`` ``count`` times, each with its own salt.
+
+    With ``workers`` above 1, large batches are spread over a process pool,
+    since PBKDF2 is CPU bound and holds the GIL. Each pool process runs
+    django.setup() again, so only the import_users command asks for one;
+    requests hash in their own thread.
+    """
+    if workers <= 1 or count < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for _ in range(count)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_hash_worker) as pool:
+        chunksize = max(1, count // (workers * 4))
+        return list(pool.map(make_password, repeat(password, count), chunksize=chunksize))
+
+
+def import_profiles(rows, role, password_mode="default", workers=1):
+    """
+    Create users and their Student/Teacher profiles from CSV rows.
+
+    ``rows`` yields (line_number, {"name", "dept", "email"}) pairs. With
+    ``password_mode="default"`` accounts get the usual role password; with
+    ``"unusable"`` they must go through /reset-password/ before first login.
+    ``workers`` is passed on to hash_passwords. Returns one outcome dict per
+    row, in order.
+    """
+    profile_model = PROFILE_MODELS[role]
+    max_lengths = {
+        field: profile_model._meta.get_field(field).max_length
+        for field in ("name", "dept")
+    }
+
+    results = []
+    valid = []
+    seen = {}
+
+    for line, row in rows:
+        errors = {}
+        email = User.objects.normalize_email(row.get("email", ""))
+        if EXTRA_FIELDS in row:
+            results.append({
+                "line": line, "email": email, "outcome": "error",
+                "errors": {"non_field_errors": "Too many fields"},
+            })
+            continue
+        try:
+            validate_email(email)
+        except DjangoValidationError:
+            errors["email"] = "Enter a valid email address"
+        else:
+            if len(email) > User._meta.get_field("username").max_length:
+                errors["email"] = "Email is too long to be used as a username"
+        for field, max_length in max_lengths.items():
+            value = row.get(field, "")
+            if not value:
+                errors[field] = "This field is required"
+            elif len(value) > max_length:
+                errors[field] = f"Ensure this field has no more than {max_length} characters"
+        if not errors and email in seen:
+            errors["email"] = f"Duplicate of line {seen[email]}"
+
+        result = {"line": line, "email": email}
+        results.append(result)
+        if errors:
+            result.update(outcome="error", errors=errors)
+            continue
+        seen[email] = line
+        valid.append((result, email, row))
+
+    # Existing accounts, in one query
+    taken = set(
+        User.objects.filter(username__in=seen.keys()).values_list("username", flat=True)
+    )
+    pending = []
+    for result, email, row in valid:
+        if email in taken:
+            result.update(outcome="error", errors={"email": "User with this email already exists"})
+        else:
+            pending.append((result, email, row))
+
+    if password_mode == "default":
+        hashes = hash_passwords(DEFAULT_PASSWORDS[role], len(pending), workers=workers)
+    else:
+        hashes = [make_password(None) for _ in pending]
+
+    for start in range(0, len(pending), IMPORT_CHUNK_SIZE):
+        chunk = pending[start:start + IMPORT_CHUNK_SIZE]
+        _import_chunk(chunk, hashes[start:start + IMPORT_CHUNK_SIZE], role, profile_model)
+
+    # bulk_create sends no post_save
+    if pending:
+        response_cache.bump({response_cache.tag(f"{role}s", "all")})
+    return results
+
+
+def _import_chunk(chunk, hashes, role, profile_model):
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=email, email=email, password=password, role=role)
+                for (_, email, _), password in zip(chunk, hashes)
+            ])
+            profiles = profile_model.objects.bulk_create([
+                profile_model(user=user, name=row["name"], dept=row["dept"])
+                for user, (_, _, row) in zip(users, chunk)
+            ])
+    except IntegrityError:
+        # Someone registered one of these emails since we checked
+        for result, _, _ in chunk:
+            result.update(outcome="error", errors={"email": "Conflicting account created concurrently, retry this row"})
+        return
+
+    for profile, (result, _, _) in zip(profiles, chunk):
+        result.update(outcome="created", id=profile.pk)
@@ -0,0 +1,225 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import ArchivedAttendanceTotal, AttendanceCounter, AttendanceRecord
+
+COUNTER_FIELDS = ("present", "late", "absent", "unmarked")
+ATTENDED_FIELDS = ("present", "late")
+
+
+def counter_field(status):
+    """Map a record status code onto the counter column it is tallied in."""
+    return AttendanceRecord.STATUS_NAMES.get(status, "unmarked")
+
+
+def attended(row):
+    return sum(row[f] for f in ATTENDED_FIELDS)
+
+
+def total(row):
+    return sum(row[f] for f in COUNTER_FIELDS)
+
+
+def percentage(row):
+    count = total(row)
+    return round((attended(row) / count) * 100, 1) if count > 0 else 0
+
+
+def track(added=(), removed=()):
+    """
+    Apply incremental changes to the counters.
+
+    ``added`` and ``removed`` are iterables of (student_id, course_id, status code)
+    tuples describing records that were just written or deleted. A pair
+    with no counter row yet, or whose counts would go below zero, missed
+    earlier writes; it is recounted with ``refresh`` instead.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for student_id, course_id, status in added:
+        deltas[(student_id, course_id)][counter_field(status)] += 1
+    for student_id, course_id, status in removed:
+        deltas[(student_id, course_id)][counter_field(status)] -= 1
+
+    stale = []
+    with transaction.atomic():
+        for (student_id, course_id), fields in deltas.items():
+            changes = {f: F(f) + d for f, d in fields.items() if d}
+            if not changes:
+                continue
+            enough = Q(**{f"{f}__gte": -d for f, d in fields.items() if d < 0})
+            updated = AttendanceCounter.objects.filter(enough, student_id=student_id, course_id=course_id).update(
+                **changes, changed_at=timezone.now()
+            )
+            if not updated:
+                stale.append((student_id, course_id))
+        refresh(stale)
+
+
+def summarize(rows, courses):
+    """
+    Body of the student attendance summary.
+
+    ``rows`` maps course id to counter values, ``courses`` is the student's
+    (id, name) pairs in display order.
+    """
+    overall = dict.fromkeys(COUNTER_FIELDS, 0)
+    for row in rows.values():
+        for field in COUNTER_FIELDS:
+            overall[field] += row[field]
+
+    subjects = []
+    for course_id, name in courses:
+        row = rows.get(course_id)
+        subjects.append({
+            "courseId": course_id,
+            "courseName": name,
+            "percentage": percentage(row) if row else 0
+        })
+
+    return {
+        "overall": percentage(overall),
+        "subjects": subjects
+    }
+
+
+def compute(records=None):
+    """
+    Aggregate counter values straight from AttendanceRecord.
+
+    Returns a dict keyed by (student_id, course_id).
+    """
+    if records is None:
+        records = AttendanceRecord.objects.all()
+
+    rows = (
+        records.values("student_id", "course_id")
+        .annotate(
+            n_total=Count("id"),
+            n_present=Count("id", filter=Q(status=AttendanceRecord.PRESENT)),
+            n_late=Count("id", filter=Q(status=AttendanceRecord.LATE)),
+            n_absent=Count("id", filter=Q(status=AttendanceRecord.ABSENT)),
+        )
+        .order_by()
+    )
+
+    result = {}
+    for row in rows:
+        values = {
+            "present": row["n_present"],
+            "late": row["n_late"],
+            "absent": row["n_absent"],
+        }
+        values["unmarked"] = row["n_total"] - sum(values.values())
+        result[(row["student_id"], row["course_id"])] = values
+    return result
+
+
+def archived(totals=None):
+    """
+    Totals of archived terms, summed per (student_id, course_id). Counters
+    are lifetime figures, so these are added to what compute() finds.
+    """
+    if totals is None:
+        totals = ArchivedAttendanceTotal.objects.all()
+
+    rows = (
+        totals.values("student_id", "course_id")
+        .annotate(**{f"n_{field}": Sum(field) for field in COUNTER_FIELDS})
+        .order_by()
+    )
+    return {
+        (row["student_id"], row["course_id"]): {field: row[f"n_{field}"] for field in COUNTER_FIELDS}
+        for row in rows
+    }
+
+
+def lifetime(live, history):
+    """Add archived totals onto live ones, both keyed the same way."""
+    result = {key: dict(values) for key, values in live.items()}
+    for key, values in history.items():
+        row = result.setdefault(key, dict.fromkeys(COUNTER_FIELDS, 0))
+        for field in COUNTER_FIELDS:
+            row[field] += values[field]
+    return result
+
+
+def refresh(pairs):
+    """Recompute the counters of the given (student_id, course_id) pairs."""
+    pairs = set(pairs)
+    if not pairs:
+        return
+
+    scope = {
+        "student_id__in": {s for s, _ in pairs},
+        "course_id__in": {c for _, c in pairs},
+    }
+    computed = lifetime(
+        compute(AttendanceRecord.objects.filter(**scope)),
+        archived(ArchivedAttendanceTotal.objects.filter(**scope)),
+    )
+    zero = dict.fromkeys(COUNTER_FIELDS, 0)
+    now = timezone.now()
+
+    AttendanceCounter.objects.bulk_create(
+        [
+            AttendanceCounter(
+                student_id=student_id,
+                course_id=course_id,
+                changed_at=now,
+                **computed.get((student_id, course_id), zero),
+            )
+            for student_id, course_id in pairs
+        ],
+        update_conflicts=True,
+        unique_fields=["student", "course"],
+        update_fields=[*COUNTER_FIELDS, "changed_at"],
+        batch_size=500,
+    )
+
+
+def rebuild():
+    """Throw away every counter and recompute the table from scratch."""
+    computed = lifetime(compute(), archived())
+    with transaction.atomic():
+        # Keep who has already been warned, or the next alert run repeats itself
+        warned = set(AttendanceCounter.objects.filter(low_attendance=True).values_list("student_id", "course_id"))
+        AttendanceCounter.objects.all().delete()
+        AttendanceCounter.objects.bulk_create(
+            [
+                AttendanceCounter(
+                    student_id=student_id,
+                    course_id=course_id,
+                    low_attendance=(student_id, course_id) in warned,
+                    **values,
+                )
+                for (student_id, course_id), values in computed.items()
+            ],
+            batch_size=500,
+        )
+    return len(computed)
+
+
+def verify():
+    """
+    Compare stored counters with AttendanceRecord plus the archived totals.
+
+    Returns a list of (student_id, course_id, stored, expected) mismatches.
+    """
+    computed = lifetime(compute(), archived())
+    zero = dict.fromkeys(COUNTER_FIELDS, 0)
+
+    stored = {
+        (row["student_id"], row["course_id"]): {f: row[f] for f in COUNTER_FIELDS}
+        for row in AttendanceCounter.objects.values("student_id", "course_id", *COUNTER_FIELDS)
+    }
+
+    mismatches = []
+    for key in stored.keys() | computed.keys():
+        have = stored.get(key, zero)
+        want = computed.get(key, zero)
+        if have != want:
+            mismatches.append((key[0], key[1], have, want))
+    return mismatches
@@ -0,0 +1,241 @@
+"""
+Reproducible synthetic data for benchmarks.
+
+``generate`` builds users with student and teacher profiles, courses with
+enrollments, twice-weekly class meetings with attendance going back a
+number of years, one open Term per academic year, and feedback and
+notifications, all with bulk_create. The same seed and end date always
+produce the same rows.
+
+Accounts are called ``<prefix>-student<n>@example.com`` and so on, and
+log in with the usual role passwords. Counters, daily rollups and feed
+versions are brought up to date afterwards; the response cache is cleared.
+"""
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk, counters, feed, purge, response_cache, rollups
+from .models import AttendanceRecord, Course, Feedback, Notification, Student, Teacher, Term, User
+
+BATCH_SIZE = 2000
+
+# name -> arguments of generate()
+SCALES = {
+    "small": {"students": 100, "teachers": 5, "courses": 10, "years": 1},
+    "medium": {"students": 1000, "teachers": 25, "courses": 100, "years": 1},
+    "large": {"students": 10000, "teachers": 200, "courses": 1000, "years": 2},
+}
+
+DEPTS = ("CS", "Maths", "Physics", "History", "English")
+FIRST_NAMES = ("Asha", "Ben", "Chen", "Dana", "Eli", "Farah", "Gus", "Hana", "Ivan", "Jo", "Kofi", "Lena")
+LAST_NAMES = ("Ahmed", "Brown", "Costa", "Diaz", "Evans", "Fischer", "Garcia", "Ito", "Khan", "Lopez")
+FEEDBACK = ("Great class", "Too fast", "More examples please", "Clear explanations", "Could not hear")
+# Summer break: no class meetings
+BREAK_MONTHS = (7, 8)
+
+
+def username(prefix, role, n):
+    return f"{prefix}-{role}{n}@example.com"
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _batched(items, size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def exists(prefix):
+    return User.objects.filter(username__startswith=f"{prefix}-").exists()
+
+
+def remove(prefix):
+    """Delete a generated dataset and everything hanging off its users."""
+    counts = purge.run(User.objects.filter(username__startswith=f"{prefix}-"))
+    notifications, _ = Notification.objects.filter(title__startswith=f"{prefix}:").delete()
+    terms, _ = Term.objects.filter(name__startswith=f"{prefix} ").delete()
+    rollups.rebuild()
+    response_cache.clear()
+    return sum(counts.values()) + notifications + terms
+
+
+def meeting_dates(rng, start, end, per_week):
+    """Dates between ``start`` and ``end`` a course meets on, ``per_week`` weekdays a week."""
+    weekdays = set(rng.sample(range(5), per_week))
+    day = start
+    while day <= end:
+        if day.weekday() in weekdays and day.month not in BREAK_MONTHS:
+            yield day
+        day += datetime.timedelta(days=1)
+
+
+def academic_years(start, end):
+    """(name, first day, last day) of each September-June year overlapping start..end."""
+    first = start.year if start.month >= 9 else start.year - 1
+    last = end.year if end.month >= 9 else end.year - 1
+    for year in range(first, last + 1):
+        yield f"{year}-{str(year + 1)[-2:]}", datetime.date(year, 9, 1), datetime.date(year + 1, 6, 30)
+
+
+def generate(
+    students,
+    teachers,
+    courses,
+    years=1,
+    courses_per_student=4,
+    meetings_per_week=2,
+    feedback=None,
+    notifications=None,
+    seed=1,
+    end=None,
+    prefix="synthetic",
+    progress=None,
+):
+    """
+    Write one dataset. ``feedback`` and ``notifications`` default to two
+    per student. ``progress`` is called with a short message per phase.
+    Returns the number of rows created per model name.
+    """
+    rng = random.Random(seed)
+    end = end or timezone.localdate()
+    start = end - datetime.timedelta(days=365 * years - 1)
+    courses_per_student = min(courses_per_student, courses)
+    feedback = 2 * students if feedback is None else feedback
+    notifications = 2 * students if notifications is None else notifications
+    created = {}
+
+    def report(message):
+        if progress is not None:
+            progress(message)
+
+    # Every account of a role shares one hash of the role password
+    hashes = {role: make_password(password) for role, password in bulk.DEFAULT_PASSWORDS.items()}
+
+    with transaction.atomic():
+        report("users")
+        users = User.objects.bulk_create(
+            [User(username=username(prefix, "admin", 0), email=username(prefix, "admin", 0), role="admin",
+                  password=make_password(None))]
+            + [
+                User(username=username(prefix, "teacher", n), email=username(prefix, "teacher", n),
+                     role="teacher", password=hashes["teacher"])
+                for n in range(teachers)
+            ]
+            + [
+                User(username=username(prefix, "student", n), email=username(prefix, "student", n),
+                     role="student", password=hashes["student"])
+                for n in range(students)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        created["User"] = len(users)
+
+        teacher_rows = Teacher.objects.bulk_create(
+            [Teacher(user=user, name=_name(rng), dept=rng.choice(DEPTS)) for user in users[1:teachers + 1]],
+            batch_size=BATCH_SIZE,
+        )
+        student_rows = Student.objects.bulk_create(
+            [Student(user=user, name=_name(rng), dept=rng.choice(DEPTS)) for user in users[teachers + 1:]],
+            batch_size=BATCH_SIZE,
+        )
+        created["Teacher"], created["Student"] = len(teacher_rows), len(student_rows)
+
+        report("courses")
+        course_rows = Course.objects.bulk_create(
+            [
+                Course(name=f"{teacher.dept} {100 + n}", teacher=teacher)
+                for n, teacher in enumerate(rng.choice(teacher_rows) for _ in range(courses))
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        created["Course"] = len(course_rows)
+
+        rosters = {course.id: [] for course in course_rows}
+        for student in student_rows:
+            for course in rng.sample(course_rows, courses_per_student):
+                rosters[course.id].append(student.id)
+        Enrollment = Course.students.through
+        enrollments = Enrollment.objects.bulk_create(
+            [
+                Enrollment(course_id=course_id, student_id=student_id)
+                for course_id, roster in rosters.items()
+                for student_id in roster
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        created["Enrollment"] = len(enrollments)
+
+        created["Term"] = len(Term.objects.bulk_create([
+            Term(name=f"{prefix} {name}", start_date=first, end_date=last)
+            for name, first, last in academic_years(start, end)
+        ]))
+
+    report("attendance")
+    # How reliably each student turns up, so percentages spread out
+    reliability = {student.id: rng.uniform(0.55, 0.98) for student in student_rows}
+
+    def records():
+        for course in course_rows:
+            roster = rosters[course.id]
+            for date in meeting_dates(rng, start, end, meetings_per_week):
+                for student_id in roster:
+                    roll = rng.random()
+                    if roll < 0.02:
+                        code = AttendanceRecord.UNMARKED
+                    elif roll < reliability[student_id]:
+                        code = AttendanceRecord.LATE if rng.random() < 0.08 else AttendanceRecord.PRESENT
+                    else:
+                        code = AttendanceRecord.ABSENT
+                    yield AttendanceRecord(student_id=student_id, course_id=course.id, date=date, status=code)
+
+    created["AttendanceRecord"] = 0
+    for batch in _batched(records()):
+        with transaction.atomic():
+            AttendanceRecord.objects.bulk_create(batch)
+        created["AttendanceRecord"] += len(batch)
+        report(f"attendance: {created['AttendanceRecord']} record(s)")
+
+    report("feedback and notifications")
+    teacher_of = {course.id: course.teacher_id for course in course_rows}
+    enrolled = [(student_id, course_id) for course_id, roster in rosters.items() for student_id in roster]
+    with transaction.atomic():
+        rows = []
+        for _ in range(feedback if enrolled else 0):
+            student_id, course_id = rng.choice(enrolled)
+            rows.append(Feedback(
+                student_id=student_id, course_id=course_id, teacher_id=teacher_of[course_id],
+                message=rng.choice(FEEDBACK),
+            ))
+        created["Feedback"] = len(Feedback.objects.bulk_create(rows, batch_size=BATCH_SIZE))
+
+        rows = []
+        for n in range(notifications):
+            role = rng.choices(("all", "student", "teacher", "none"), weights=(2, 2, 1, 5))[0]
+            rows.append(Notification(
+                title=f"{prefix}: notice {n}",
+                message="Generated for benchmarking.",
+                role=role,
+                recipient=rng.choice(users) if role == "none" else None,
+            ))
+        created["Notification"] = 0
+        for batch in _batched(rows):
+            feed.bump(Notification.objects.bulk_create(batch))
+            created["Notification"] += len(batch)
+
+    report("counters and rollups")
+    counters.rebuild()
+    rollups.rebuild()
+    response_cache.clear()
+    return created
@@ -0,0 +1,76 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from .models import AttendanceRecord
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (output name, queryset field, optional converter)
+ATTENDANCE_COLUMNS = (
+    ("id", "id", None),
+    ("studentId", "student_id", None),
+    ("studentName", "student__name", None),
+    ("courseId", "course_id", None),
+    ("courseName", "course__name", None),
+    ("date", "date", None),
+    ("status", "status", AttendanceRecord.STATUS_NAMES.get),
+)
+
+
+class Echo:
+    """File-like object whose write() hands the line straight back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def _rows(queryset, columns):
+    rows = queryset.values_list(*(source for _, source, _ in columns)).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    converters = [(i, convert) for i, (_, _, convert) in enumerate(columns) if convert]
+    if not converters:
+        yield from rows
+        return
+    for row in rows:
+        row = list(row)
+        for i, convert in converters:
+            row[i] = convert(row[i])
+        yield row
+
+
+def iter_csv(queryset, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _, _ in columns])
+    for row in _rows(queryset, columns):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(queryset, columns):
+    names = [name for name, _, _ in columns]
+    for row in _rows(queryset, columns):
+        yield json.dumps(dict(zip(names, row)), default=str) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (iter_csv, "text/csv", "csv"),
+    "ndjson": (iter_ndjson, "application/x-ndjson", "ndjson"),
+}
+
+
+def stream_export(queryset, columns, export_format, filename):
+    """
+    Stream ``queryset`` as CSV or NDJSON without materializing it.
+
+    Rows are read as tuples in chunks of EXPORT_CHUNK_SIZE, so worker memory
+    stays flat however large the export is.
+    """
+    generate, content_type, extension = EXPORT_FORMATS[export_format]
+    # The body is produced after the view returns; read from the database
+    # the router picks for this request, not whatever it picks by then
+    queryset = queryset.using(queryset.db)
+    response = StreamingHttpResponse(generate(queryset, columns), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{extension}"'
+    return response
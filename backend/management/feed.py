@@ -0,0 +1,101 @@
+"""
+Change tracking for the notification feed.
+
+A user's feed is ``role="all" | role=<their role> | recipient=<them>``, so
+it can only change when one of three audiences is written to. Each audience
+has a FeedVersion counter; the feed ETag is a hash of the three versions,
+which lets an unchanged poll be answered with one primary-key lookup and no
+serialization.
+"""
+import hashlib
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import FeedVersion, Notification
+from .parsing import query_int
+
+
+def user_audience(user_id):
+    return f"user:{user_id}"
+
+
+def audiences_of(notification):
+    """Audiences that can see ``notification``."""
+    keys = {notification.role}
+    if notification.recipient_id is not None:
+        keys.add(user_audience(notification.recipient_id))
+    return keys
+
+
+def audiences_for(user):
+    """Audiences whose notifications ``user`` sees."""
+    return ("all", user.role, user_audience(user.id))
+
+
+def bump(notifications):
+    """Advance the version of every audience that can see ``notifications``."""
+    keys = set()
+    for notification in notifications:
+        keys |= audiences_of(notification)
+    if not keys:
+        return
+    FeedVersion.objects.bulk_create(
+        [FeedVersion(audience=key) for key in keys], ignore_conflicts=True
+    )
+    FeedVersion.objects.filter(audience__in=keys).update(version=F("version") + 1)
+
+
+def notifications_for(user):
+    """Every notification in ``user``'s feed, newest first."""
+    return Notification.objects.filter(
+        Q(role="all") |
+        Q(role=user.role) |
+        Q(recipient_id=user.id)
+    ).order_by("-created_at")
+
+
+def etag_for(user, request):
+    """
+    Strong ETag for ``user``'s feed as requested.
+
+    The query string is part of it, since ``since`` and pagination change
+    the representation.
+    """
+    keys = audiences_for(user)
+    versions = FeedVersion.objects.filter(audience__in=keys).values_list("audience", "version")
+    return _etag(keys, dict(versions), request)
+
+
+async def aetag_for(user, request):
+    keys = audiences_for(user)
+    versions = FeedVersion.objects.filter(audience__in=keys).values_list("audience", "version")
+    return _etag(keys, {audience: version async for audience, version in versions}, request)
+
+
+def _etag(keys, versions, request):
+    state = ".".join(str(versions.get(key, 0)) for key in keys)
+    digest = hashlib.sha1(f"{state}|{request.get_full_path()}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def parse_since(value):
+    """
+    Turn a ``since`` parameter into queryset filters.
+
+    A bare integer is the last seen notification id, anything else must be
+    an ISO ``created_at``. Returns None when it is neither.
+    """
+    last_id = query_int(value)
+    if last_id is not None:
+        return {"id__gt": last_id}
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        return None
+    if moment is None:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return {"created_at__gt": moment}
@@ -0,0 +1,19 @@
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from . import metrics
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    The stock PBKDF2 hasher, recording how long each hash takes. It keeps
+    the ``pbkdf2_sha256`` algorithm name, so existing hashes still verify.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        began = time.perf_counter()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            metrics.PASSWORD_HASHING.labels(self.algorithm).observe(time.perf_counter() - began)
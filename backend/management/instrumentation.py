@@ -0,0 +1,199 @@
+"""
+Per-request SQL instrumentation.
+
+With ``settings.SQL_INSTRUMENTATION`` on, QueryInstrumentationMiddleware
+records each query's SQL, parameters and time for the length of a request.
+The
+response gets a ``Server-Timing`` header (query count, SQL time, total
+time) and one JSON log line on the ``management.sql`` logger, naming the
+view and viewset action that handled it.
+
+A query shape (the SQL with literals and IN lists folded) run more than
+``SQL_REPEAT_THRESHOLD`` times in one request is flagged as a likely N+1
+and logged at WARNING. Exact repeats, same SQL and same parameters, are
+counted as duplicates.
+
+Switched off, the middleware removes itself at startup (MiddlewareNotUsed),
+so it costs nothing. Queries run while a streaming response is consumed
+happen after the middleware returns and are not counted.
+
+Django connections belong to a thread, and under ASGI a sync view runs its
+queries on a sync_to_async worker thread rather than the event loop thread
+the middleware runs on. So the recorders of the request in progress live in
+a context variable, which follows the request into those threads, and every
+connection gets one permanent execute_wrapper (``dispatch``) as it is
+opened that hands each query to them.
+"""
+import contextvars
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger("management.sql")
+
+DEFAULT_REPEAT_THRESHOLD = 5
+SHAPE_LENGTH = 300  # characters of a query shape kept in log lines
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)", re.IGNORECASE)
+
+
+# Recorders of the request in progress, outermost first
+_recorders = contextvars.ContextVar("sql_recorders", default=())
+
+
+def dispatch(execute, sql, params, many, context):
+    """execute_wrapper on every connection: runs the query through the current recorders."""
+    for recorder in reversed(_recorders.get()):
+        execute = partial(recorder, execute)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created, dispatch_uid="management.instrumentation.attach")
+def attach(sender, connection, **kwargs):
+    # At the front: connection.execute_wrapper() blocks pop the last wrapper on exit
+    if dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, dispatch)
+
+
+@contextmanager
+def recording(recorder):
+    """Pass every query of this context to ``recorder``, whichever thread runs it."""
+    token = _recorders.set((*_recorders.get(), recorder))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+def shape(sql):
+    """``sql`` with literals and IN lists folded, so N+1 variants compare equal."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+class QueryRecorder:
+    """execute_wrapper that tallies the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # raw SQL -> [executions, seconds]; folded into shapes only at the end
+        self.statements = {}
+        self.executions = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - began
+            self.count += 1
+            self.seconds += elapsed
+            stats = self.statements.setdefault(sql, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            if not many:
+                self.executions[(sql, repr(params))] += 1
+
+    def install(self):
+        """Record the queries of every configured database inside the block."""
+        return recording(self)
+
+    def duplicates(self):
+        """Executions that repeated an earlier query exactly."""
+        return sum(n - 1 for n in self.executions.values() if n > 1)
+
+    def repeated(self, threshold):
+        """Shapes run more than ``threshold`` times, most frequent first."""
+        shapes = {}
+        for sql, (count, seconds) in self.statements.items():
+            totals = shapes.setdefault(shape(sql), [0, 0.0])
+            totals[0] += count
+            totals[1] += seconds
+        return [
+            {"sql": sql[:SHAPE_LENGTH], "count": count, "ms": round(seconds * 1000, 2)}
+            for sql, (count, seconds) in sorted(shapes.items(), key=lambda item: -item[1][0])
+            if count > threshold
+        ]
+
+
+def view_of(request):
+    """(view, action) that handled ``request``; action is only known for viewsets."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None, None
+    cls = getattr(match.func, "cls", None)
+    if cls is None:
+        return match._func_path, None
+    actions = getattr(match.func, "actions", None) or {}
+    return f"{cls.__module__}.{cls.__name__}", actions.get(request.method.lower())
+
+
+class QueryInstrumentationMiddleware:
+    """Server-Timing headers and a log line with the SQL cost of every request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SQL_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, "SQL_REPEAT_THRESHOLD", DEFAULT_REPEAT_THRESHOLD)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        began = time.perf_counter()
+        with QueryRecorder().install() as recorder:
+            response = self.get_response(request)
+        self.report(request, response, recorder, time.perf_counter() - began)
+        return response
+
+    async def __acall__(self, request):
+        began = time.perf_counter()
+        with QueryRecorder().install() as recorder:
+            response = await self.get_response(request)
+        self.report(request, response, recorder, time.perf_counter() - began)
+        return response
+
+    def report(self, request, response, recorder, elapsed):
+        repeated = recorder.repeated(self.threshold)
+        timings = [
+            f'db;dur={recorder.seconds * 1000:.2f};desc="{recorder.count} queries"',
+            f"total;dur={elapsed * 1000:.2f}",
+        ]
+        if repeated:
+            timings.append(f'repeated-sql;desc="{len(repeated)} shape(s) over {self.threshold}"')
+        existing = response.get("Server-Timing")
+        response["Server-Timing"] = ", ".join([existing, *timings] if existing else timings)
+
+        view, action = view_of(request)
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "action": action,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "sql_ms": round(recorder.seconds * 1000, 2),
+            "total_ms": round(elapsed * 1000, 2),
+            "duplicates": recorder.duplicates(),
+            "repeated": repeated,
+        }
+        logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(line))
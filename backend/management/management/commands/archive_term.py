@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management import terms
+from management.models import Term
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a closed term's attendance records out of the live table into "
+        "the archive, in chunked short transactions. Lifetime counters and "
+        "daily rollups are unaffected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("term", help="Term name")
+        parser.add_argument("--chunk-size", type=int, default=terms.ARCHIVE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            term = Term.objects.get(name=options["term"])
+        except Term.DoesNotExist:
+            raise CommandError(f"No term named {options['term']!r}")
+
+        def progress(moved):
+            self.stdout.write(f"  {moved} record(s) so far", ending="\r")
+
+        began = time.perf_counter()
+        try:
+            moved = terms.archive(term, chunk_size=options["chunk_size"], progress=progress)
+        except terms.TermError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} record(s) of {term.name} in {time.perf_counter() - began:.1f}s"
+        ))
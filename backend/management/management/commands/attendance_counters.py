@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from management import counters, rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild or verify the per-(student, course) attendance counters and "
+        "the per-(course, day) rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare counters and rollups with AttendanceRecord, do not rewrite them.",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            mismatches = counters.verify()
+            for student_id, course_id, stored, expected in mismatches:
+                self.stdout.write(
+                    f"student={student_id} course={course_id} stored={stored} expected={expected}"
+                )
+            stale = rollups.verify()
+            for course_id, date, stored, expected in stale:
+                self.stdout.write(
+                    f"course={course_id} date={date} stored={stored} expected={expected}"
+                )
+            if mismatches or stale:
+                raise CommandError(
+                    f"{len(mismatches)} counter(s) and {len(stale)} rollup(s) out of date"
+                )
+            self.stdout.write(self.style.SUCCESS("All counters and rollups match"))
+            return
+
+        count = counters.rebuild()
+        days = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} counter(s) and {days} rollup(s)"))
@@ -0,0 +1,106 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from management import packed
+from management.models import AttendanceRecord, AttendanceSession, Course, Student, Teacher, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare write throughput and storage of row-per-student attendance "
+        "against packed per-session storage. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=60, help="Class size")
+        parser.add_argument("--days", type=int, default=200, help="Class meetings to write")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["students"], options["days"], options["seed"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, class_size, days, seed):
+        rng = random.Random(seed)
+        codes = list(AttendanceRecord.STATUS_NAMES)
+
+        teacher_user = User.objects.create(username="bench-teacher@example.com", role="teacher")
+        teacher = Teacher.objects.create(user=teacher_user, name="Bench", dept="Bench")
+        course = Course.objects.create(name="Bench course", teacher=teacher)
+
+        users = User.objects.bulk_create([
+            User(username=f"bench-student{i}@example.com", role="student") for i in range(class_size)
+        ])
+        students = Student.objects.bulk_create([
+            Student(user=user, name=f"Bench {i}", dept="Bench") for i, user in enumerate(users)
+        ])
+        course.students.add(*students)
+
+        start = datetime.date(2020, 1, 1)
+        meetings = [
+            (start + datetime.timedelta(days=d), {s.id: rng.choice(codes) for s in students})
+            for d in range(days)
+        ]
+
+        # Row per student per meeting, one bulk insert per meeting
+        before = self.table_bytes(AttendanceRecord)
+        began = time.perf_counter()
+        for date, statuses in meetings:
+            AttendanceRecord.objects.bulk_create([
+                AttendanceRecord(student_id=sid, course=course, date=date, status=code)
+                for sid, code in statuses.items()
+            ])
+        rows_elapsed = time.perf_counter() - began
+        rows_bytes = self.growth(AttendanceRecord, before)
+
+        # One packed row per meeting
+        before = self.table_bytes(AttendanceSession)
+        began = time.perf_counter()
+        for date, statuses in meetings:
+            packed.mark_session(course.id, date, statuses)
+        packed_elapsed = time.perf_counter() - began
+        packed_bytes = self.growth(AttendanceSession, before)
+
+        marks = class_size * days
+        self.stdout.write(f"{days} meetings x {class_size} students = {marks} marks")
+        self.report("row-per-student", rows_elapsed, marks, days, rows_bytes)
+        self.report("packed sessions", packed_elapsed, marks, days, packed_bytes)
+
+    def report(self, label, elapsed, marks, meetings, size):
+        storage = f"{size / 1024:.1f} KiB" if size is not None else "n/a"
+        self.stdout.write(
+            f"{label:>16}: {marks / elapsed:,.0f} marks/s "
+            f"({elapsed / meetings * 1000:.2f} ms/meeting), storage {storage}"
+        )
+
+    def growth(self, model, before):
+        after = self.table_bytes(model)
+        return None if before is None or after is None else after - before
+
+    def table_bytes(self, model):
+        """Bytes used by a table and its indexes (SQLite dbstat only)."""
+        if connection.vendor != "sqlite":
+            return None
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat "
+                    "WHERE name = %s OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s AND type = 'index')",
+                    [table, table],
+                )
+            except Exception:
+                return None
+            return cursor.fetchone()[0]
@@ -0,0 +1,115 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from management import benchmarks, dataset
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "endpoints.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset at each --scale in a throwaway test "
+        "database, time every API endpoint through the DRF test client, and "
+        "compare query counts and p50/p95 latency with a stored baseline. Any "
+        "regression fails the run. The response cache is bypassed so the "
+        "views really run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="small,medium", help="Comma-separated dataset scales")
+        parser.add_argument("--iterations", type=int, default=20, help="Timed requests per endpoint")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+        parser.add_argument("--write-baseline", action="store_true", help="Store these results as the baseline")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.5,
+            help="Allowed p50 growth over the baseline, as a fraction",
+        )
+        parser.add_argument(
+            "--tail-tolerance", type=float, default=1.0,
+            help="Allowed p95 growth over the baseline, as a fraction",
+        )
+        parser.add_argument("--slack-ms", type=float, default=2.0, help="Allowed growth in ms on top of that")
+
+    def handle(self, *args, **options):
+        scales = [scale.strip() for scale in options["scales"].split(",") if scale.strip()]
+        unknown = set(scales) - set(dataset.SCALES)
+        if unknown:
+            raise CommandError(f"Unknown scale(s): {', '.join(sorted(unknown))}")
+        for name in benchmarks.uncovered():
+            self.stderr.write(f"Route {name} is neither benchmarked nor excluded")
+
+        baseline = {"scales": {}}
+        path = Path(options["baseline"])
+        if path.exists():
+            baseline = benchmarks.load_baseline(path)
+        elif not options["write_baseline"]:
+            self.stderr.write(f"No baseline at {path}; nothing to compare with")
+
+        results = {}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                CACHES={**settings.CACHES, "responses": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+                DATABASE_REPLICAS=(),
+            ):
+                for scale in scales:
+                    results[scale] = self.run_scale(scale, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        regressions = []
+        for scale, scale_results in results.items():
+            before = baseline["scales"].get(scale, {})
+            self.report(scale, scale_results, before)
+            regressions += [
+                f"[{scale}] {message}"
+                for message in benchmarks.compare(
+                    scale_results, before, tolerance=options["tolerance"],
+                    tail_tolerance=options["tail_tolerance"], slack_ms=options["slack_ms"],
+                )
+            ]
+
+        if options["write_baseline"]:
+            baseline["iterations"] = options["iterations"]
+            baseline["scales"].update(results)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            benchmarks.save_baseline(path, baseline)
+            self.stdout.write(self.style.SUCCESS(f"Wrote baseline to {path}"))
+            return
+
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def run_scale(self, scale, options):
+        call_command("flush", interactive=False, verbosity=0)
+        began = time.perf_counter()
+        created = dataset.generate(**dataset.SCALES[scale], seed=options["seed"])
+        self.stdout.write(
+            f"{scale}: generated {created['AttendanceRecord']} attendance record(s) "
+            f"in {time.perf_counter() - began:.1f}s"
+        )
+        results = benchmarks.measure(benchmarks.context(), iterations=options["iterations"])
+        failed = [f"{name}: HTTP {result['status']}" for name, result in results.items() if result["status"] >= 400]
+        if failed:
+            raise CommandError(f"[{scale}] endpoints failed:\n" + "\n".join(failed))
+        return results
+
+    def report(self, scale, results, baseline):
+        self.stdout.write(f"\n{scale}:")
+        self.stdout.write(f"{'endpoint':<64} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'baseline p95':>12}")
+        for name, result in results.items():
+            before = baseline.get(name)
+            self.stdout.write(
+                f"{name:<64} {result['queries']:>7} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                f"{before['p95_ms'] if before else '-':>12}"
+            )
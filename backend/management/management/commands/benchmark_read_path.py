@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management.authentication import RoleRefreshToken
+from management.models import User
+
+# (path, role of the user requesting it)
+READ_PATHS = (
+    ("/api/attendance/summary/", "student"),
+    ("/api/students/my-courses/", "student"),
+    ("/api/notifications/my/", "student"),
+    ("/api/feedback/my/", "student"),
+    ("/api/teachers/me/", "teacher"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer the dashboard read endpoints of a running server with many "
+        "concurrent keep-alive connections and report throughput and latency. "
+        "Run it once against a WSGI server and once against ASGI to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL")
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--duration", type=float, default=20, help="Seconds to run for")
+        parser.add_argument("--warmup", type=float, default=2)
+        parser.add_argument("--label", default="", help="Name printed with the results")
+
+    def handle(self, *args, **options):
+        tokens = {}
+        for role in {role for _, role in READ_PATHS}:
+            user = User.objects.filter(role=role).first()
+            if user is None:
+                raise CommandError(f"Needs a {role} user in the database")
+            tokens[role] = str(RoleRefreshToken.for_user(user).access_token)
+        self.requests = [(path, tokens[role]) for path, role in READ_PATHS]
+
+        url = urlsplit(options["url"])
+        self.host, self.port = url.hostname, url.port or 80
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        latencies, errors = [], []
+        stop_warmup = time.perf_counter() + options["warmup"]
+        deadline = stop_warmup + options["duration"]
+        mix = itertools.cycle(self.requests)
+
+        async def worker():
+            connection = None
+            while time.perf_counter() < deadline:
+                path, token = next(mix)
+                began = time.perf_counter()
+                try:
+                    if connection is None:
+                        connection = await asyncio.open_connection(self.host, self.port)
+                    status, keep_alive = await self.get(*connection, path, token)
+                except (OSError, asyncio.IncompleteReadError, ConnectionError) as exc:
+                    errors.append(repr(exc))
+                    connection = None
+                    continue
+                if not keep_alive:
+                    connection[1].close()
+                    connection = None
+                if began >= stop_warmup:
+                    if status == 200:
+                        latencies.append(time.perf_counter() - began)
+                    else:
+                        errors.append(f"HTTP {status} {path}")
+            if connection is not None:
+                connection[1].close()
+
+        await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
+
+        if not latencies:
+            raise CommandError(f"No successful requests; first error: {errors[:1]}")
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        label = f"{options['label']}: " if options["label"] else ""
+        self.stdout.write(
+            f"{label}{len(latencies) / options['duration']:,.0f} req/s at concurrency {options['concurrency']}, "
+            f"p50 {statistics.median(latencies) * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, "
+            f"{len(errors)} error(s)"
+        )
+        if errors:
+            self.stdout.write(f"first error: {errors[0]}")
+
+    async def get(self, reader, writer, path, token):
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Authorization: Bearer {token}\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            while size := int((await reader.readline()).strip(), 16):
+                await reader.readexactly(size + 2)
+            await reader.readline()
+        else:
+            await reader.readexactly(int(headers.get("content-length", 0)))
+
+        return status, headers.get("connection", "").lower() != "close"
@@ -0,0 +1,136 @@
+import datetime
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+
+from management import bulk, counters
+from management.models import AttendanceCounter, AttendanceRecord, Course, Student, Teacher, User
+
+PREFIX = "bench-concurrency"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and bulk attendance writers against the "
+        "configured database and report lock errors and latency. Compare the "
+        "default profile with DB_PROFILE=production. Each operation opens and "
+        "closes its connection like a request would, as far as CONN_MAX_AGE "
+        "allows. The data it creates is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=15, help="Seconds to run for")
+        parser.add_argument("--courses", type=int, default=10)
+        parser.add_argument("--class-size", type=int, default=40)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        db = settings.DATABASES["default"]
+        self.stdout.write(
+            f"profile={settings.DB_PROFILE} journal_mode={journal_mode} "
+            f"transaction_mode={db.get('OPTIONS', {}).get('transaction_mode') or 'DEFERRED'} "
+            f"CONN_MAX_AGE={db.get('CONN_MAX_AGE', 0)}"
+        )
+
+        self.rng = random.Random(options["seed"])
+        self.setup(options["courses"], options["class_size"])
+        try:
+            self.run(options)
+        finally:
+            self.teardown()
+
+    def setup(self, course_count, class_size):
+        teacher_user = User.objects.create(username=f"{PREFIX}-teacher@example.com", role="teacher")
+        teacher = Teacher.objects.create(user=teacher_user, name="Bench", dept="Bench")
+        users = User.objects.bulk_create([
+            User(username=f"{PREFIX}-student{i}@example.com", role="student")
+            for i in range(course_count * class_size)
+        ])
+        students = Student.objects.bulk_create([
+            Student(user=user, name=f"Bench {i}", dept="Bench") for i, user in enumerate(users)
+        ])
+        self.rosters = {}
+        for n in range(course_count):
+            course = Course.objects.create(name=f"Bench course {n}", teacher=teacher)
+            roster = students[n * class_size:(n + 1) * class_size]
+            course.students.add(*roster)
+            self.rosters[course.id] = [s.id for s in roster]
+        self.student_ids = [s.id for s in students]
+
+    def teardown(self):
+        close_old_connections()
+        Course.objects.filter(id__in=self.rosters).delete()
+        User.objects.filter(username__startswith=f"{PREFIX}-").delete()
+
+    def run(self, options):
+        deadline = time.perf_counter() + options["duration"]
+        results = {"read": [], "write": []}
+        errors = {"read": 0, "write": 0}
+        lock = threading.Lock()
+        start = datetime.date(2020, 1, 1)
+        statuses = list(AttendanceRecord.STATUS_CODES)
+
+        def read(rng):
+            student_id = rng.choice(self.student_ids)
+            course_id = rng.choice(list(self.rosters))
+            list(AttendanceCounter.objects.filter(student_id=student_id).values("course_id", *counters.COUNTER_FIELDS))
+            list(AttendanceRecord.objects.filter(course_id=course_id).order_by("-date", "id")[:50])
+
+        def write(rng):
+            course_id = rng.choice(list(self.rosters))
+            date = (start + datetime.timedelta(days=rng.randrange(365))).isoformat()
+            bulk.upsert_attendance([
+                {"studentId": sid, "courseId": course_id, "date": date, "status": rng.choice(statuses)}
+                for sid in self.rosters[course_id]
+            ])
+
+        def worker(kind, operation, seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                began = time.perf_counter()
+                try:
+                    operation(rng)
+                    elapsed = time.perf_counter() - began
+                    with lock:
+                        results[kind].append(elapsed)
+                except OperationalError:
+                    with lock:
+                        errors[kind] += 1
+                finally:
+                    # What the request handler does around each request
+                    close_old_connections()
+            connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=("read", read, self.rng.random()))
+            for _ in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=("write", write, self.rng.random()))
+            for _ in range(options["writers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for kind in ("read", "write"):
+            latencies = sorted(results[kind])
+            if not latencies:
+                self.stdout.write(f"{kind:>5}: no successful operations, {errors[kind]} lock error(s)")
+                continue
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"{kind:>5}: {len(latencies) / options['duration']:,.1f} ops/s, "
+                f"p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, "
+                f"{errors[kind]} lock error(s)"
+            )
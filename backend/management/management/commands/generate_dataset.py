@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from management import dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset: users with student and "
+        "teacher profiles, courses and enrollments, years of attendance, "
+        "terms, feedback and notifications. Pick a --scale or give the sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(dataset.SCALES), default="small")
+        parser.add_argument("--students", type=int)
+        parser.add_argument("--teachers", type=int)
+        parser.add_argument("--courses", type=int)
+        parser.add_argument("--years", type=int, help="Years of attendance, ending on --end")
+        parser.add_argument("--courses-per-student", type=int, default=4)
+        parser.add_argument("--meetings-per-week", type=int, default=2, choices=range(1, 6))
+        parser.add_argument("--feedback", type=int, help="Feedback rows (default two per student)")
+        parser.add_argument("--notifications", type=int, help="Notifications (default two per student)")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--end", help="Last day of attendance, YYYY-MM-DD (default today)")
+        parser.add_argument("--prefix", default="synthetic", help="Prefix of generated usernames")
+        parser.add_argument("--replace", action="store_true", help="Delete an earlier dataset with this prefix first")
+
+    def handle(self, *args, **options):
+        sizes = dict(dataset.SCALES[options["scale"]])
+        for name in ("students", "teachers", "courses", "years"):
+            if options[name] is not None:
+                sizes[name] = options[name]
+        if sizes["teachers"] < 1 or sizes["courses"] < 1:
+            raise CommandError("Needs at least one teacher and one course")
+
+        end = None
+        if options["end"]:
+            end = parse_date(options["end"])
+            if end is None:
+                raise CommandError("--end must be YYYY-MM-DD")
+
+        prefix = options["prefix"]
+        if dataset.exists(prefix):
+            if not options["replace"]:
+                raise CommandError(f"A dataset with prefix {prefix!r} exists; pass --replace to regenerate it")
+            self.stdout.write(f"Removed {dataset.remove(prefix)} row(s) of the earlier dataset")
+
+        def progress(message):
+            self.stdout.write(f"  {message}", ending="\r" if message.startswith("attendance:") else "\n")
+
+        began = time.perf_counter()
+        created = dataset.generate(
+            **sizes,
+            courses_per_student=options["courses_per_student"],
+            meetings_per_week=options["meetings_per_week"],
+            feedback=options["feedback"],
+            notifications=options["notifications"],
+            seed=options["seed"],
+            end=end,
+            prefix=prefix,
+            progress=progress,
+        )
+
+        self.stdout.write("")
+        for name, count in created.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {sum(created.values())} row(s) in {time.perf_counter() - began:.1f}s"
+        ))
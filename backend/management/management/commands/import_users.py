@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management import bulk
+
+
+class Command(BaseCommand):
+    help = "Bulk-create students or teachers from a CSV file with name, dept and email columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import")
+        parser.add_argument("--role", choices=sorted(bulk.PROFILE_MODELS), required=True)
+        parser.add_argument(
+            "--password-mode",
+            choices=bulk.PASSWORD_MODES,
+            default="default",
+            help="'default' sets the usual role password, 'unusable' forces a reset before first login.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes used to hash passwords (defaults to the CPU count).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as fileobj:
+                results = bulk.import_profiles(
+                    bulk.read_csv(fileobj),
+                    options["role"],
+                    password_mode=options["password_mode"],
+                    workers=options["workers"] or os.cpu_count() or 1,
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        created = 0
+        for result in results:
+            if result["outcome"] == "created":
+                created += 1
+            else:
+                self.stderr.write(f"line {result['line']} ({result['email']}): {result['errors']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} {options['role']}(s), {len(results) - created} failed"
+        ))
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import resource
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management.authentication import RoleRefreshToken
+from management.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many idle /notifications/stream/ connections against a running "
+        "ASGI server, then time how long one broadcast takes to reach them all."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL")
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument("--hold", type=float, default=10, help="Seconds to keep the connections idle")
+        parser.add_argument("--ramp", type=int, default=100, help="Connections opened concurrently")
+        parser.add_argument("--pid", type=int, help="Server process id, to report its memory")
+
+    def handle(self, *args, **options):
+        student = User.objects.filter(role="student").first()
+        admin = User.objects.filter(role="admin").first()
+        if student is None or admin is None:
+            raise CommandError("Needs at least one student and one admin user in the database")
+
+        self.raise_fd_limit(options["connections"] + 100)
+        url = urlsplit(options["url"])
+        self.host, self.port = url.hostname, url.port or 80
+        self.student_token = str(RoleRefreshToken.for_user(student).access_token)
+        self.admin_token = str(RoleRefreshToken.for_user(admin).access_token)
+
+        asyncio.run(self.run(options))
+
+    def raise_fd_limit(self, wanted):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    async def run(self, options):
+        rss_before = self.rss(options["pid"])
+        gate = asyncio.Semaphore(options["ramp"])
+        began = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.connect(gate) for _ in range(options["connections"])), return_exceptions=True
+        )
+        streams = [r for r in results if not isinstance(r, BaseException)]
+        errors = [r for r in results if isinstance(r, BaseException)]
+        self.stdout.write(f"Connected {len(streams)}/{len(results)} in {time.perf_counter() - began:.1f}s")
+        if errors:
+            self.stdout.write(f"{len(errors)} failed, first: {errors[0]!r}")
+
+        await asyncio.sleep(options["hold"])
+        alive = sum(1 for _, writer in streams if not writer.is_closing())
+        rss_after = self.rss(options["pid"])
+        self.stdout.write(f"Still open after {options['hold']:.0f}s idle: {alive}")
+        if rss_before and rss_after:
+            per_connection = (rss_after - rss_before) / max(len(streams), 1)
+            self.stdout.write(
+                f"Server RSS {rss_before / 1024:.1f} -> {rss_after / 1024:.1f} MiB "
+                f"(~{per_connection:.1f} KiB per connection)"
+            )
+
+        sent = time.perf_counter()
+        waits = [asyncio.create_task(self.wait_for_event(reader)) for reader, _ in streams]
+        await self.broadcast()
+        arrivals = await asyncio.gather(*waits, return_exceptions=True)
+        latencies = sorted((t - sent) * 1000 for t in arrivals if isinstance(t, float))
+        if latencies:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"Broadcast delivered to {len(latencies)}/{len(streams)}: "
+                f"p50 {statistics.median(latencies):.0f} ms, p99 {p99:.0f} ms, max {latencies[-1]:.0f} ms"
+            )
+
+        for _, writer in streams:
+            writer.close()
+
+    async def connect(self, gate):
+        async with gate:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            writer.write(
+                f"GET /api/notifications/stream/ HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Authorization: Bearer {self.student_token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+            )
+            await writer.drain()
+            status = await asyncio.wait_for(reader.readline(), 30)
+            if b" 200 " not in status:
+                writer.close()
+                raise ConnectionError(status.decode().strip())
+            # Headers, then the first "retry:" frame
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            return reader, writer
+
+    async def wait_for_event(self, reader):
+        while True:
+            line = await asyncio.wait_for(reader.readline(), 60)
+            if not line:
+                raise ConnectionError("stream closed")
+            if b"event: notification" in line:
+                return time.perf_counter()
+
+    async def broadcast(self):
+        body = json.dumps({"title": "Load test", "message": "Broadcast", "role": "all"}).encode()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(
+            f"POST /api/notifications/ HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Authorization: Bearer {self.admin_token}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        status = await reader.readline()
+        writer.close()
+        if b" 201 " not in status:
+            raise CommandError(f"Broadcast failed: {status.decode().strip()}")
+
+    def rss(self, pid):
+        """Resident memory of ``pid`` in KiB (Linux only)."""
+        if not pid:
+            return None
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management import alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Warn students whose attendance in a course fell below the threshold "
+        "since the last run. Meant to be run on a schedule, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            help=f"Percentage to warn below (default settings.LOW_ATTENDANCE_THRESHOLD, {alerts.default_threshold()})",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Check every counter, not just those changed since the last run",
+        )
+
+    def handle(self, *args, **options):
+        threshold = options["threshold"]
+        if threshold is not None and not 0 < threshold <= 100:
+            raise CommandError("--threshold must be between 0 and 100")
+
+        began = time.perf_counter()
+        job = alerts.run(threshold, full=options["full"])
+        elapsed = time.perf_counter() - began
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {job.checked} counter(s) against {job.threshold:g}% in {elapsed:.2f}s: "
+            f"{job.fell_below} fell below, {job.recovered} recovered, "
+            f"{job.notified} notification(s) sent"
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from management import purge
+from management.models import PurgeJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete a whole target (students, teachers, courses or profiles) and "
+        "everything cascading from it, in chunked short transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("target", nargs="?", choices=sorted(purge.PURGE_TARGETS))
+        parser.add_argument("--job", type=int, help="Run a queued PurgeJob instead")
+        parser.add_argument("--dry-run", action="store_true", help="Only print the delete plan")
+
+    def handle(self, *args, **options):
+        if options["job"]:
+            purge.run_job(options["job"])
+            job = PurgeJob.objects.get(pk=options["job"])
+            if job.status == PurgeJob.FAILED:
+                raise CommandError(job.error)
+            self.report(job.deleted)
+            return
+
+        target = options["target"]
+        if target is None:
+            raise CommandError("Give a target or --job")
+
+        if options["dry_run"]:
+            for root in purge.PURGE_TARGETS[target]():
+                for action, queryset, field in purge.plan(root):
+                    suffix = f" ({field.name} = NULL)" if field else ""
+                    self.stdout.write(f"{action:>8} {queryset.model._meta.label}{suffix}")
+            return
+
+        def progress(counts):
+            self.stdout.write(f"  {sum(counts.values())} row(s) so far", ending="\r")
+
+        self.report(purge.purge(target, progress))
+
+    def report(self, counts):
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Purged {sum(counts.values())} row(s)"))
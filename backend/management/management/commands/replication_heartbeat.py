@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.utils import timezone
+
+from management.models import ReplicationHeartbeat
+
+
+class Command(BaseCommand):
+    help = (
+        "Stamp the replication heartbeat on the primary database every few "
+        "seconds. The database router compares it with each replica's copy "
+        "to measure replica lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=1, help="Seconds between beats")
+        parser.add_argument("--once", action="store_true", help="Beat once and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            ReplicationHeartbeat.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+                pk=1, defaults={"beat_at": timezone.now()}
+            )
+            if options["once"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
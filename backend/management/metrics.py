@@ -0,0 +1,188 @@
+"""
+Prometheus metrics, served in text exposition format at /metrics.
+
+MetricsMiddleware counts every request, its latency and its database
+queries, labelled by endpoint: ``<router basename>.<viewset action>`` for
+viewsets (``attendance.bulk_create``, ``attendance.summary``), the url
+name alone for the async twins of viewset actions (named after the action,
+so both deployments share one series), and ``<url name>.<method>`` for
+other views (``login.post``). Logins, password
+hashing (management.hashers) and response cache lookups are recorded where
+they happen.
+
+/metrics answers clients in METRICS_ALLOWED_NETWORKS only, and with
+METRICS_TOKEN set only those sending it as a Bearer token. Behind a reverse
+proxy every request arrives from the proxy's address, so set the token.
+
+Each process keeps its own values. With several worker processes, point the
+PROMETHEUS_MULTIPROC_DIR environment variable at an empty directory shared
+by all of them before they start: prometheus_client then keeps the values in
+one mmap'd file per process, and /metrics adds up every file. Empty the
+directory on each deploy, and call ``worker_exited(pid)`` from the server's
+child-exit hook (gunicorn's ``child_exit``) so dead workers' files are
+cleaned up.
+"""
+import hmac
+import ipaddress
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .instrumentation import recording
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+HASH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 5)
+
+REQUESTS = Counter(
+    "http_requests_total", "Requests handled, by endpoint, method and status code.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by endpoint.",
+    ["endpoint"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total", "Requests answered with a 5xx status, by endpoint.",
+    ["endpoint"],
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries run per request, by endpoint.",
+    ["endpoint"], buckets=QUERY_BUCKETS,
+)
+LOGINS = Histogram(
+    "login_duration_seconds", "Time spent checking credentials at /login/, by outcome.",
+    ["outcome"], buckets=HASH_BUCKETS,
+)
+PASSWORD_HASHING = Histogram(
+    "password_hash_duration_seconds", "Time spent hashing one password, by algorithm.",
+    ["algorithm"], buckets=HASH_BUCKETS,
+)
+RESPONSE_CACHE = Counter(
+    "response_cache_lookups_total", "Response cache lookups, by resource and hit or miss.",
+    ["resource", "outcome"],
+)
+
+
+def multiprocess_dir():
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def worker_exited(pid):
+    """Tell the multiprocess aggregation that worker ``pid`` is gone."""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
+
+def exposition():
+    """Current values of every metric, across processes if configured."""
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def allowed(request):
+    """
+    Whether ``request`` may read /metrics: it must come from
+    METRICS_ALLOWED_NETWORKS and, when METRICS_TOKEN is set, carry
+    ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    address = request.META.get("REMOTE_ADDR", "")
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    networks = getattr(settings, "METRICS_ALLOWED_NETWORKS", ("127.0.0.1", "::1"))
+    if not any(address in ipaddress.ip_network(network, strict=False) for network in networks):
+        return False
+
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        return True
+    return hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode())
+
+
+def metrics_view(request):
+    if not allowed(request):
+        return HttpResponseForbidden("Metrics need an allowed address and, if configured, the scrape token")
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE_LATEST)
+
+
+def endpoint_of(request):
+    """Endpoint label of the view that handled ``request``."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    actions = getattr(match.func, "actions", None)
+    basename = getattr(match.func, "initkwargs", {}).get("basename")
+    if actions and basename:
+        return f"{basename}.{actions.get(request.method.lower(), request.method.lower())}"
+    if match.func.__module__ == "management.async_views":
+        return match.url_name
+    return f"{match.url_name or match.view_name or 'unnamed'}.{request.method.lower()}"
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Request count, latency, errors and query count per endpoint."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = _QueryCounter()
+        began = time.perf_counter()
+        with recording(queries):
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - began, queries.count)
+        return response
+
+    async def __acall__(self, request):
+        queries = _QueryCounter()
+        began = time.perf_counter()
+        # Queries reach the counter from whichever thread runs them
+        with recording(queries):
+            response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - began, queries.count)
+        return response
+
+    def observe(self, request, response, elapsed, queries):
+        endpoint = endpoint_of(request)
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(endpoint).observe(elapsed)
+        DB_QUERIES.labels(endpoint).observe(queries)
+        if response.status_code >= 500:
+            REQUEST_ERRORS.labels(endpoint).inc()
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counters(apps, schema_editor):
+    AttendanceRecord = apps.get_model('management', 'AttendanceRecord')
+    AttendanceCounter = apps.get_model('management', 'AttendanceCounter')
+    db_alias = schema_editor.connection.alias
+
+    rows = (
+        AttendanceRecord.objects.using(db_alias).values('student_id', 'course_id')
+        .annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(status='present')),
+            late=Count('id', filter=Q(status='late')),
+            absent=Count('id', filter=Q(status='absent')),
+        )
+        .order_by()
+    )
+    AttendanceCounter.objects.using(db_alias).bulk_create(
+        [
+            AttendanceCounter(
+                student_id=row['student_id'],
+                course_id=row['course_id'],
+                present=row['present'],
+                late=row['late'],
+                absent=row['absent'],
+                unmarked=row['total'] - row['present'] - row['late'] - row['absent'],
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('unmarked', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_counters', to='management.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_counters', to='management.student')),
+            ],
+            options={
+                'unique_together': {('student', 'course')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
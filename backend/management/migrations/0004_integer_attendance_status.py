@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:42
+
+from django.db import migrations, models
+from django.db.models import Max
+
+CHUNK_SIZE = 10000
+
+# Statuses outside this map (the old field was free-form) become unmarked (0)
+STATUS_CODES = {
+    'present': 1,
+    'absent': 2,
+    'late': 3,
+    'unmarked': 0,
+}
+
+
+def _chunks(model, db_alias):
+    records = model.objects.using(db_alias)
+    last = records.aggregate(last=Max('pk'))['last'] or 0
+    for start in range(0, last + 1, CHUNK_SIZE):
+        yield records.filter(pk__gte=start, pk__lt=start + CHUNK_SIZE)
+
+
+def encode_statuses(apps, schema_editor):
+    AttendanceRecord = apps.get_model('management', 'AttendanceRecord')
+    for chunk in _chunks(AttendanceRecord, schema_editor.connection.alias):
+        for name, code in STATUS_CODES.items():
+            if code:
+                chunk.filter(status=name).update(status_code=code)
+
+
+def decode_statuses(apps, schema_editor):
+    AttendanceRecord = apps.get_model('management', 'AttendanceRecord')
+    for chunk in _chunks(AttendanceRecord, schema_editor.connection.alias):
+        for name, code in STATUS_CODES.items():
+            chunk.filter(status_code=code).update(status=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0003_attendance_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        # A default lets the old column be re-added when migrating backwards
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='status',
+            field=models.CharField(default='unmarked', max_length=10),
+        ),
+        migrations.RunPython(encode_statuses, decode_statuses),
+        migrations.RemoveField(
+            model_name='attendancerecord',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='attendancerecord',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Present'), (2, 'Absent'), (3, 'Late'), (0, 'Unmarked')], default=0),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0004_integer_attendance_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('student_ids', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='roster_snapshots', to='management.course')),
+            ],
+            options={
+                'unique_together': {('course', 'version')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('statuses', models.BinaryField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_sessions', to='management.course')),
+                ('roster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='management.rostersnapshot')),
+            ],
+            options={
+                'unique_together': {('course', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_rollups(apps, schema_editor):
+    AttendanceRecord = apps.get_model('management', 'AttendanceRecord')
+    DailyAttendanceRollup = apps.get_model('management', 'DailyAttendanceRollup')
+    db_alias = schema_editor.connection.alias
+
+    rows = (
+        AttendanceRecord.objects.using(db_alias).values('course_id', 'date')
+        .annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(status=1)),
+            absent=Count('id', filter=Q(status=2)),
+            late=Count('id', filter=Q(status=3)),
+        )
+        .order_by()
+    )
+    DailyAttendanceRollup.objects.using(db_alias).bulk_create(
+        (
+            DailyAttendanceRollup(
+                course_id=row['course_id'],
+                date=row['date'],
+                present=row['present'],
+                late=row['late'],
+                absent=row['absent'],
+                unmarked=row['total'] - row['present'] - row['late'] - row['absent'],
+            )
+            for row in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0007_feed_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('unmarked', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='management.course')),
+            ],
+            options={
+                'unique_together': {('course', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
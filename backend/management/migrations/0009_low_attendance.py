@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0008_daily_attendance_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowAttendanceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.FloatField()),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('checked', models.PositiveIntegerField(default=0)),
+                ('fell_below', models.PositiveIntegerField(default=0)),
+                ('recovered', models.PositiveIntegerField(default=0)),
+                ('notified', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendancecounter',
+            name='changed_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='attendancecounter',
+            name='low_attendance',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='role',
+            field=models.CharField(choices=[('student', 'Student'), ('teacher', 'Teacher'), ('all', 'All'), ('none', 'Recipient only')], default='all', max_length=20),
+        ),
+    ]
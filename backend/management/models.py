@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 from django.db import models
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 class CustomUserManager(BaseUserManager):
     use_in_migrations = True
@@ -38,6 +40,16 @@ class User(AbstractUser):
 
     objects = CustomUserManager()
 
+    # Same attributes as the claims-backed request.user, so views can scope
+    # by profile id whichever kind of user they get
+    @cached_property
+    def student_id(self):
+        return Student.objects.filter(user_id=self.pk).values_list("id", flat=True).first()
+
+    @cached_property
+    def teacher_id(self):
+        return Teacher.objects.filter(user_id=self.pk).values_list("id", flat=True).first()
+
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="student")
     name = models.CharField(max_length=100)
@@ -68,21 +80,237 @@ class Course(models.Model):
         return self.name
 
 class AttendanceRecord(models.Model):
+    # Stored as a small integer; the API still speaks the string names
+    UNMARKED = 0
+    PRESENT = 1
+    ABSENT = 2
+    LATE = 3
     STATUS_CHOICES = [
-        ('present', 'Present'),
-        ('absent', 'Absent'),
-        ('late', 'Late'),
-        ('unmarked', 'Unmarked'),
+        (PRESENT, 'Present'),
+        (ABSENT, 'Absent'),
+        (LATE, 'Late'),
+        (UNMARKED, 'Unmarked'),
     ]
+    STATUS_CODES = {
+        'present': PRESENT,
+        'absent': ABSENT,
+        'late': LATE,
+        'unmarked': UNMARKED,
+    }
+    STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     date = models.DateField()
-    status = models.CharField(max_length=10)
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=UNMARKED)
     class Meta:
         unique_together = ('student', 'course', 'date')
+        indexes = [
+            # teacher/course listings, per-course deletes and date-range exports
+            models.Index(fields=['course', 'date'], name='attendance_course_date_idx'),
+            # student listings ordered by date
+            models.Index(fields=['student', 'date'], name='attendance_student_date_idx'),
+            # admin listing and keyset pagination on (date, id)
+            models.Index(fields=['date'], name='attendance_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.name} - {self.course.name} - {self.date}"
+
+
+class Term(models.Model):
+    """
+    An academic term. Archiving a closed term moves its attendance into
+    ArchivedAttendanceRecord; from then on its dates accept no more marks.
+    """
+    OPEN = "open"
+    ARCHIVING = "archiving"
+    ARCHIVED = "archived"
+    STATUS_CHOICES = [
+        (OPEN, "Open"),
+        (ARCHIVING, "Archiving"),
+        (ARCHIVED, "Archived"),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["start_date"]
+
+    def __str__(self):
+        return self.name
+
+
+class ArchivedAttendanceRecord(models.Model):
+    """An AttendanceRecord of an archived term, kept under its original id."""
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, related_name="archived_records")
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="archived_attendance")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="archived_attendance")
+    date = models.DateField()
+    status = models.PositiveSmallIntegerField(choices=AttendanceRecord.STATUS_CHOICES, default=AttendanceRecord.UNMARKED)
+
+    class Meta:
+        indexes = [
+            # rollup refreshes after a student delete
+            models.Index(fields=['course', 'date'], name='archived_course_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id} - {self.date}"
+
+
+class ArchivedAttendanceTotal(models.Model):
+    """
+    Status totals of one student in one course over one archived term, so
+    the counters can be recomputed without reading the archive.
+    """
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, related_name="archived_totals")
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="archived_totals")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="archived_totals")
+    present = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    unmarked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('term', 'student', 'course')
+
+    def __str__(self):
+        return f"{self.term_id}: {self.student_id} - {self.course_id}"
+
+
+class AttendanceCounter(models.Model):
+    """
+    Running per-(student, course) status totals, kept in step with
+    AttendanceRecord so the summary endpoint never re-scans history.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="attendance_counters")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="attendance_counters")
+    present = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    unmarked = models.PositiveIntegerField(default=0)
+    # When the totals last moved; the low-attendance job only looks at newer rows
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Whether the student has been warned about this course and not yet recovered
+    low_attendance = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('student', 'course')
+
+    @property
+    def total(self):
+        return self.present + self.late + self.absent + self.unmarked
+
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id}"
+
+class DailyAttendanceRollup(models.Model):
+    """
+    Status totals of one course on one day, kept in step with
+    AttendanceRecord so teacher analytics read days, not records.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="daily_rollups")
+    date = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    unmarked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course', 'date')
+
+    def __str__(self):
+        return f"{self.course_id} - {self.date}"
+
+class RosterSnapshot(models.Model):
+    """
+    A versioned copy of Course.students, sorted by student id.
+
+    Packed attendance sessions index their 2-bit status slots against one
+    of these, so later enrollment changes never shift old sessions.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="roster_snapshots")
+    version = models.PositiveIntegerField()
+    student_ids = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('course', 'version')
+
+    def __str__(self):
+        return f"{self.course_id} v{self.version}"
+
+
+class AttendanceSession(models.Model):
+    """
+    One class meeting stored as a single row: a packed array holding the
+    2-bit status code of every student in ``roster``, in roster order.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="attendance_sessions")
+    date = models.DateField()
+    roster = models.ForeignKey(RosterSnapshot, on_delete=models.CASCADE, related_name="sessions")
+    statuses = models.BinaryField()
+
+    class Meta:
+        unique_together = ('course', 'date')
+
+    def __str__(self):
+        return f"{self.course_id} - {self.date}"
+
+
+class PurgeJob(models.Model):
+    """A queued or running bulk delete started from one of the "delete all" endpoints."""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    target = models.CharField(max_length=20)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # rows deleted so far, keyed by model label
+    deleted = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.target} ({self.status})"
+
+
+class ReplicationHeartbeat(models.Model):
+    """Single row stamped on the primary; how old a replica's copy is shows its lag."""
+    beat_at = models.DateTimeField()
+
+    def __str__(self):
+        return str(self.beat_at)
+
+
+class LowAttendanceRun(models.Model):
+    """One pass of the low-attendance job; the last one marks where the next starts."""
+    threshold = models.FloatField()
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    checked = models.PositiveIntegerField(default=0)
+    fell_below = models.PositiveIntegerField(default=0)
+    recovered = models.PositiveIntegerField(default=0)
+    notified = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.started_at} ({self.threshold}%)"
+
+
 class Feedback(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
@@ -103,6 +331,8 @@ class Notification(models.Model):
             ("student", "Student"),
             ("teacher", "Teacher"),
             ("all", "All"),
+            # only the recipient sees it
+            ("none", "Recipient only"),
         ],
         default="all"
     )
@@ -116,5 +346,26 @@ class Notification(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # feed: role = 'all' OR role = <role> OR recipient = <user>, newest first
+            models.Index(fields=['role', 'created_at'], name='notification_role_created_idx'),
+            models.Index(fields=['recipient', 'created_at'], name='notification_recipient_idx'),
+            models.Index(fields=['created_at'], name='notification_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class FeedVersion(models.Model):
+    """
+    Change counter for one notification audience: "all", a role name, or
+    "user:<id>" for personal notifications. Bumped on every write that
+    audience can see; the feed's ETag is built from these.
+    """
+    audience = models.CharField(max_length=40, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.audience} v{self.version}"
@@ -0,0 +1,198 @@
+"""
+Session-level packed attendance storage.
+
+A class meeting (course, date) is one AttendanceSession row whose
+``statuses`` blob holds a 2-bit status code per student, ordered against a
+RosterSnapshot. The codes are the AttendanceRecord ones:
+
+    00 unmarked   01 present   10 absent   11 late
+
+which lets whole-session counts be taken with a few masks and popcounts.
+"""
+from django.db import transaction
+
+from .models import AttendanceRecord, AttendanceSession, Course, RosterSnapshot, Student
+
+BITS = 2
+SLOT_MASK = (1 << BITS) - 1
+
+
+# -------------------------
+# Packing
+# -------------------------
+def pack(codes):
+    value = 0
+    for index, code in enumerate(codes):
+        value |= (code & SLOT_MASK) << (index * BITS)
+    return value.to_bytes(byte_length(len(codes)), "little")
+
+
+def unpack(data, size):
+    value = int.from_bytes(data, "little")
+    return [(value >> (index * BITS)) & SLOT_MASK for index in range(size)]
+
+
+def byte_length(size):
+    return (size * BITS + 7) // 8
+
+
+def slot(data, index):
+    """Status code of a single roster slot, without unpacking the rest."""
+    byte = data[(index * BITS) // 8]
+    return (byte >> ((index * BITS) % 8)) & SLOT_MASK
+
+
+def _low_bits_mask(size):
+    # 0b0101...01: the low bit of every slot
+    return int("01" * size, 2) if size else 0
+
+
+def status_counts(data, size):
+    """
+    Count each status in a packed array using masks and popcount.
+
+    For a slot with high bit h and low bit l: present = l & ~h,
+    absent = h & ~l, late = l & h, unmarked = whatever is left.
+    """
+    value = int.from_bytes(data, "little")
+    low_mask = _low_bits_mask(size)
+    low = value & low_mask
+    high = (value >> 1) & low_mask
+
+    present = (low & ~high).bit_count()
+    absent = (high & ~low).bit_count()
+    late = (low & high).bit_count()
+    return {
+        "present": present,
+        "late": late,
+        "absent": absent,
+        "unmarked": size - present - absent - late,
+    }
+
+
+# -------------------------
+# Rosters
+# -------------------------
+def current_roster(course_id):
+    """
+    Return the latest RosterSnapshot of a course, snapshotting a new
+    version first if Course.students has changed since.
+    """
+    student_ids = sorted(
+        Course.students.through.objects.filter(course_id=course_id).values_list("student_id", flat=True)
+    )
+    latest = RosterSnapshot.objects.filter(course_id=course_id).order_by("-version").first()
+    if latest is not None and latest.student_ids == student_ids:
+        return latest
+    return RosterSnapshot.objects.create(
+        course_id=course_id,
+        version=latest.version + 1 if latest else 1,
+        student_ids=student_ids,
+    )
+
+
+# -------------------------
+# Writes
+# -------------------------
+def mark_session(course_id, date, statuses):
+    """
+    Write a whole class meeting.
+
+    ``statuses`` maps student id to status code. Students left out keep
+    their previous status for this date (or stay unmarked). Returns
+    ``(session, rejected)`` where ``rejected`` lists ids not on the roster.
+    """
+    with transaction.atomic():
+        roster = current_roster(course_id)
+        positions = {student_id: index for index, student_id in enumerate(roster.student_ids)}
+        codes = [AttendanceRecord.UNMARKED] * len(positions)
+
+        session = (
+            AttendanceSession.objects.select_for_update()
+            .select_related("roster")
+            .filter(course_id=course_id, date=date)
+            .first()
+        )
+        if session is not None:
+            # Carry earlier marks over, remapping if the roster moved on
+            old_ids = session.roster.student_ids
+            for student_id, code in zip(old_ids, unpack(session.statuses, len(old_ids))):
+                if student_id in positions:
+                    codes[positions[student_id]] = code
+
+        rejected = []
+        for student_id, code in statuses.items():
+            if student_id in positions:
+                codes[positions[student_id]] = code
+            else:
+                rejected.append(student_id)
+
+        if session is None:
+            session = AttendanceSession(course_id=course_id, date=date)
+        session.roster = roster
+        session.statuses = pack(codes)
+        session.save()
+
+    return session, rejected
+
+
+# -------------------------
+# Read adapters
+# -------------------------
+def iter_records(sessions, student_id=None):
+    """
+    Expand sessions into dicts shaped like AttendanceRecordSerializer output.
+
+    ``sessions`` must have ``roster`` loaded. Packed rows have no per-record
+    primary key, so ``id`` is a stable "<session id>:<student id>" string.
+    With ``student_id`` only that student's slot is read from each session.
+    """
+    sessions = list(sessions)
+    wanted = {student_id} if student_id is not None else {
+        sid for session in sessions for sid in session.roster.student_ids
+    }
+    names = dict(Student.objects.filter(id__in=wanted).values_list("id", "name"))
+
+    for session in sessions:
+        data = bytes(session.statuses)
+        for index, sid in enumerate(session.roster.student_ids):
+            if student_id is not None and sid != student_id:
+                continue
+            yield {
+                "id": f"{session.pk}:{sid}",
+                "studentId": sid,
+                "studentName": names.get(sid),
+                "courseId": session.course_id,
+                "date": session.date.isoformat(),
+                "status": AttendanceRecord.STATUS_NAMES[slot(data, index)],
+            }
+
+
+def session_counts(session):
+    return status_counts(bytes(session.statuses), len(session.roster.student_ids))
+
+
+def student_counts(sessions, student_id):
+    """
+    Per-course status totals of one student across packed sessions.
+
+    Returns ``{course_id: {"present": n, "late": n, "absent": n, "unmarked": n}}``
+    for every course where the student appears on a session roster.
+    """
+    result = {}
+    index_cache = {}
+    for session in sessions:
+        roster = session.roster
+        if roster.pk not in index_cache:
+            try:
+                index_cache[roster.pk] = roster.student_ids.index(student_id)
+            except ValueError:
+                index_cache[roster.pk] = None
+        index = index_cache[roster.pk]
+        if index is None:
+            continue
+
+        code = slot(bytes(session.statuses), index)
+        totals = result.setdefault(session.course_id, dict.fromkeys(("present", "late", "absent", "unmarked"), 0))
+        totals[AttendanceRecord.STATUS_NAMES[code]] += 1
+    return result
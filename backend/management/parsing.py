@@ -0,0 +1,26 @@
+"""
+Parsing of integer ids sent by clients, in query parameters, headers or
+JSON bodies.
+
+Every id accepted here fits a signed 64-bit column, so it can go straight
+into an ORM lookup without the database driver overflowing.
+"""
+MAX_ID = 2 ** 63 - 1
+
+
+def query_int(value):
+    """
+    A non-negative integer query parameter, or None when ``value`` is not one.
+
+    str.isdigit() alone also accepts digits such as "²" that int() rejects.
+    """
+    if not value.isascii():
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    # int() also takes signs, spaces and underscores
+    if not value.isdigit() or number > MAX_ID:
+        return None
+    return number
@@ -0,0 +1,203 @@
+"""
+On-demand cProfile of single API requests.
+
+RequestProfilingMiddleware runs a request under cProfile when either:
+
+- an admin asks for it with an ``X-Profile: 1`` header or ``?profile=1``, or
+- the request is picked by ``settings.PROFILING_SAMPLE_RATE`` (0 to 1).
+
+The stats are dumped to ``settings.PROFILING_DIR`` under a name holding the
+time, view, action and duration, which the response returns in
+``X-Profile-Id``. Only the newest ``PROFILING_KEEP`` dumps are kept. Admins
+read them back as top-N function tables from /api/profiles/, or open them
+with pstats or snakeviz.
+
+Without PROFILING_DIR the middleware removes itself at startup. Requests that
+are not picked pay for a dictionary lookup and, with a sample rate set, one
+random number. Only one request per process is profiled at a time.
+Under ASGI only the event-loop thread is profiled, so sync views run in
+worker threads show up as time spent waiting.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .authentication import ClaimsJWTAuthentication
+from .instrumentation import view_of
+
+HEADER = "HTTP_X_PROFILE"
+QUERY_PARAM = "profile"
+SUFFIX = ".prof"
+SORT_KEYS = ("cumulative", "tottime", "calls")
+DEFAULT_KEEP = 200
+
+_NAME = re.compile(r"^[\w.-]+\.prof$")
+_UNSAFE = re.compile(r"[^\w.-]+")
+_running = threading.Lock()
+
+
+def profile_dir():
+    return getattr(settings, "PROFILING_DIR", None)
+
+
+def asked(request):
+    return request.META.get(HEADER) == "1" or request.GET.get(QUERY_PARAM) == "1"
+
+
+def requested(request):
+    """Whether an admin asked for this request to be profiled."""
+    if not asked(request):
+        return False
+    try:
+        result = ClaimsJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return result is not None and result[0].role == "admin"
+
+
+async def arequested(request):
+    """requested() for the event loop: a token without claims is looked up in a thread."""
+    if not asked(request):
+        return False
+    user = await ClaimsJWTAuthentication().aauthenticate(request)
+    return user is not None and user.role == "admin"
+
+
+def sampled():
+    rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0)
+    return rate > 0 and random.random() < rate
+
+
+def dump_name(request, elapsed):
+    view, action = view_of(request)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%f")
+    parts = [stamp, request.method, (view or "unresolved").rsplit(".", 1)[-1], action or "", f"{elapsed * 1000:.0f}ms"]
+    return _UNSAFE.sub("_", "-".join(part for part in parts if part)) + SUFFIX
+
+
+def save(profile, request, elapsed):
+    """Write ``profile`` to PROFILING_DIR, drop the oldest dumps over PROFILING_KEEP, return its name."""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = dump_name(request, elapsed)
+    profile.dump_stats(os.path.join(directory, name))
+
+    keep = getattr(settings, "PROFILING_KEEP", DEFAULT_KEEP)
+    for old in dumps()[keep:]:
+        try:
+            os.remove(os.path.join(directory, old["name"]))
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def dumps():
+    """Stored profiles, newest first."""
+    directory = profile_dir()
+    if not directory or not os.path.isdir(directory):
+        return []
+    entries = []
+    for entry in os.scandir(directory):
+        if not entry.is_file() or not _NAME.match(entry.name):
+            continue
+        stat = entry.stat()
+        entries.append({
+            "name": entry.name,
+            "size": stat.st_size,
+            "createdAt": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+        })
+    entries.sort(key=lambda entry: entry["name"], reverse=True)
+    return entries
+
+
+def path_of(name):
+    """Full path of the stored profile ``name``, or None if there is none."""
+    directory = profile_dir()
+    if not directory or not _NAME.match(name):
+        return None
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
+
+
+def summary(path, top=20, sort="cumulative"):
+    """The ``top`` hottest functions of a stored profile, by ``sort``."""
+    stats = pstats.Stats(path, stream=io.StringIO())
+    stats.sort_stats(sort)
+    functions = []
+    for func in stats.fcn_list[:top]:
+        primitive, calls, own, cumulative, _ = stats.stats[func]
+        filename, line, name = func
+        functions.append({
+            "function": name,
+            "location": f"{filename}:{line}",
+            "calls": calls,
+            "primitiveCalls": primitive,
+            "ownSeconds": round(own, 6),
+            "cumulativeSeconds": round(cumulative, 6),
+        })
+    return {
+        "calls": stats.total_calls,
+        "seconds": round(stats.total_tt, 6),
+        "sort": sort,
+        "functions": functions,
+    }
+
+
+class RequestProfilingMiddleware:
+    """Profile admin-requested or sampled requests; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profile_dir():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (sampled() or requested(request)) or not _running.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profile = cProfile.Profile()
+            began = time.perf_counter()
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+            response["X-Profile-Id"] = save(profile, request, time.perf_counter() - began)
+            return response
+        finally:
+            _running.release()
+
+    async def __acall__(self, request):
+        if not (sampled() or await arequested(request)) or not _running.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            profile = cProfile.Profile()
+            began = time.perf_counter()
+            profile.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profile.disable()
+            # Writing the dump and pruning old ones is file I/O
+            response["X-Profile-Id"] = await sync_to_async(save)(profile, request, time.perf_counter() - began)
+            return response
+        finally:
+            _running.release()
@@ -0,0 +1,161 @@
+"""
+In-process publish/subscribe for pushing notifications to open streams.
+
+Subscribers are asyncio queues living on the ASGI server's event loop;
+publishers may be any thread (sync views run in a thread pool under ASGI),
+so delivery goes through ``loop.call_soon_threadsafe``.
+
+The broker class comes from ``settings.NOTIFICATION_BROKER``:
+
+* ``InMemoryBroker`` (default) fans out inside one process. Enough for
+  ``runserver`` or a single ASGI worker, no broker to run.
+* ``DatabasePollingBroker`` has each worker poll Notification for new ids
+  and fan out locally, so a notification created by any worker reaches
+  streams on every worker. One query per worker per interval, however many
+  clients are connected.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .feed import audiences_of
+from .models import Notification
+from .serializers import NotificationSerializer
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One open stream: a bounded queue plus the audiences it listens to."""
+
+    def __init__(self, audiences, loop):
+        self.audiences = tuple(audiences)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def deliver(self, message):
+        """Thread-safe: hand ``message`` to the subscriber's event loop."""
+        if not self.closed:
+            self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow to keep up; end the stream so the client reconnects
+            # and catches up from Last-Event-ID
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass  # get() notices once the queue drains
+
+    async def get(self):
+        """Next message, or None once the subscription is closed."""
+        if self.closed and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_audience = defaultdict(set)
+
+    def subscribe(self, audiences):
+        """Register a subscription. Must be called on the event loop that reads it."""
+        subscription = Subscription(audiences, asyncio.get_running_loop())
+        with self._lock:
+            for audience in subscription.audiences:
+                self._by_audience[audience].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self._lock:
+            for audience in subscription.audiences:
+                subscribers = self._by_audience.get(audience)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_audience[audience]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._by_audience.values()))
+
+    def publish(self, message, audiences):
+        """Deliver ``message`` once to every subscriber of any of ``audiences``."""
+        with self._lock:
+            targets = set()
+            for audience in audiences:
+                targets |= self._by_audience.get(audience, set())
+        for subscription in targets:
+            subscription.deliver(message)
+
+
+class DatabasePollingBroker(InMemoryBroker):
+    """
+    Multi-worker fan-out without a separate broker: a per-worker task reads
+    notifications newer than the last one it saw and publishes them locally.
+    Local ``publish`` calls are ignored, the poller picks the row up instead.
+    """
+
+    interval = 1.0
+
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+
+    def subscribe(self, audiences):
+        subscription = super().subscribe(audiences)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        return subscription
+
+    def publish(self, message, audiences):
+        pass
+
+    async def _poll(self):
+        latest = await Notification.objects.order_by("-id").only("id").afirst()
+        last_id = latest.id if latest else 0
+
+        # Stops with the last stream; the next subscriber starts a fresh poller
+        while self.subscriber_count():
+            await asyncio.sleep(self.interval)
+            async for notification in Notification.objects.filter(id__gt=last_id).order_by("id"):
+                last_id = notification.id
+                super().publish(NotificationSerializer(notification).data, audiences_of(notification))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, "NOTIFICATION_BROKER", "management.pubsub.InMemoryBroker")
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish_notification(notification):
+    """Push ``notification`` to open streams once the current transaction commits."""
+    message = NotificationSerializer(notification).data
+    audiences = audiences_of(notification)
+    transaction.on_commit(lambda: get_broker().publish(message, audiences))
@@ -0,0 +1,191 @@
+"""
+Chunked bulk deletes for the "delete all" endpoints.
+
+``QuerySet.delete()`` runs Django's Collector, which loads every cascaded
+row into memory before deleting anything and does it all in one
+transaction. Here the cascade graph is read from model metadata instead and
+turned into a plan of steps, children before parents. Each step deletes (or
+nulls out) its rows with raw SQL, in primary-key ranges of PURGE_CHUNK_SIZE
+rows, one short transaction per range. No model instances are built and no
+delete signals are sent.
+
+Because children always go first, stopping half-way never leaves dangling
+foreign keys; running the same purge again picks up where it left off.
+"""
+import logging
+import threading
+
+from django.db import connection, models, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+
+from . import response_cache, rollups
+from .models import Course, PurgeJob, Student, Teacher, User
+
+logger = logging.getLogger(__name__)
+
+PURGE_CHUNK_SIZE = 2000
+
+# target name -> root querysets deleted in order, with everything hanging off them
+PURGE_TARGETS = {
+    "students": lambda: [User.objects.filter(role="student")],
+    "teachers": lambda: [User.objects.filter(role="teacher")],
+    "courses": lambda: [Course.objects.all()],
+    "profiles": lambda: [Student.objects.all(), Teacher.objects.all()],
+}
+
+DELETE = "delete"
+SET_NULL = "set_null"
+
+
+class PurgeError(Exception):
+    pass
+
+
+def plan(queryset):
+    """
+    Return the steps that delete ``queryset`` and its cascades, bottom-up.
+
+    Each step is ``(action, queryset, field)``. Querysets reach the root
+    through nested ``__in`` subqueries, so they stay valid while earlier
+    steps remove rows below them.
+    """
+    steps = []
+    _plan(queryset, steps, path=(queryset.model,))
+    steps.append((DELETE, queryset, None))
+    return steps
+
+
+def _plan(parent, steps, path):
+    for related in get_candidate_relations_to_delete(parent.model._meta):
+        field = related.field
+        on_delete = field.remote_field.on_delete
+        if on_delete is models.DO_NOTHING:
+            continue
+
+        model = related.related_model
+        children = model._base_manager.filter(
+            **{f"{field.name}__in": parent.values(field.target_field.attname)}
+        )
+        if on_delete is models.CASCADE:
+            if model in path:
+                raise PurgeError(f"Cascade cycle through {model._meta.label}")
+            _plan(children, steps, path + (model,))
+            steps.append((DELETE, children, None))
+        elif on_delete is models.SET_NULL:
+            steps.append((SET_NULL, children, field))
+        else:
+            # PROTECT, RESTRICT, SET_DEFAULT and SET() need per-row handling
+            raise PurgeError(
+                f"{model._meta.label}.{field.name} uses {on_delete.__name__}; "
+                "it cannot be purged in bulk"
+            )
+
+
+def _chunks(queryset):
+    """Yield consecutive pk ranges covering at most PURGE_CHUNK_SIZE matching rows each."""
+    queryset = queryset.order_by()
+    last = None
+    while True:
+        remaining = queryset if last is None else queryset.filter(pk__gt=last)
+        bound = (
+            remaining.order_by("pk")
+            .values_list("pk", flat=True)[PURGE_CHUNK_SIZE - 1:PURGE_CHUNK_SIZE]
+            .first()
+        )
+        if bound is None:
+            yield remaining
+            return
+        yield remaining.filter(pk__lte=bound)
+        last = bound
+
+
+def run(queryset, progress=None):
+    """
+    Delete ``queryset`` and everything that cascades from it.
+
+    ``progress`` is called after every chunk with a dict of rows affected
+    so far, keyed by model label. Returns that dict.
+    """
+    counts = {}
+    for action, steps_qs, field in plan(queryset):
+        label = steps_qs.model._meta.label
+        for chunk in _chunks(steps_qs):
+            with transaction.atomic(using=chunk.db):
+                if action == DELETE:
+                    affected = chunk._raw_delete(chunk.db)
+                else:
+                    affected = chunk.update(**{field.name: None})
+            if affected:
+                counts[label] = counts.get(label, 0) + affected
+                if progress is not None:
+                    progress(counts)
+    return counts
+
+
+def purge(target, progress=None):
+    """Run every root of a PURGE_TARGETS entry. Returns rows affected by model label."""
+    counts = {}
+
+    def report(step_counts):
+        if progress is not None:
+            merged = dict(counts)
+            for label, n in step_counts.items():
+                merged[label] = merged.get(label, 0) + n
+            progress(merged)
+
+    try:
+        for root in PURGE_TARGETS[target]():
+            for label, n in run(root, report).items():
+                counts[label] = counts.get(label, 0) + n
+        if counts.get("management.AttendanceRecord") or counts.get("management.ArchivedAttendanceRecord"):
+            # Surviving courses may have lost records from their daily totals
+            rollups.rebuild()
+    finally:
+        # Raw deletes send no signals
+        response_cache.clear()
+    return counts
+
+
+# -------------------------
+# Background jobs
+# -------------------------
+def run_job(job_id):
+    """Execute a queued PurgeJob, recording progress on the row as it goes."""
+    job = PurgeJob.objects.get(pk=job_id)
+    PurgeJob.objects.filter(pk=job.pk).update(status=PurgeJob.RUNNING, started_at=timezone.now())
+
+    def report(counts):
+        PurgeJob.objects.filter(pk=job.pk).update(deleted=counts)
+
+    try:
+        counts = purge(job.target, report)
+    except Exception as exc:
+        logger.exception("Purge job %s failed", job.pk)
+        PurgeJob.objects.filter(pk=job.pk).update(
+            status=PurgeJob.FAILED, error=str(exc), finished_at=timezone.now()
+        )
+        return
+    PurgeJob.objects.filter(pk=job.pk).update(
+        status=PurgeJob.DONE, deleted=counts, finished_at=timezone.now()
+    )
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connection.close()
+
+
+def start_job(target):
+    """
+    Queue a purge and run it on a worker thread, so the request returns
+    straight away. Poll the returned job for progress.
+    """
+    job = PurgeJob.objects.create(target=target)
+    # Start only once the job row is visible to the thread's own connection
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True).start()
+    )
+    return job
@@ -0,0 +1,165 @@
+"""
+Cached list/retrieve responses for the course, student and teacher viewsets.
+
+Entries are keyed by resource, the caller's scope (role plus profile id
+where the result depends on it), the action and the full request path.
+Each key also embeds the current version of two tags: the scope's own tag
+(e.g. ``courses:teacher:7``) and a global one. Signal handlers in
+``management.signals`` bump exactly the tags a write can affect; bumping
+gives the tag a fresh random version, so stale entries are simply never
+read again and age out of the cache.
+
+Backed by the ``responses`` cache alias (see settings.CACHES).
+"""
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+CACHE_ALIAS = "responses"
+GLOBAL_TAG = "all-responses"
+RESOURCES = ("courses", "students", "teachers")
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+# -------------------------
+# Tags
+# -------------------------
+def tag(resource, scope):
+    return f"{resource}:{scope}"
+
+
+def _tag_key(name):
+    return f"tag:{name}"
+
+
+def tag_versions(names):
+    """
+    Current version of each tag. Missing tags (never set, or evicted) get
+    a fresh version, so an entry is never keyed on a version that could
+    come back later.
+    """
+    cache = get_cache()
+    keys = [_tag_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key) or ""
+    return [versions[key] for key in keys]
+
+
+def bump(tags):
+    """
+    Invalidate every entry depending on ``tags``: right away, so the writer
+    reads its own change, and again on commit, in case another request
+    cached the old rows in between.
+    """
+    tags = set(tags)
+    if not tags:
+        return
+
+    def invalidate():
+        get_cache().set_many({_tag_key(name): uuid.uuid4().hex for name in tags}, None)
+
+    invalidate()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(invalidate)
+
+
+def clear():
+    """Invalidate everything, e.g. after writes that send no signals."""
+    bump([GLOBAL_TAG])
+
+
+# -------------------------
+# Statistics
+# -------------------------
+def _stat_key(resource, outcome):
+    return f"stats:{resource}:{outcome}"
+
+
+def record(resource, outcome):
+    metrics.RESPONSE_CACHE.labels(resource, outcome).inc()
+    cache = get_cache()
+    key = _stat_key(resource, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First one; if another request just added it, count on top of that
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass
+
+
+def stats():
+    """Hit/miss counts per resource since the cache was last emptied."""
+    keys = {
+        (resource, outcome): _stat_key(resource, outcome)
+        for resource in RESOURCES
+        for outcome in ("hits", "misses")
+    }
+    values = get_cache().get_many(keys.values())
+    result = {}
+    for (resource, outcome), key in keys.items():
+        result.setdefault(resource, {})[outcome] = values.get(key, 0)
+    for counts in result.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hitRate"] = round(counts["hits"] / lookups, 3) if lookups else None
+    return result
+
+
+# -------------------------
+# Viewset integration
+# -------------------------
+class CachedResponseMixin:
+    """
+    Serve ``list`` and ``retrieve`` from the response cache.
+
+    Subclasses set ``cache_resource`` and implement ``cache_scope(user)``,
+    returning the scope whose tag a response depends on. Only JSON
+    responses with status 200 are cached.
+    """
+    cache_resource = None
+    cache_timeout = 300
+
+    def cache_scope(self, user):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response("list", super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response("retrieve", super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, action, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return handler(request, *args, **kwargs)
+
+        resource = self.cache_resource
+        scope = self.cache_scope(request.user)
+        versions = tag_versions([GLOBAL_TAG, tag(resource, scope)])
+        raw = "|".join([resource, scope, action, request.get_full_path(), *versions])
+        key = "response:" + hashlib.sha1(raw.encode()).hexdigest()
+
+        cache = get_cache()
+        body = cache.get(key)
+        if body is not None:
+            record(resource, "hits")
+            return HttpResponse(body, content_type="application/json")
+
+        record(resource, "misses")
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, JSONRenderer().render(response.data), self.cache_timeout)
+        return response
@@ -0,0 +1,206 @@
+"""
+Per-(course, day) attendance totals and the teacher analytics built on them.
+
+DailyAttendanceRollup is maintained like AttendanceCounter: saved records
+apply deltas with ``track`` from post_save, deletes and bulk writes
+recompute the touched days with ``refresh`` or ``track``. Archiving a term leaves its days' rollups in place. Every
+analytics figure is a GROUP BY over rollups or counters, so its cost
+follows the number of days, weeks or students asked for rather than the
+number of records behind them.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncWeek
+
+from . import counters
+from .counters import COUNTER_FIELDS
+from .models import ArchivedAttendanceRecord, AttendanceCounter, AttendanceRecord, DailyAttendanceRollup
+
+# Analytics window when the caller gives no dates
+DEFAULT_WINDOW_DAYS = 30
+
+
+# -------------------------
+# Maintenance
+# -------------------------
+def track(added=(), removed=()):
+    """
+    Apply incremental changes to the rollups.
+
+    ``added`` and ``removed`` are iterables of (course_id, date, status code)
+    tuples describing records that were just written or deleted. A day with
+    no rollup row yet, or whose counts would go below zero, is recomputed
+    with ``refresh`` instead.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for course_id, date, status in added:
+        deltas[(course_id, date)][counters.counter_field(status)] += 1
+    for course_id, date, status in removed:
+        deltas[(course_id, date)][counters.counter_field(status)] -= 1
+
+    stale = []
+    with transaction.atomic():
+        for (course_id, date), fields in deltas.items():
+            changes = {f: F(f) + d for f, d in fields.items() if d}
+            if not changes:
+                continue
+            enough = Q(**{f"{f}__gte": -d for f, d in fields.items() if d < 0})
+            if not DailyAttendanceRollup.objects.filter(enough, course_id=course_id, date=date).update(**changes):
+                stale.append((course_id, date))
+        refresh(stale)
+
+
+def compute(**filters):
+    """
+    Aggregate rollup values straight from the records, live and archived,
+    keyed by (course_id, date). ``filters`` narrow both tables.
+    """
+    result = {}
+    for model in (AttendanceRecord, ArchivedAttendanceRecord):
+        rows = (
+            model.objects.filter(**filters)
+            .values("course_id", "date")
+            .annotate(
+                n_total=Count("id"),
+                n_present=Count("id", filter=Q(status=AttendanceRecord.PRESENT)),
+                n_late=Count("id", filter=Q(status=AttendanceRecord.LATE)),
+                n_absent=Count("id", filter=Q(status=AttendanceRecord.ABSENT)),
+            )
+            .order_by()
+        )
+        for row in rows:
+            values = result.setdefault((row["course_id"], row["date"]), dict.fromkeys(COUNTER_FIELDS, 0))
+            values["present"] += row["n_present"]
+            values["late"] += row["n_late"]
+            values["absent"] += row["n_absent"]
+            values["unmarked"] += row["n_total"] - row["n_present"] - row["n_late"] - row["n_absent"]
+    return result
+
+
+def refresh(keys):
+    """Recompute the rollups of the given (course_id, date) pairs."""
+    keys = set(keys)
+    if not keys:
+        return
+
+    computed = compute(
+        course_id__in={c for c, _ in keys},
+        date__in={d for _, d in keys},
+    )
+    zero = dict.fromkeys(COUNTER_FIELDS, 0)
+
+    DailyAttendanceRollup.objects.bulk_create(
+        [
+            DailyAttendanceRollup(course_id=course_id, date=date, **computed.get((course_id, date), zero))
+            for course_id, date in keys
+        ],
+        update_conflicts=True,
+        unique_fields=["course", "date"],
+        update_fields=list(COUNTER_FIELDS),
+        batch_size=500,
+    )
+
+
+def rebuild():
+    """Throw away every rollup and recompute the table from scratch."""
+    computed = compute()
+    with transaction.atomic():
+        DailyAttendanceRollup.objects.all().delete()
+        DailyAttendanceRollup.objects.bulk_create(
+            [
+                DailyAttendanceRollup(course_id=course_id, date=date, **values)
+                for (course_id, date), values in computed.items()
+            ],
+            batch_size=500,
+        )
+    return len(computed)
+
+
+def verify():
+    """
+    Compare stored rollups with AttendanceRecord.
+
+    Returns a list of (course_id, date, stored, expected) mismatches.
+    """
+    computed = compute()
+    zero = dict.fromkeys(COUNTER_FIELDS, 0)
+
+    stored = {
+        (row["course_id"], row["date"]): {f: row[f] for f in COUNTER_FIELDS}
+        for row in DailyAttendanceRollup.objects.values("course_id", "date", *COUNTER_FIELDS)
+    }
+
+    mismatches = []
+    for key in stored.keys() | computed.keys():
+        have = stored.get(key, zero)
+        want = computed.get(key, zero)
+        if have != want:
+            mismatches.append((key[0], key[1], have, want))
+    return mismatches
+
+
+# -------------------------
+# Analytics
+# -------------------------
+def rates(row):
+    """Counter values plus present/late/absent and overall attendance rates in percent."""
+    total = counters.total(row)
+    result = {field: row[field] for field in COUNTER_FIELDS}
+    result["total"] = total
+    for field in ("present", "late", "absent"):
+        result[f"{field}Rate"] = round(row[field] / total * 100, 1) if total else 0
+    result["attendanceRate"] = counters.percentage(row)
+    return result
+
+
+def _sums(prefix=""):
+    return {field: Sum(f"{prefix}{field}") for field in COUNTER_FIELDS}
+
+
+def course_totals(course_ids):
+    """Lifetime totals per course, summed over the per-student counters."""
+    rows = (
+        AttendanceCounter.objects.filter(course_id__in=course_ids)
+        .values("course_id", "course__name")
+        .annotate(**_sums())
+        .order_by("course_id")
+    )
+    return [
+        {"courseId": row["course_id"], "courseName": row["course__name"], **rates(row)}
+        for row in rows
+    ]
+
+
+def daily(course_ids, start, end):
+    rows = (
+        DailyAttendanceRollup.objects.filter(course_id__in=course_ids, date__range=(start, end))
+        .values("course_id", "date", *COUNTER_FIELDS)
+        .order_by("course_id", "date")
+    )
+    return [{"courseId": row["course_id"], "date": row["date"], **rates(row)} for row in rows]
+
+
+def weekly(course_ids, start, end):
+    rows = (
+        DailyAttendanceRollup.objects.filter(course_id__in=course_ids, date__range=(start, end))
+        .annotate(week=TruncWeek("date"))
+        .values("course_id", "week")
+        .annotate(**_sums())
+        .order_by("course_id", "week")
+    )
+    return [{"courseId": row["course_id"], "weekStart": row["week"], **rates(row)} for row in rows]
+
+
+def students(course_id):
+    """Per-student totals within one course, read from the counters."""
+    rows = (
+        AttendanceCounter.objects.filter(course_id=course_id)
+        .values("student_id", "student__name", *COUNTER_FIELDS)
+        .order_by("student__name", "student_id")
+    )
+    return [
+        {"studentId": row["student_id"], "studentName": row["student__name"], **rates(row)}
+        for row in rows
+    ]
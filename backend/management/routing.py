@@ -0,0 +1,202 @@
+"""
+Primary/replica database routing.
+
+``settings.DATABASE_REPLICAS`` lists read-only copies of ``default``. The
+router sends reads to one of them only while the current request allows
+it (see ReplicaRoutingMiddleware): the request must be a safe-method one,
+must not have written yet, and the client must not have written in the
+last ``REPLICA_STICKY_SECONDS``; those pins are kept in the
+``REPLICA_STICKY_CACHE`` cache, which every worker must share. Anything else, including every read in
+management commands and background threads, reads from the primary.
+``replica_reads()`` opts a block of code in explicitly.
+
+A replica more than ``MAX_REPLICA_LAG`` seconds behind is skipped. Lag is
+the difference between the ReplicationHeartbeat row on the primary and on
+the replica; run ``manage.py replication_heartbeat`` next to the primary
+to keep it moving. Without heartbeats the replicas count as current.
+"""
+import contextvars
+import hashlib
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+LAG_CHECK_INTERVAL = 5  # seconds a measured lag is trusted for
+
+
+class RoutingState:
+    """What the router may do for the code running in one context."""
+
+    def __init__(self, replica_reads=False):
+        self.replica_reads = replica_reads
+        self.wrote = False
+
+
+_state = contextvars.ContextVar("db_routing", default=None)
+
+
+@contextmanager
+def replica_reads():
+    """Let reads in this block go to a replica, until something writes."""
+    token = _state.set(RoutingState(replica_reads=True))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+# -------------------------
+# Replica health
+# -------------------------
+_lags = {}
+_lags_lock = threading.Lock()
+_rotation = itertools.count()
+
+
+def reset():
+    """Forget measured lags, e.g. after replicas were reconfigured."""
+    with _lags_lock:
+        _lags.clear()
+
+
+def _heartbeat(alias):
+    from .models import ReplicationHeartbeat
+
+    return ReplicationHeartbeat.objects.using(alias).filter(pk=1).values_list("beat_at", flat=True).first()
+
+
+def measure_lag(alias):
+    """Seconds ``alias`` is behind the primary; infinite when unreachable."""
+    try:
+        replica = _heartbeat(alias)
+    except DatabaseError:
+        return float("inf")
+    primary = _heartbeat(DEFAULT_DB_ALIAS)
+    if primary is None:
+        return 0.0
+    if replica is None:
+        return float("inf")
+    return max(0.0, (primary - replica).total_seconds())
+
+
+def replica_lag(alias):
+    now = time.monotonic()
+    with _lags_lock:
+        checked = _lags.get(alias)
+    if checked is not None and now - checked[0] < LAG_CHECK_INTERVAL:
+        return checked[1]
+    lag = measure_lag(alias)
+    with _lags_lock:
+        _lags[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    limit = getattr(settings, "MAX_REPLICA_LAG", 10)
+    return [
+        alias for alias in getattr(settings, "DATABASE_REPLICAS", ())
+        if replica_lag(alias) <= limit
+    ]
+
+
+# -------------------------
+# Router
+# -------------------------
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica_reads or state.wrote:
+            return DEFAULT_DB_ALIAS
+        # Read your own uncommitted writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = healthy_replicas()
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return replicas[next(_rotation) % len(replicas)]
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+# -------------------------
+# Middleware
+# -------------------------
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def pin_cache():
+    """
+    Cache of the clients that wrote recently, named by REPLICA_STICKY_CACHE.
+    It must be shared by every worker for the pins to hold.
+    """
+    return caches[getattr(settings, "REPLICA_STICKY_CACHE", DEFAULT_CACHE_ALIAS)]
+
+
+def _client_key(request):
+    credentials = request.headers.get("Authorization") or request.COOKIES.get("sessionid")
+    if not credentials:
+        return None
+    return "db-pin:" + hashlib.sha1(credentials.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Allow replica reads for safe-method requests, and keep a client on the
+    primary for a while after it writes so it reads its own changes.
+    Works in both sync and async stacks, so async views stay off threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, "DATABASE_REPLICAS", ()):
+            return self.get_response(request)
+
+        key = _client_key(request)
+        state = RoutingState(replica_reads=request.method in SAFE_METHODS and not (key and pin_cache().get(key)))
+        token = _state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            _state.reset(token)
+            if state.wrote and key is not None:
+                pin_cache().set(key, 1, getattr(settings, "REPLICA_STICKY_SECONDS", 5))
+
+    async def __acall__(self, request):
+        if not getattr(settings, "DATABASE_REPLICAS", ()):
+            return await self.get_response(request)
+
+        key = _client_key(request)
+        state = RoutingState(replica_reads=request.method in SAFE_METHODS and not (key and await pin_cache().aget(key)))
+        token = _state.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            _state.reset(token)
+            if state.wrote and key is not None:
+                await pin_cache().aset(key, 1, getattr(settings, "REPLICA_STICKY_SECONDS", 5))
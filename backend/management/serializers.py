@@ -1,6 +1,8 @@
 from typing import __all__
 from rest_framework import serializers 
-from .models import Notification,Feedback , Student, Teacher, Course, AttendanceRecord
+from .models import Notification,Feedback , Student, Teacher, Course, AttendanceRecord, PurgeJob, Term
+from . import terms
+from django.db.models import Prefetch
 from django.contrib.auth import authenticate
 from .models import User
 from django.contrib.auth import get_user_model
@@ -15,6 +17,10 @@ class StudentSerializer(serializers.ModelSerializer):
         model = Student
         fields = [ "id", "name", "dept", "email"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("user")
+
     def create(self, validated_data):
         user_data = validated_data.pop("user")
         email = user_data.get("email")  
@@ -72,6 +78,10 @@ class TeacherSerializer(serializers.ModelSerializer):
         model = Teacher
         fields = ["id", "name", "dept", "email"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("user")
+
     def create(self, validated_data):
         user_data = validated_data.pop("user")
         email = user_data["email"]
@@ -128,6 +138,25 @@ class CourseSerializer(serializers.ModelSerializer):
         model = Course
         fields = ['id', 'name', 'teacherId', 'studentIds']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # studentIds only needs the primary keys of the roster
+        return queryset.prefetch_related(
+            Prefetch("students", queryset=Student.objects.only("id"))
+        )
+
+class AttendanceStatusField(serializers.ChoiceField):
+    """Reads and writes the status name while the model stores its integer code."""
+
+    def __init__(self, **kwargs):
+        super().__init__(choices=list(AttendanceRecord.STATUS_CODES), **kwargs)
+
+    def to_internal_value(self, data):
+        return AttendanceRecord.STATUS_CODES[super().to_internal_value(data)]
+
+    def to_representation(self, value):
+        return AttendanceRecord.STATUS_NAMES.get(value, "unmarked")
+
 class AttendanceRecordSerializer(serializers.ModelSerializer):
     studentId = serializers.PrimaryKeyRelatedField(
         source='student',
@@ -141,6 +170,7 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         source='course',
         queryset=Course.objects.all()
     )
+    status = AttendanceStatusField(required=False)
     class Meta:
         model = AttendanceRecord
         fields = [
@@ -152,6 +182,16 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
             'status'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("student")
+
+    def validate_date(self, value):
+        term = terms.locked_term(value, terms.locked_terms())
+        if term:
+            raise serializers.ValidationError(f"{term} is archived; its attendance can no longer change")
+        return value
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
@@ -195,8 +235,45 @@ class FeedbackSerializer(serializers.ModelSerializer):
             "created_at",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("student", "course")
+
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ["id", "title", "message", "role", "created_at"]
\ No newline at end of file
+        fields = ["id", "title", "message", "role", "created_at"]
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PurgeJob
+        fields = ["id", "target", "status", "deleted", "error", "created_at", "started_at", "finished_at"]
+        read_only_fields = fields
+
+class TermSerializer(serializers.ModelSerializer):
+    startDate = serializers.DateField(source="start_date")
+    endDate = serializers.DateField(source="end_date")
+    archivedAt = serializers.DateTimeField(source="archived_at", read_only=True)
+
+    class Meta:
+        model = Term
+        fields = ["id", "name", "startDate", "endDate", "status", "archivedAt"]
+        read_only_fields = ["status"]
+
+    def validate(self, attrs):
+        start = attrs.get("start_date", getattr(self.instance, "start_date", None))
+        end = attrs.get("end_date", getattr(self.instance, "end_date", None))
+        if start > end:
+            raise serializers.ValidationError({"endDate": "Must not be before startDate"})
+        if self.instance is not None and self.instance.status != Term.OPEN and (
+            start != self.instance.start_date or end != self.instance.end_date
+        ):
+            raise serializers.ValidationError("The dates of an archived term cannot change")
+
+        overlapping = Term.objects.filter(start_date__lte=end, end_date__gte=start)
+        if self.instance is not None:
+            overlapping = overlapping.exclude(pk=self.instance.pk)
+        if overlapping.exists():
+            raise serializers.ValidationError("Terms must not overlap")
+        return attrs
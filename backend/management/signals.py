@@ -0,0 +1,179 @@
+"""
+Response cache invalidation, plus keeping the attendance counters and
+daily rollups in step with saved records and cascading deletes.
+
+Each handler works out which cached course/student/teacher responses a
+write can change and bumps only those tags (see response_cache). Deletes
+collect their tags in pre_delete, while the enrollment rows still exist,
+and bump them in post_delete.
+
+A saved AttendanceRecord, through the API, the admin or a plain .save(),
+updates its counter and rollup here. Record deletes have no receiver: one
+would turn every queryset delete into a row-by-row one, and archiving a
+term deletes records whose counts must stay. Deleting code updates the
+counters and rollups itself.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from . import counters, response_cache, rollups
+from .models import ArchivedAttendanceRecord, AttendanceRecord, Course, Student, Teacher, User
+from .response_cache import tag
+
+Enrollment = Course.students.through
+
+# Sent once by bulk.sync_roster with the course and the student ids added
+# and removed, where course.students.add/remove would send m2m_changed.
+roster_changed = Signal()
+
+
+def course_tags(course_ids=(), teacher_ids=(), student_ids=()):
+    """
+    Tags of the course lists showing any of these courses.
+
+    Admins see every course; teachers and students only their own. Pass the
+    teachers and students of the courses where they are already known.
+    """
+    teacher_ids = set(teacher_ids)
+    student_ids = set(student_ids)
+    if course_ids:
+        teacher_ids |= set(Course.objects.filter(pk__in=course_ids).values_list("teacher_id", flat=True))
+        student_ids |= set(Enrollment.objects.filter(course_id__in=course_ids).values_list("student_id", flat=True))
+    return (
+        {tag("courses", "all")}
+        | {tag("courses", f"teacher:{t}") for t in teacher_ids}
+        | {tag("courses", f"student:{s}") for s in student_ids}
+    )
+
+
+def student_tags(student_ids):
+    return {tag("students", "all")} | {tag("students", f"student:{s}") for s in student_ids}
+
+
+# -------------------------
+# Course
+# -------------------------
+@receiver(post_init, sender=Course)
+def remember_course_teacher(sender, instance, **kwargs):
+    # Lets post_save invalidate the old teacher's list when a course moves
+    instance._loaded_teacher_id = instance.teacher_id
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, **kwargs):
+    teachers = {instance.teacher_id, getattr(instance, "_loaded_teacher_id", None)} - {None}
+    students = () if created else Enrollment.objects.filter(course_id=instance.pk).values_list("student_id", flat=True)
+    response_cache.bump(course_tags(teacher_ids=teachers, student_ids=students))
+    instance._loaded_teacher_id = instance.teacher_id
+
+
+@receiver(pre_delete, sender=Course)
+def course_deleting(sender, instance, **kwargs):
+    instance._cache_tags = course_tags(course_ids=[instance.pk], teacher_ids=[instance.teacher_id])
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    response_cache.bump(getattr(instance, "_cache_tags", course_tags(teacher_ids=[instance.teacher_id])))
+
+
+@receiver(m2m_changed, sender=Enrollment)
+def enrollment_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action == "pre_clear":
+        # Nothing tells post_clear who was removed
+        if reverse:
+            instance._cleared_ids = set(instance.courses.values_list("pk", flat=True))
+        else:
+            instance._cleared_ids = set(instance.students.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    changed = pk_set if action != "post_clear" else getattr(instance, "_cleared_ids", set())
+    if reverse:
+        # student.courses.add(...): pk_set holds course ids
+        teachers = Course.objects.filter(pk__in=changed).values_list("teacher_id", flat=True)
+        tags = course_tags(teacher_ids=teachers, student_ids=[instance.pk])
+    else:
+        tags = course_tags(teacher_ids=[instance.teacher_id], student_ids=changed)
+    response_cache.bump(tags)
+
+
+@receiver(roster_changed, sender=Course)
+def roster_synced(sender, course, added, removed, **kwargs):
+    response_cache.bump(course_tags(teacher_ids=[course.teacher_id], student_ids=[*added, *removed]))
+
+
+# -------------------------
+# Attendance records
+# -------------------------
+@receiver(pre_save, sender=AttendanceRecord)
+def record_saving(sender, instance, raw=False, **kwargs):
+    # Read back here rather than remembered in post_init, which every record
+    # loaded by a list or an export would pay for
+    instance._counted = None
+    if not raw and not instance._state.adding:
+        instance._counted = (
+            AttendanceRecord.objects.filter(pk=instance.pk).values_list("student_id", "course_id", "date", "status").first()
+        )
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def record_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, "_counted", None)
+    after = (instance.student_id, instance.course_id, instance.date, instance.status)
+    if before == after:
+        return
+    before = [before] if before else []
+    student_id, course_id, date, status = after
+    counters.track(added=[(student_id, course_id, status)], removed=[(s, c, st) for s, c, _, st in before])
+    rollups.track(added=[(course_id, date, status)], removed=[(c, d, st) for _, c, d, st in before])
+
+
+# -------------------------
+# Student / Teacher
+# -------------------------
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, **kwargs):
+    response_cache.bump(student_tags([instance.pk]))
+
+
+@receiver(pre_delete, sender=Student)
+def student_deleting(sender, instance, **kwargs):
+    # Course lists show studentIds, and the enrollment rows go with the student
+    course_ids = list(Enrollment.objects.filter(student_id=instance.pk).values_list("course_id", flat=True))
+    instance._cache_tags = student_tags([instance.pk]) | course_tags(course_ids=course_ids, student_ids=[instance.pk])
+    # Their attendance records cascade away, taking a share of each day's totals
+    instance._rollup_keys = {
+        key
+        for model in (AttendanceRecord, ArchivedAttendanceRecord)
+        for key in model.objects.filter(student_id=instance.pk).values_list("course_id", "date").distinct()
+    }
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    response_cache.bump(getattr(instance, "_cache_tags", student_tags([instance.pk])))
+    rollups.refresh(getattr(instance, "_rollup_keys", ()))
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def teacher_changed(sender, instance, **kwargs):
+    response_cache.bump({tag("teachers", "all")})
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Student and teacher lists show the user's email
+    if created or (update_fields and set(update_fields) <= {"last_login", "password"}):
+        return
+    tags = set()
+    student_id = Student.objects.filter(user_id=instance.pk).values_list("pk", flat=True).first()
+    if student_id:
+        tags |= student_tags([student_id])
+    if Teacher.objects.filter(user_id=instance.pk).exists():
+        tags.add(tag("teachers", "all"))
+    response_cache.bump(tags)
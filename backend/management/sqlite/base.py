@@ -0,0 +1,53 @@
+"""
+SQLite backend that queues write transactions inside the process.
+
+SQLite's busy handler retries with growing sleeps, so under load a waiting
+writer can lose the race to newer ones again and again. With
+``transaction_mode`` set to IMMEDIATE every atomic block is a writer; this
+backend makes those take a process-wide lock before ``BEGIN IMMEDIATE`` so
+threads get the write lock roughly in arrival order. Other processes still
+wait on ``busy_timeout``.
+"""
+import threading
+
+from django.db.backends.sqlite3 import base
+
+_write_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _holds_write_lock = False
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode != "IMMEDIATE":
+            return super()._start_transaction_under_autocommit()
+        _write_lock.acquire()
+        self._holds_write_lock = True
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self._release_write_lock()
+            raise
+
+    def _release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            _write_lock.release()
+
+    def _commit(self):
+        try:
+            super()._commit()
+        finally:
+            self._release_write_lock()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self._release_write_lock()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_write_lock()
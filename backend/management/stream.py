@@ -0,0 +1,91 @@
+"""
+Server-Sent Events stream of the caller's notifications.
+
+A plain async Django view rather than a DRF one, so an open stream costs
+one coroutine and no thread. It only streams under ASGI
+(``uvicorn backend.asgi:application``); a WSGI server would try to buffer
+the endless response.
+"""
+import asyncio
+import json
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .authentication import ClaimsJWTAuthentication
+from .feed import audiences_for, notifications_for
+from .parsing import query_int
+from .pubsub import get_broker
+from .serializers import NotificationSerializer
+
+HEARTBEAT_SECONDS = 15
+BACKLOG_LIMIT = 100
+
+
+def event(payload):
+    return f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+
+
+def last_event_id(request):
+    """Id of the last notification a reconnecting client saw, or 0."""
+    value = request.headers.get("Last-Event-ID") or request.GET.get("lastEventId") or ""
+    return query_int(value) or 0
+
+
+async def events(broker, subscription, backlog, last_id):
+    try:
+        yield "retry: 5000\n\n"
+        for payload in backlog:
+            last_id = payload["id"]
+            yield event(payload)
+
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if payload is None:
+                return
+            # The backlog may already have covered it
+            if payload["id"] > last_id:
+                last_id = payload["id"]
+                yield event(payload)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@require_GET
+async def notification_stream(request):
+    """
+    Push the caller's new notifications (broadcast, role and personal) as
+    they are created. Reconnecting clients send Last-Event-ID (or
+    ``?lastEventId=``) and get what they missed first.
+    """
+    # EventSource cannot send headers, so ?token= is accepted as well
+    user = await ClaimsJWTAuthentication().aauthenticate(request, token_param="token")
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    audiences = audiences_for(user)
+    broker = get_broker()
+    # Subscribe before reading the backlog so nothing falls in between
+    subscription = broker.subscribe(audiences)
+
+    last_id = last_event_id(request)
+    backlog = []
+    if last_id:
+        qs = notifications_for(user).filter(id__gt=last_id).order_by("id")[:BACKLOG_LIMIT]
+        try:
+            backlog = [NotificationSerializer(n).data async for n in qs]
+        except BaseException:
+            broker.unsubscribe(subscription)
+            raise
+
+    response = StreamingHttpResponse(
+        events(broker, subscription, backlog, last_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,120 @@
+"""
+Academic terms and archiving their attendance.
+
+``archive`` moves a closed term's AttendanceRecord rows into
+ArchivedAttendanceRecord in short chunked transactions, and keeps per-term
+ArchivedAttendanceTotal rows alongside. The hot table and its indexes then
+only hold open terms. Counters and daily rollups are lifetime figures and
+are left alone, so the summary and the analytics keep showing history
+without reading the archive.
+
+A term stops accepting attendance the moment archiving starts.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .models import ArchivedAttendanceRecord, ArchivedAttendanceTotal, AttendanceRecord, Term
+
+ARCHIVE_CHUNK_SIZE = 2000
+WRITE_BATCH_SIZE = 500
+
+
+class TermError(Exception):
+    pass
+
+
+def locked_terms():
+    """(start_date, end_date, name) of every term whose attendance can no longer change."""
+    return list(Term.objects.exclude(status=Term.OPEN).values_list("start_date", "end_date", "name"))
+
+
+def locked_term(date, terms):
+    """Name of the term in ``terms`` (from locked_terms) covering ``date``, if any."""
+    for start, end, name in terms:
+        if start <= date <= end:
+            return name
+    return None
+
+
+def _add_totals(term, rows):
+    """Fold (id, student_id, course_id, date, status) rows into the term's archived totals."""
+    deltas = defaultdict(lambda: dict.fromkeys(counters.COUNTER_FIELDS, 0))
+    for _, student_id, course_id, _, status in rows:
+        deltas[(student_id, course_id)][counters.counter_field(status)] += 1
+
+    existing = {
+        (row["student_id"], row["course_id"]): row
+        for row in ArchivedAttendanceTotal.objects.filter(
+            term=term,
+            student_id__in={s for s, _ in deltas},
+            course_id__in={c for _, c in deltas},
+        ).values("student_id", "course_id", *counters.COUNTER_FIELDS)
+    }
+
+    # Write back the summed values; one upsert instead of a CASE per row
+    for key, values in deltas.items():
+        if key in existing:
+            for field in counters.COUNTER_FIELDS:
+                values[field] += existing[key][field]
+    ArchivedAttendanceTotal.objects.bulk_create(
+        [
+            ArchivedAttendanceTotal(term=term, student_id=student_id, course_id=course_id, **values)
+            for (student_id, course_id), values in deltas.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["term", "student", "course"],
+        update_fields=list(counters.COUNTER_FIELDS),
+        batch_size=WRITE_BATCH_SIZE,
+    )
+
+
+def archive(term, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """
+    Move ``term``'s attendance into the archive tables. Safe to rerun after
+    an interruption: every chunk is moved in one transaction, and the term
+    stays ARCHIVING until the last one. Returns the number of records moved.
+    """
+    if term.status == Term.ARCHIVED:
+        raise TermError(f"{term.name} is already archived")
+    if term.end_date >= timezone.localdate():
+        raise TermError(f"{term.name} has not ended yet")
+
+    # Stop new marks first, so nothing lands behind the archiver
+    Term.objects.filter(pk=term.pk).update(status=Term.ARCHIVING)
+    term.status = Term.ARCHIVING
+
+    records = AttendanceRecord.objects.filter(date__range=(term.start_date, term.end_date)).order_by("id")
+    moved = last_id = 0
+    while True:
+        with transaction.atomic():
+            # Walk the primary key rather than re-sorting the whole term every chunk
+            rows = list(
+                records.filter(id__gt=last_id).values_list("id", "student_id", "course_id", "date", "status")[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            ArchivedAttendanceRecord.objects.bulk_create(
+                [
+                    ArchivedAttendanceRecord(
+                        id=pk, term=term, student_id=student_id, course_id=course_id, date=date, status=status
+                    )
+                    for pk, student_id, course_id, date, status in rows
+                ],
+                batch_size=WRITE_BATCH_SIZE,
+            )
+            _add_totals(term, rows)
+            ids = [row[0] for row in rows]
+            for start in range(0, len(ids), WRITE_BATCH_SIZE):
+                AttendanceRecord.objects.filter(id__in=ids[start:start + WRITE_BATCH_SIZE]).delete()
+        moved += len(rows)
+        if progress is not None:
+            progress(moved)
+
+    term.status = Term.ARCHIVED
+    term.archived_at = timezone.now()
+    term.save(update_fields=["status", "archived_at"])
+    return moved
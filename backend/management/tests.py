@@ -1,3 +1,1958 @@
-from django.test import TestCase
+import base64
+import datetime
+import importlib.util
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from prometheus_client import REGISTRY
+from django.conf import settings
+from django.contrib.admin import site
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.signals import m2m_changed
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, resolve
+from django.urls.resolvers import RegexPattern
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import urls as management_urls
+from . import alerts, async_views, benchmarks, bulk, counters, dataset, instrumentation, metrics, feed, packed, pubsub, purge, response_cache, rollups, routing, signals, stream, terms
+from .admin import AttendanceRecordAdmin
+from .authentication import ClaimsJWTAuthentication, RoleRefreshToken
+from .models import ArchivedAttendanceRecord, AttendanceCounter, AttendanceRecord, AttendanceSession, Course, DailyAttendanceRollup, Feedback, Notification, PurgeJob, ReplicationHeartbeat, Student, Term, Teacher, User
+from .sqlite import base as sqlite_base
+from .pagination import AttendancePagination, NewestFirstPagination
+from .views import AttendanceRecordViewSet, CourseViewSet, FeedbackViewSet, NotificationViewSet
+
+
+class Fixtures:
+    """Small helpers for building users with profiles."""
+
+    def make_admin(self):
+        return User.objects.create_user("admin@example.com", "admin@example.com", role="admin")
+
+    def make_teacher(self, n):
+        user = User.objects.create_user(f"teacher{n}@example.com", f"teacher{n}@example.com", role="teacher")
+        return Teacher.objects.create(user=user, name=f"Teacher {n}", dept="CS")
+
+    def make_student(self, n):
+        user = User.objects.create_user(f"student{n}@example.com", f"student{n}@example.com", role="student")
+        return Student.objects.create(user=user, name=f"Student {n}", dept="CS")
+
+    def client_for(self, user):
+        token = RoleRefreshToken.for_user(user).access_token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+})
+class ConstantQueryCountTests(Fixtures, TestCase):
+    """
+    Every list endpoint must issue the same number of queries no matter how
+    many rows it returns. The response cache is off so the views really run.
+    """
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.student = self.make_student(0)
+        self.course_count = 0
+        self.student_count = 1
+        self.grow()
+
+    def grow(self):
+        """Add another course with a few students, records, feedback and notifications."""
+        course = Course.objects.create(name=f"Course {self.course_count}", teacher=self.teacher)
+        self.course_count += 1
+        self.make_teacher(self.course_count)
+
+        students = [self.student]
+        for _ in range(3):
+            students.append(self.make_student(self.student_count))
+            self.student_count += 1
+        course.students.add(*students)
+
+        for day in range(1, 4):
+            for student in students:
+                AttendanceRecord.objects.create(
+                    student=student, course=course, date=datetime.date(2024, 1, day), status=AttendanceRecord.PRESENT
+                )
+
+        Feedback.objects.create(student=self.student, teacher=self.teacher, course=course, message="Hi")
+        Notification.objects.create(title="Note", message="Body")
+        Notification.objects.create(title="Personal", message="Body", role="student", recipient=self.student.user)
+
+    def count_queries(self, user, url):
+        client = self.client_for(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, (url, response.content[:200]))
+        return len(ctx)
+
+    def assertConstantQueries(self, user, url):
+        before = self.count_queries(user, url)
+        self.grow()
+        self.grow()
+        after = self.count_queries(user, url)
+        self.assertEqual(before, after, f"{url} went from {before} to {after} queries")
+
+    def test_students(self):
+        self.assertConstantQueries(self.admin, "/api/students/")
+
+    def test_teachers(self):
+        self.assertConstantQueries(self.admin, "/api/teachers/")
+
+    def test_courses_admin(self):
+        self.assertConstantQueries(self.admin, "/api/courses/")
+
+    def test_courses_teacher(self):
+        self.assertConstantQueries(self.teacher.user, "/api/courses/")
+
+    def test_courses_student(self):
+        self.assertConstantQueries(self.student.user, "/api/courses/")
+
+    def test_my_courses(self):
+        self.assertConstantQueries(self.student.user, "/api/students/my-courses/")
+
+    def test_attendance_admin(self):
+        self.assertConstantQueries(self.admin, "/api/attendance/")
+
+    def test_attendance_teacher(self):
+        self.assertConstantQueries(self.teacher.user, "/api/attendance/")
+
+    def test_attendance_student(self):
+        self.assertConstantQueries(self.student.user, "/api/attendance/")
+
+    def test_attendance_analytics(self):
+        self.assertConstantQueries(self.teacher.user, "/api/attendance/analytics/?from=2024-01-01&to=2024-01-31")
+
+    def test_attendance_paginated(self):
+        self.assertConstantQueries(self.admin, "/api/attendance/?page_size=5")
+
+    def test_attendance_summary(self):
+        self.assertConstantQueries(self.student.user, "/api/attendance/summary/")
+
+    def test_feedback_teacher(self):
+        self.assertConstantQueries(self.teacher.user, "/api/feedback/")
+
+    def test_feedback_student(self):
+        self.assertConstantQueries(self.student.user, "/api/feedback/my/")
+
+    def test_my_notifications(self):
+        self.assertConstantQueries(self.student.user, "/api/notifications/my/")
+
+
+class QueryPlanTests(Fixtures, TestCase):
+    """
+    Run EXPLAIN QUERY PLAN on the hot queries built by the viewsets and fail
+    when SQLite has to scan a whole table instead of using an index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        fixtures = Fixtures()
+        cls.admin = fixtures.make_admin()
+        cls.teacher = fixtures.make_teacher(0)
+        cls.student = fixtures.make_student(0)
+        cls.course = Course.objects.create(name="Course", teacher=cls.teacher)
+        cls.course.students.add(cls.student)
+
+    def viewset_queryset(self, viewset_class, user, action="list"):
+        view = viewset_class()
+        view.request = Request(APIRequestFactory().get("/"))
+        view.request.user = user
+        view.action = action
+        view.format_kwarg = None
+        return view.get_queryset()
+
+    def assertUsesIndexes(self, queryset):
+        plan = queryset.explain()
+        scans = [
+            line for line in plan.splitlines()
+            if re.search(r"\bSCAN (?!CONSTANT ROW)", line) and "INDEX" not in line
+        ]
+        self.assertEqual(scans, [], f"Full table scan in:\n{queryset.query}\n\n{plan}")
+
+    def paged(self, queryset, ordering):
+        return queryset.order_by(*ordering)[:51]
+
+    def test_attendance_teacher_listing(self):
+        qs = self.viewset_queryset(AttendanceRecordViewSet, self.teacher.user)
+        self.assertUsesIndexes(qs)
+        self.assertUsesIndexes(self.paged(qs, AttendancePagination.ordering))
+
+    def test_attendance_student_listing(self):
+        qs = self.viewset_queryset(AttendanceRecordViewSet, self.student.user)
+        self.assertUsesIndexes(self.paged(qs, AttendancePagination.ordering))
+
+    def test_attendance_admin_listing(self):
+        qs = self.viewset_queryset(AttendanceRecordViewSet, self.admin)
+        self.assertUsesIndexes(self.paged(qs, AttendancePagination.ordering))
+
+    def test_attendance_course_date_range(self):
+        qs = self.viewset_queryset(AttendanceRecordViewSet, self.teacher.user).filter(
+            course_id=self.course.id,
+            date__gte=datetime.date(2024, 1, 1),
+            date__lte=datetime.date(2024, 6, 30),
+        )
+        self.assertUsesIndexes(qs.order_by("date", "id"))
+
+    def test_attendance_delete_by_course(self):
+        self.assertUsesIndexes(
+            AttendanceRecord.objects.filter(course__id=self.course.id, course__teacher_id=self.teacher.id)
+        )
+
+    def test_attendance_summary(self):
+        self.assertUsesIndexes(AttendanceCounter.objects.filter(student_id=self.student.id))
+        self.assertUsesIndexes(Course.objects.filter(students=self.student.id))
+
+    def test_courses(self):
+        self.assertUsesIndexes(self.viewset_queryset(CourseViewSet, self.teacher.user))
+        self.assertUsesIndexes(self.viewset_queryset(CourseViewSet, self.student.user))
+
+    def test_feedback(self):
+        self.assertUsesIndexes(self.viewset_queryset(FeedbackViewSet, self.teacher.user))
+        self.assertUsesIndexes(self.viewset_queryset(FeedbackViewSet, self.student.user))
+
+    def test_notification_feed(self):
+        for user in (self.student.user, self.teacher.user):
+            qs = self.viewset_queryset(NotificationViewSet, user)
+            self.assertUsesIndexes(self.paged(qs, NewestFirstPagination.ordering))
+        qs = self.viewset_queryset(NotificationViewSet, self.admin)
+        self.assertUsesIndexes(self.paged(qs, NewestFirstPagination.ordering))
+
+
+class PurgeTests(Fixtures, TestCase):
+    """The "delete all" endpoints cascade in chunks without the Collector."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.students = [self.make_student(n) for n in range(5)]
+        self.course = Course.objects.create(name="Course", teacher=self.teacher)
+        self.course.students.add(*self.students)
+
+        for day in range(1, 4):
+            for student in self.students:
+                AttendanceRecord.objects.create(
+                    student=student, course=self.course, date=datetime.date(2024, 1, day), status=AttendanceRecord.PRESENT
+                )
+        counters.rebuild()
+        packed.mark_session(self.course.id, datetime.date(2024, 1, 1), {self.students[0].id: AttendanceRecord.LATE})
+        Feedback.objects.create(student=self.students[0], teacher=self.teacher, course=self.course, message="Hi")
+        Notification.objects.create(title="Note", message="Body")
+        Notification.objects.create(title="Personal", message="Body", recipient=self.students[0].user)
+
+    def test_delete_all_students(self):
+        chunk_size = purge.PURGE_CHUNK_SIZE
+        purge.PURGE_CHUNK_SIZE = 2
+        try:
+            response = self.client_for(self.admin).delete("/api/students/all/")
+        finally:
+            purge.PURGE_CHUNK_SIZE = chunk_size
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(User.objects.filter(role="student").exists())
+        self.assertFalse(Student.objects.exists())
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertFalse(AttendanceCounter.objects.exists())
+        self.assertFalse(Feedback.objects.exists())
+        self.assertEqual(list(Notification.objects.values_list("title", flat=True)), ["Note"])
+        self.assertFalse(Course.students.through.objects.exists())
+        # Everything not hanging off a student stays
+        self.assertTrue(Course.objects.filter(pk=self.course.pk).exists())
+        self.assertTrue(AttendanceSession.objects.exists())
+        self.assertTrue(Teacher.objects.exists())
+
+    def test_delete_all_courses(self):
+        response = self.client_for(self.admin).delete("/api/courses/all/")
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Course.objects.exists())
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertFalse(AttendanceSession.objects.exists())
+        self.assertEqual(Student.objects.count(), 5)
+
+    def test_background_job(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client_for(self.admin).delete("/api/teachers/all/?background=true")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], PurgeJob.PENDING)
+        self.assertEqual(len(callbacks), 1)
+
+        # Run the job here rather than on the worker thread
+        purge.run_job(response.data["id"])
+
+        job = PurgeJob.objects.get(pk=response.data["id"])
+        self.assertEqual(job.status, PurgeJob.DONE)
+        self.assertEqual(job.deleted["management.Teacher"], 1)
+        self.assertEqual(job.deleted["management.AttendanceRecord"], 15)
+        self.assertFalse(Teacher.objects.exists())
+        self.assertEqual(Student.objects.count(), 5)
+
+        progress = self.client_for(self.admin).get(f"/api/purge-jobs/{job.pk}/")
+        self.assertEqual(progress.data["status"], PurgeJob.DONE)
+
+    def test_admin_only(self):
+        response = self.client_for(self.teacher.user).delete("/api/users/all/")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Student.objects.count(), 5)
+
+
+class NotificationFeedTests(Fixtures, TestCase):
+    """/notifications/my/ supports since-polling and ETag revalidation."""
+
+    url = "/api/notifications/my/"
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.student = self.make_student(0)
+        self.other = self.make_student(1)
+        self.first = Notification.objects.create(title="First", message="Body")
+
+    def post_notification(self, **data):
+        response = self.client_for(self.admin).post(
+            "/api/notifications/", {"title": "New", "message": "Body", **data}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def test_not_modified_costs_one_query(self):
+        client = self.client_for(self.student.user)
+        etag = client.get(self.url)["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(len(ctx), 1)
+
+    def test_etag_follows_audience(self):
+        student = self.client_for(self.student.user)
+        teacher = self.client_for(self.make_teacher(0).user)
+        student_etag = student.get(self.url)["ETag"]
+        teacher_etag = teacher.get(self.url)["ETag"]
+
+        self.post_notification(role="teacher")
+
+        self.assertEqual(student.get(self.url, HTTP_IF_NONE_MATCH=student_etag).status_code, 304)
+        self.assertEqual(teacher.get(self.url, HTTP_IF_NONE_MATCH=teacher_etag).status_code, 200)
+
+    def test_personal_notification_changes_only_recipients_feed(self):
+        mine = self.client_for(self.student.user)
+        theirs = self.client_for(self.other.user)
+        mine_etag = mine.get(self.url)["ETag"]
+        theirs_etag = theirs.get(self.url)["ETag"]
+
+        notification = Notification.objects.create(
+            title="Personal", message="Body", role="none", recipient=self.student.user
+        )
+        feed.bump([notification])
+
+        self.assertEqual(mine.get(self.url, HTTP_IF_NONE_MATCH=mine_etag).status_code, 200)
+        self.assertEqual(theirs.get(self.url, HTTP_IF_NONE_MATCH=theirs_etag).status_code, 304)
+
+    def test_since(self):
+        newer = self.post_notification()
+        client = self.client_for(self.student.user)
+
+        by_id = client.get(self.url, {"since": self.first.id})
+        self.assertEqual([n["id"] for n in by_id.json()], [newer])
+
+        by_time = client.get(self.url, {"since": self.first.created_at.isoformat()})
+        self.assertEqual([n["id"] for n in by_time.json()], [newer])
+
+        self.assertEqual(client.get(self.url, {"since": newer}).json(), [])
+        self.assertEqual(client.get(self.url, {"since": "yesterday"}).status_code, 400)
+        self.assertEqual(client.get(self.url, {"since": "²"}).status_code, 400)
+
+
+class NotificationStreamTests(Fixtures, TestCase):
+    """Notifications are pushed to subscribed streams by audience."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.student = self.make_student(0)
+        self.teacher = self.make_teacher(0)
+
+    async def test_publish_reaches_matching_audiences(self):
+        broker = pubsub.InMemoryBroker()
+        student = broker.subscribe(feed.audiences_for(self.student.user))
+        teacher = broker.subscribe(feed.audiences_for(self.teacher.user))
+
+        broker.publish({"id": 1}, {"student"})
+        broker.publish({"id": 2}, {"all", feed.user_audience(self.teacher.user.id)})
+
+        self.assertEqual(await student.get(), {"id": 1})
+        self.assertEqual(await student.get(), {"id": 2})
+        self.assertEqual(await teacher.get(), {"id": 2})
+        self.assertTrue(teacher.queue.empty())
+
+        broker.unsubscribe(student)
+        broker.unsubscribe(teacher)
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_stream_skips_backlogged_and_unsubscribes(self):
+        broker = pubsub.InMemoryBroker()
+        subscription = broker.subscribe(("all",))
+        events = stream.events(broker, subscription, [{"id": 5, "title": "Missed"}], last_id=4)
+
+        self.assertEqual(await anext(events), "retry: 5000\n\n")
+        self.assertIn("id: 5\n", await anext(events))
+        broker.publish({"id": 5, "title": "Missed"}, {"all"})
+        broker.publish({"id": 6, "title": "New"}, {"all"})
+        self.assertIn("id: 6\n", await anext(events))
+
+        await events.aclose()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    def test_create_publishes_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client_for(self.admin).post(
+                "/api/notifications/", {"title": "Hi", "message": "Body"}
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_last_event_id(self):
+        factory = AsyncRequestFactory()
+        self.assertEqual(stream.last_event_id(factory.get("/", headers={"Last-Event-ID": "42"})), 42)
+        self.assertEqual(stream.last_event_id(factory.get("/", {"lastEventId": "7"})), 7)
+        for value in ("²", "-1", "x", "", str(2 ** 70)):
+            self.assertEqual(stream.last_event_id(factory.get("/", headers={"Last-Event-ID": value})), 0)
+
+    def test_stream_requires_token(self):
+        response = self.client.get("/api/notifications/stream/")
+        self.assertEqual(response.status_code, 401)
+
+
+class AsyncReadViewTests(Fixtures, TestCase):
+    """The async dashboard views answer exactly like the DRF actions."""
+
+    endpoints = {
+        "/api/attendance/summary/": async_views.attendance_summary,
+        "/api/students/my-courses/": async_views.my_courses,
+        "/api/teachers/me/": async_views.teacher_me,
+        "/api/notifications/my/": async_views.my_notifications,
+        "/api/feedback/my/": async_views.my_feedback,
+    }
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.student = self.make_student(0)
+        for n in range(3):
+            course = Course.objects.create(name=f"Course {n}", teacher=self.teacher)
+            course.students.add(self.student, self.make_student(n + 1))
+            for day in range(1, 3):
+                AttendanceRecord.objects.create(
+                    student=self.student, course=course, date=datetime.date(2024, 1, day),
+                    status=AttendanceRecord.PRESENT if day == 1 else AttendanceRecord.ABSENT
+                )
+            Feedback.objects.create(student=self.student, teacher=self.teacher, course=course, message=f"Hi {n}")
+        counters.rebuild()
+        Notification.objects.create(title="Note", message="Body")
+        Notification.objects.create(title="Personal", message="Body", role="none", recipient=self.student.user)
+
+    def get_async(self, user, url, **headers):
+        token = RoleRefreshToken.for_user(user).access_token
+        request = AsyncRequestFactory().get(url, headers={"Authorization": f"Bearer {token}", **headers})
+        path = url.partition("?")[0]
+        return async_to_sync(self.endpoints[path])(request)
+
+    def assertSameAsSync(self, user, url):
+        expected = self.client_for(user).get(url)
+        actual = self.get_async(user, url)
+        self.assertEqual(actual.status_code, expected.status_code, url)
+        self.assertEqual(json.loads(actual.content), expected.json(), url)
+
+    def test_student_endpoints(self):
+        for url in self.endpoints:
+            self.assertSameAsSync(self.student.user, url)
+
+    def test_teacher_endpoints(self):
+        for url in self.endpoints:
+            self.assertSameAsSync(self.teacher.user, url)
+
+    def test_pagination(self):
+        self.assertSameAsSync(self.student.user, "/api/feedback/my/?page_size=2")
+        first = self.get_async(self.student.user, "/api/feedback/my/?page_size=2")
+        cursor = json.loads(first.content)["next"].split("cursor=")[1]
+        self.assertSameAsSync(self.student.user, f"/api/feedback/my/?page_size=2&cursor={cursor}")
+        self.assertSameAsSync(self.student.user, "/api/notifications/my/?page_size=1")
+
+    def test_not_modified(self):
+        etag = self.get_async(self.student.user, "/api/notifications/my/")["ETag"]
+        response = self.get_async(self.student.user, "/api/notifications/my/", **{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_requires_token(self):
+        request = AsyncRequestFactory().get("/api/teachers/me/")
+        self.assertEqual(async_to_sync(async_views.teacher_me)(request).status_code, 401)
+
+
+class ResponseCacheTests(Fixtures, TestCase):
+    """Course/student/teacher lists are cached per scope and invalidated by signals."""
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.other_teacher = self.make_teacher(1)
+        self.student = self.make_student(0)
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.other_course = Course.objects.create(name="Art", teacher=self.other_teacher)
+
+    def is_cached(self, user, url):
+        """Fetch ``url`` and say whether it was served from the cache, i.e. without queries."""
+        client = self.client_for(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx) == 0
+
+    def warm(self, *pairs):
+        for user, url in pairs:
+            self.client_for(user).get(url)
+
+    def test_second_request_is_a_hit(self):
+        self.warm((self.student.user, "/api/courses/"))
+        self.assertTrue(self.is_cached(self.student.user, "/api/courses/"))
+
+        stats = self.client_for(self.admin).get("/api/cache-stats/").data
+        self.assertEqual(stats["courses"], {"hits": 1, "misses": 1, "hitRate": 0.5})
+
+    def test_scopes_are_separate(self):
+        teacher = self.client_for(self.teacher.user).get("/api/courses/")
+        other = self.client_for(self.other_teacher.user).get("/api/courses/")
+        self.assertEqual([c["name"] for c in teacher.json()], ["Maths"])
+        self.assertEqual([c["name"] for c in other.json()], ["Art"])
+
+    def test_course_change_invalidates_only_affected_scopes(self):
+        self.warm(
+            (self.admin, "/api/courses/"),
+            (self.teacher.user, "/api/courses/"),
+            (self.other_teacher.user, "/api/courses/"),
+            (self.student.user, "/api/courses/"),
+        )
+        self.course.name = "Algebra"
+        self.course.save()
+
+        self.assertFalse(self.is_cached(self.admin, "/api/courses/"))
+        self.assertFalse(self.is_cached(self.teacher.user, "/api/courses/"))
+        self.assertFalse(self.is_cached(self.student.user, "/api/courses/"))
+        self.assertTrue(self.is_cached(self.other_teacher.user, "/api/courses/"))
+        self.assertEqual(self.client_for(self.student.user).get("/api/courses/").json()[0]["name"], "Algebra")
+
+    def test_enrollment_invalidates_student_courses(self):
+        newcomer = self.make_student(1)
+        self.warm((newcomer.user, "/api/courses/"), (self.other_teacher.user, "/api/courses/"))
+
+        self.other_course.students.add(newcomer)
+
+        response = self.client_for(newcomer.user).get("/api/courses/")
+        self.assertEqual([c["name"] for c in response.json()], ["Art"])
+        self.assertFalse(self.is_cached(self.other_teacher.user, "/api/courses/"))
+
+    def test_student_delete_invalidates_course_rosters(self):
+        self.warm((self.teacher.user, "/api/courses/"), (self.admin, "/api/students/"))
+
+        self.student.user.delete()
+
+        self.assertEqual(self.client_for(self.teacher.user).get("/api/courses/").json()[0]["studentIds"], [])
+        self.assertEqual(self.client_for(self.admin).get("/api/students/").json(), [])
+
+    def test_email_change_invalidates_lists(self):
+        self.warm((self.admin, "/api/students/"), (self.admin, "/api/teachers/"), (self.admin, "/api/courses/"))
+
+        self.student.user.email = "renamed@example.com"
+        self.student.user.save()
+
+        self.assertEqual(self.client_for(self.admin).get("/api/students/").json()[0]["email"], "renamed@example.com")
+        self.assertTrue(self.is_cached(self.admin, "/api/teachers/"))
+        self.assertTrue(self.is_cached(self.admin, "/api/courses/"))
+
+    def test_retrieve_is_cached(self):
+        url = f"/api/teachers/{self.teacher.pk}/"
+        self.warm((self.student.user, url))
+        self.assertTrue(self.is_cached(self.student.user, url))
+
+        Teacher.objects.filter(pk=self.teacher.pk).first().save()
+        self.assertFalse(self.is_cached(self.student.user, url))
+
+
+class AttendanceAnalyticsTests(Fixtures, TestCase):
+    """Daily rollups follow every attendance write path and feed the analytics."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.other_teacher = self.make_teacher(1)
+        self.students = [self.make_student(n) for n in range(3)]
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(*self.students)
+        self.other_course = Course.objects.create(name="Art", teacher=self.other_teacher)
+        self.client = self.client_for(self.teacher.user)
+
+    def mark(self, student, date, status):
+        response = self.client.post("/api/attendance/", {
+            "studentId": student.pk, "courseId": self.course.pk, "date": date, "status": status,
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data["id"]
+
+    def rollup(self, date):
+        row = DailyAttendanceRollup.objects.get(course=self.course, date=date)
+        return {field: getattr(row, field) for field in counters.COUNTER_FIELDS}
+
+    def test_rollups_follow_writes(self):
+        first = self.mark(self.students[0], "2024-01-01", "present")
+        self.mark(self.students[1], "2024-01-01", "absent")
+        self.assertEqual(self.rollup("2024-01-01"), {"present": 1, "late": 0, "absent": 1, "unmarked": 0})
+
+        self.client.patch(f"/api/attendance/{first}/", {"status": "late", "date": "2024-01-02"}, format="json")
+        self.assertEqual(self.rollup("2024-01-01"), {"present": 0, "late": 0, "absent": 1, "unmarked": 0})
+        self.assertEqual(self.rollup("2024-01-02"), {"present": 0, "late": 1, "absent": 0, "unmarked": 0})
+
+        self.client.delete(f"/api/attendance/{first}/")
+        self.client.post("/api/attendance/bulk/", [
+            {"studentId": s.pk, "courseId": self.course.pk, "date": "2024-01-01", "status": "present"}
+            for s in self.students
+        ], format="json")
+        self.assertEqual(self.rollup("2024-01-01"), {"present": 3, "late": 0, "absent": 0, "unmarked": 0})
+
+        self.students[2].delete()
+        self.assertEqual(self.rollup("2024-01-01"), {"present": 2, "late": 0, "absent": 0, "unmarked": 0})
+        self.assertEqual(rollups.verify(), [])
+
+    def test_plain_saves_admin_deletes_and_missing_rows(self):
+        record = AttendanceRecord.objects.create(
+            student=self.students[0], course=self.course, date="2024-01-01", status=AttendanceRecord.PRESENT
+        )
+        record.date = datetime.date(2024, 1, 2)
+        record.save()
+        self.assertEqual(self.rollup("2024-01-02"), {"present": 1, "late": 0, "absent": 0, "unmarked": 0})
+        self.assertEqual(self.rollup("2024-01-01"), {"present": 0, "late": 0, "absent": 0, "unmarked": 0})
+
+        AttendanceRecordAdmin(AttendanceRecord, site).delete_model(None, record)
+        self.assertEqual(self.rollup("2024-01-02"), {"present": 0, "late": 0, "absent": 0, "unmarked": 0})
+
+        first = self.mark(self.students[0], "2024-01-03", "present")
+        self.mark(self.students[1], "2024-01-03", "absent")
+        DailyAttendanceRollup.objects.all().delete()
+        self.assertEqual(self.client.delete(f"/api/attendance/{first}/").status_code, 204)
+        self.assertEqual(self.rollup("2024-01-03"), {"present": 0, "late": 0, "absent": 1, "unmarked": 0})
+
+        AttendanceRecordAdmin(AttendanceRecord, site).delete_queryset(None, AttendanceRecord.objects.all())
+        self.assertEqual(self.rollup("2024-01-03"), {"present": 0, "late": 0, "absent": 0, "unmarked": 0})
+        self.assertEqual(rollups.verify(), [])
+
+    def test_analytics(self):
+        self.mark(self.students[0], "2024-01-01", "present")
+        self.mark(self.students[1], "2024-01-01", "late")
+        self.mark(self.students[0], "2024-01-08", "absent")
+        self.mark(self.students[1], "2024-01-08", "present")
+
+        response = self.client.get(f"/api/attendance/analytics/?courseId={self.course.pk}&from=2024-01-01&to=2024-01-31")
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+
+        self.assertEqual(len(data["courses"]), 1)
+        self.assertEqual(data["courses"][0]["total"], 4)
+        self.assertEqual(data["courses"][0]["attendanceRate"], 75.0)
+        self.assertEqual(
+            [(str(row["date"]), row["presentRate"], row["lateRate"]) for row in data["daily"]],
+            [("2024-01-01", 50.0, 50.0), ("2024-01-08", 50.0, 0)],
+        )
+        self.assertEqual([str(row["weekStart"]) for row in data["weekly"]], ["2024-01-01", "2024-01-08"])
+        self.assertEqual(
+            [(row["studentName"], row["attendanceRate"]) for row in data["students"]],
+            [("Student 0", 50.0), ("Student 1", 100.0)],
+        )
+
+    def test_scoped_to_teacher(self):
+        response = self.client.get(f"/api/attendance/analytics/?courseId={self.other_course.pk}")
+        self.assertEqual(response.status_code, 404)
+        response = self.client_for(self.students[0].user).get("/api/attendance/analytics/")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/api/attendance/analytics/?from=2024-02-01&to=2024-01-01")
+        self.assertEqual(response.status_code, 400)
+        for course_id in ("²", "x", "-1"):
+            response = self.client.get("/api/attendance/analytics/", {"courseId": course_id})
+            self.assertEqual(response.status_code, 400)
+
+
+class LowAttendanceAlertTests(Fixtures, TestCase):
+    """The alert job warns once per threshold crossing and only looks at changed counters."""
+
+    def setUp(self):
+        teacher = self.make_teacher(0)
+        self.student = self.make_student(0)
+        self.other = self.make_student(1)
+        self.maths = Course.objects.create(name="Maths", teacher=teacher)
+        self.art = Course.objects.create(name="Art", teacher=teacher)
+
+    def mark(self, student, course, *statuses):
+        for status in statuses:
+            taken = AttendanceRecord.objects.filter(student=student, course=course).count()
+            AttendanceRecord.objects.create(
+                student=student, course=course, status=status,
+                date=datetime.date(2024, 1, 1) + datetime.timedelta(days=taken),
+            )
+
+    def test_warns_once_per_crossing(self):
+        self.mark(self.student, self.maths, AttendanceRecord.PRESENT, AttendanceRecord.ABSENT, AttendanceRecord.ABSENT)
+        self.mark(self.student, self.art, AttendanceRecord.ABSENT)
+        self.mark(self.other, self.maths, AttendanceRecord.PRESENT, AttendanceRecord.LATE)
+
+        job = alerts.run(75)
+        self.assertEqual((job.checked, job.fell_below, job.notified), (3, 2, 1))
+        notification = Notification.objects.get(recipient=self.student.user)
+        self.assertEqual(notification.message, "Your attendance is below 75% in: Art (0.0%), Maths (33.3%).")
+        self.assertEqual(self.client_for(self.other.user).get("/api/notifications/my/").json(), [])
+
+        self.assertEqual(alerts.run(75).notified, 0)
+
+        self.mark(self.student, self.art, *[AttendanceRecord.PRESENT] * 4)
+        self.assertEqual(alerts.run(75).recovered, 1)
+        self.mark(self.student, self.art, *[AttendanceRecord.ABSENT] * 4)
+        self.assertEqual(alerts.run(75).notified, 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.student.user).count(), 2)
+
+    def test_only_changed_counters_are_checked(self):
+        self.mark(self.student, self.maths, AttendanceRecord.PRESENT)
+        self.mark(self.other, self.maths, AttendanceRecord.PRESENT)
+        alerts.run(75)
+
+        AttendanceCounter.objects.update(changed_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        self.mark(self.student, self.maths, AttendanceRecord.ABSENT, AttendanceRecord.ABSENT)
+        self.assertEqual(alerts.run(75).checked, 1)
+        self.assertEqual(alerts.run(90).checked, 2)
+
+
+@override_settings(
+    DATABASE_REPLICAS=["replica"],
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "responses": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        "routing": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "routing-tests"},
+    },
+)
+class ReplicaRoutingTests(Fixtures, TransactionTestCase):
+    """
+    Reads of safe requests go to the replica, a second SQLite file that is
+    deliberately not kept in sync, so the data tells which database answered.
+    """
+
+
+    @classmethod
+    def setUpClass(cls):
+        # Registered here rather than in settings, so the test runner leaves
+        # it alone; the test case still flushes it after every test
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings["replica"] = {
+            **connections.settings["default"],
+            "NAME": os.path.join(cls.replica_dir.name, "replica.sqlite3"),
+        }
+        call_command("migrate", database="replica", verbosity=0)
+        cls.databases = {"default", "replica"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections.settings["replica"]
+        if hasattr(connections._connections, "replica"):
+            delattr(connections._connections, "replica")
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        routing.reset()
+        self.admin = self.make_admin()
+        self.client = self.client_for(self.admin)
+        Notification.objects.create(title="On primary", message="Body")
+        Notification.objects.using("replica").create(title="On replica", message="Body")
+
+    def titles(self):
+        return [n["title"] for n in self.client.get("/api/notifications/").data]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.titles(), ["On replica"])
+        with routing.replica_reads():
+            self.assertEqual(Notification.objects.get().title, "On replica")
+        self.assertEqual(Notification.objects.get().title, "On primary")
+
+    def test_client_that_wrote_reads_from_primary(self):
+        response = self.client.post("/api/notifications/", {"title": "New", "message": "Body"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.titles(), ["New", "On primary"])
+        # Other clients still read the replica
+        self.assertEqual(
+            [n["title"] for n in self.client_for(self.make_student(0).user).get("/api/notifications/my/").json()],
+            ["On replica"],
+        )
+
+    def test_pins_are_shared_between_workers(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory.name}
+        with self.settings(CACHES={**settings.CACHES, "routing": shared}):
+            self.client.post("/api/notifications/", {"title": "New", "message": "Body"})
+        # A cache object of its own stands in for another worker's
+        other_worker = FileBasedCache(directory.name, {})
+        with mock.patch.object(routing, "pin_cache", return_value=other_worker):
+            self.assertEqual(self.titles(), ["New", "On primary"])
+
+    def test_lagging_replica_is_skipped(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        ReplicationHeartbeat.objects.create(pk=1, beat_at=now)
+        ReplicationHeartbeat.objects.using("replica").create(pk=1, beat_at=now - datetime.timedelta(minutes=5))
+        self.assertEqual(self.titles(), ["On primary"])
+
+        ReplicationHeartbeat.objects.using("replica").filter(pk=1).update(beat_at=now)
+        routing.reset()
+        self.assertEqual(self.titles(), ["On replica"])
+
+
+class TermArchiveTests(Fixtures, TestCase):
+    """Archiving moves a closed term out of the live table without changing lifetime figures."""
+
+    def setUp(self):
+        self.teacher = self.make_teacher(0)
+        self.students = [self.make_student(n) for n in range(2)]
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(*self.students)
+        self.term = Term.objects.create(
+            name="Spring 2024", start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2024, 6, 30)
+        )
+        self.client = self.client_for(self.teacher.user)
+        rows = [
+            {"studentId": s.pk, "courseId": self.course.pk, "date": f"2024-0{month}-01", "status": status}
+            for month, status in ((1, "present"), (2, "absent"), (3, "late"))
+            for s in self.students
+        ]
+        rows.append({"studentId": self.students[0].pk, "courseId": self.course.pk, "date": "2024-09-02", "status": "absent"})
+        self.assertEqual(self.client.post("/api/attendance/bulk/", rows, format="json").status_code, 201)
+
+    def summary(self, student):
+        return self.client_for(student.user).get("/api/attendance/summary/").json()
+
+    def test_archive_keeps_lifetime_figures(self):
+        before = self.summary(self.students[0])
+        analytics = self.client.get(f"/api/attendance/analytics/?courseId={self.course.pk}&from=2024-01-01&to=2024-12-31").data
+
+        self.assertEqual(terms.archive(self.term, chunk_size=4), 6)
+
+        self.assertEqual(list(AttendanceRecord.objects.values_list("date", flat=True)), [datetime.date(2024, 9, 2)])
+        self.assertEqual(ArchivedAttendanceRecord.objects.filter(term=self.term).count(), 6)
+        self.assertEqual(self.summary(self.students[0]), before)
+        self.assertEqual(
+            self.client.get(f"/api/attendance/analytics/?courseId={self.course.pk}&from=2024-01-01&to=2024-12-31").data,
+            analytics,
+        )
+
+        counters.rebuild()
+        rollups.rebuild()
+        self.assertEqual(self.summary(self.students[0]), before)
+        self.assertEqual(counters.verify(), [])
+
+        self.students[1].delete()
+        self.assertEqual(rollups.verify(), [])
+
+    def test_archived_term_takes_no_marks(self):
+        terms.archive(self.term)
+        self.term.refresh_from_db()
+        self.assertEqual(self.term.status, Term.ARCHIVED)
+
+        response = self.client.post("/api/attendance/", {
+            "studentId": self.students[0].pk, "courseId": self.course.pk, "date": "2024-05-01", "status": "present",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post("/api/attendance/bulk/", [
+            {"studentId": self.students[0].pk, "courseId": self.course.pk, "date": "2024-05-01", "status": "present"},
+        ], format="json")
+        self.assertEqual(response.data["results"][0]["errors"], {"date": "Spring 2024 is archived; its attendance can no longer change"})
+
+        with self.assertRaises(terms.TermError):
+            terms.archive(self.term)
+
+    def test_open_term_cannot_be_archived(self):
+        term = Term.objects.create(name="Current", start_date=datetime.date(2024, 9, 1), end_date=datetime.date(2999, 1, 1))
+        with self.assertRaises(terms.TermError):
+            terms.archive(term)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+})
+class BenchmarkSuiteTests(TestCase):
+    """The synthetic dataset and the endpoint benchmarks built on it."""
+    sizes = {"students": 8, "teachers": 2, "courses": 3, "years": 1, "courses_per_student": 2}
+
+    def generate(self, prefix="synthetic", **kwargs):
+        return dataset.generate(**self.sizes, end=datetime.date(2024, 6, 28), prefix=prefix, **kwargs)
+
+    def test_dataset_is_reproducible(self):
+        created = self.generate()
+        self.assertEqual(created["Student"], 8)
+        self.assertEqual(created["Enrollment"], 16)
+        self.assertEqual(AttendanceRecord.objects.count(), created["AttendanceRecord"])
+        self.assertEqual(counters.verify(), [])
+        self.assertEqual(rollups.verify(), [])
+
+        self.generate(prefix="again")
+        first, second = (
+            list(AttendanceRecord.objects.filter(student__user__username__startswith=f"{prefix}-")
+                 .order_by("id").values_list("date", "status"))
+            for prefix in ("synthetic", "again")
+        )
+        self.assertEqual(first, second)
+
+        self.assertGreater(dataset.remove("again"), 0)
+        self.assertFalse(dataset.exists("again"))
+        self.assertEqual(rollups.verify(), [])
+
+    def test_every_route_is_benchmarked_or_excluded(self):
+        self.assertEqual(benchmarks.uncovered(), [])
+
+    def test_every_endpoint_succeeds(self):
+        self.generate()
+        results = benchmarks.measure(benchmarks.context(), iterations=1, warmup=1)
+        failed = {name: result["status"] for name, result in results.items() if result["status"] >= 400}
+        self.assertEqual(failed, {})
+
+    def test_compare(self):
+        baseline = {
+            "GET x as admin": {"queries": 2, "p50_ms": 4.0, "p95_ms": 10.0},
+            "GET y as admin": {"queries": 9, "p50_ms": 4.0, "p95_ms": 10.0},
+        }
+        # Within the noise margins: p50 up to 8 ms, p95 up to 22 ms
+        self.assertEqual(benchmarks.compare({"GET x as admin": {"queries": 2, "p50_ms": 7.9, "p95_ms": 21.0}}, baseline), [])
+        regressions = benchmarks.compare({
+            "GET x as admin": {"queries": 3, "p50_ms": 5, "p95_ms": 18.0},
+            "GET y as admin": {"queries": 9, "p50_ms": 5, "p95_ms": 90.0},
+            "GET z as admin": {"queries": 99, "p50_ms": 50, "p95_ms": 99.0},
+        }, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("queries", regressions[0])
+        # A tail-only regression fails the run too
+        self.assertIn("GET y as admin: p95", regressions[1])
+        self.assertIn("p50", benchmarks.compare({"GET y as admin": {"queries": 9, "p50_ms": 9, "p95_ms": 10.0}}, baseline)[0])
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+})
+class QueryInstrumentationTests(Fixtures, TestCase):
+    """Opt-in per-request SQL accounting."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.students = [self.make_student(n) for n in range(8)]
+        Course.objects.create(name="Maths", teacher=self.teacher).students.add(*self.students)
+
+    def test_off_by_default(self):
+        response = self.client_for(self.admin).get("/api/courses/")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SQL_INSTRUMENTATION=True)
+    def test_server_timing_and_log_line(self):
+        client = self.client_for(self.admin)
+        with CaptureQueriesContext(connection) as ctx, self.assertLogs("management.sql", "INFO") as logs:
+            response = client.get("/api/courses/")
+
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn(f'desc="{len(ctx)} queries"', response["Server-Timing"])
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, "INFO")
+        self.assertEqual(line["queries"], len(ctx))
+        self.assertEqual((line["view"], line["action"]), ("management.views.CourseViewSet", "list"))
+        self.assertEqual(line["repeated"], [])
+
+    @override_settings(SQL_INSTRUMENTATION=True, SQL_REPEAT_THRESHOLD=0)
+    def test_repeated_shape_is_flagged_with_its_view(self):
+        with self.assertLogs("management.sql", "WARNING") as logs:
+            response = self.client_for(self.admin).get(f"/api/students/{self.students[0].pk}/")
+        self.assertIn("repeated-sql", response["Server-Timing"])
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line["view"], line["action"]), ("management.views.StudentViewSet", "retrieve"))
+
+    @override_settings(SQL_INSTRUMENTATION=True)
+    def test_counts_queries_under_asgi(self):
+        sync_timing = self.client_for(self.admin).get("/api/courses/")["Server-Timing"]
+        # The sync view's queries run on a sync_to_async thread, not the event loop's
+        token = RoleRefreshToken.for_user(self.admin).access_token
+        response = async_to_sync(AsyncClient().get)("/api/courses/", headers={"Authorization": f"Bearer {token}"})
+
+        count = re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1)
+        self.assertGreater(int(count), 0)
+        self.assertIn(f'desc="{count} queries"', sync_timing)
+
+    def test_recorder_folds_shapes(self):
+        recorder = instrumentation.QueryRecorder()
+        with recorder.install():
+            for student in self.students:
+                Student.objects.filter(pk=student.pk).first()
+            Student.objects.filter(pk=self.students[0].pk).first()
+            list(Student.objects.filter(pk__in=[s.pk for s in self.students[:3]]))
+            list(Student.objects.filter(pk__in=[s.pk for s in self.students[:5]]))
+
+        self.assertEqual(recorder.count, 11)
+        self.assertEqual(recorder.duplicates(), 1)
+        self.assertEqual([shape["count"] for shape in recorder.repeated(5)], [9])
+        self.assertEqual([shape["count"] for shape in recorder.repeated(1)], [9, 2])
+
+
+class RequestProfilingTests(Fixtures, TestCase):
+    """Admin-requested and sampled cProfile dumps, and their summaries."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        override = override_settings(PROFILING_DIR=self.dir, PROFILING_SAMPLE_RATE=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_off_without_directory(self):
+        with override_settings(PROFILING_DIR=None):
+            response = self.client_for(self.admin).get("/api/teachers/", HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_only_admins_can_ask(self):
+        self.assertNotIn("X-Profile-Id", self.client_for(self.admin).get("/api/teachers/"))
+        self.assertNotIn("X-Profile-Id", self.client_for(self.teacher.user).get("/api/teachers/me/?profile=1"))
+        self.assertEqual(os.listdir(self.dir), [])
+
+        response = self.client_for(self.admin).get("/api/teachers/", HTTP_X_PROFILE="1")
+        name = response["X-Profile-Id"]
+        self.assertIn("TeacherViewSet-list", name)
+        self.assertEqual(os.listdir(self.dir), [name])
+
+    def test_async_request_with_legacy_token(self):
+        # No role claim: telling whether it is an admin's takes a query, off the event loop
+        token = RefreshToken.for_user(self.admin).access_token
+        response = async_to_sync(AsyncClient().get)(
+            "/api/teachers/", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(os.listdir(self.dir), [response["X-Profile-Id"]])
+
+    def test_sampling_and_retention(self):
+        client = self.client_for(self.teacher.user)
+        with override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_KEEP=2):
+            names = [client.get("/api/teachers/me/")["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted(names[1:]))
+
+    def test_summary_endpoint(self):
+        client = self.client_for(self.admin)
+        name = client.get("/api/teachers/?profile=1")["X-Profile-Id"]
+
+        listing = client.get("/api/profiles/").json()
+        self.assertEqual([entry["name"] for entry in listing], [name])
+
+        body = client.get(f"/api/profiles/{name}/?top=5&sort=tottime").json()
+        self.assertEqual(len(body["functions"]), 5)
+        own = [row["ownSeconds"] for row in body["functions"]]
+        self.assertEqual(own, sorted(own, reverse=True))
+
+        self.assertEqual(client.get(f"/api/profiles/{name}/?sort=bogus").status_code, 400)
+        for top in ("0", "²", "x"):
+            self.assertEqual(client.get(f"/api/profiles/{name}/", {"top": top}).status_code, 400)
+        self.assertEqual(client.get("/api/profiles/missing.prof/").status_code, 404)
+        self.assertEqual(self.client_for(self.teacher.user).get("/api/profiles/").status_code, 403)
+
+
+class MetricsTests(Fixtures, TestCase):
+    """Prometheus metrics, per endpoint and across worker processes."""
+
+    def setUp(self):
+        self.teacher = self.make_teacher(0)
+        self.student = self.make_student(0)
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(self.student)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_labelled_by_viewset_action(self):
+        summary = {"endpoint": "attendance.summary", "method": "GET", "status": "200"}
+        bulk_create = {"endpoint": "attendance.bulk_create", "method": "POST", "status": "201"}
+        before = self.sample("http_requests_total", **summary), self.sample("http_requests_total", **bulk_create)
+        queries_before = self.sample("http_request_db_queries_count", endpoint="attendance.bulk_create")
+
+        self.client_for(self.student.user).get("/api/attendance/summary/")
+        self.client_for(self.teacher.user).post("/api/attendance/bulk/", [
+            {"studentId": self.student.pk, "courseId": self.course.pk, "date": "2024-01-01", "status": "present"},
+        ], format="json")
+
+        self.assertEqual(self.sample("http_requests_total", **summary), before[0] + 1)
+        self.assertEqual(self.sample("http_requests_total", **bulk_create), before[1] + 1)
+        self.assertEqual(self.sample("http_request_db_queries_count", endpoint="attendance.bulk_create"), queries_before + 1)
+        self.assertGreater(self.sample("http_request_db_queries_sum", endpoint="attendance.bulk_create"), 0)
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="attendance.summary",le="0.005"}', body)
+
+    def test_counts_queries_under_asgi(self):
+        queries = self.sample("http_request_db_queries_sum", endpoint="attendance.summary")
+        token = RoleRefreshToken.for_user(self.student.user).access_token
+        response = async_to_sync(AsyncClient().get)(
+            "/api/attendance/summary/", headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.sample("http_request_db_queries_sum", endpoint="attendance.summary"), queries)
+
+    def test_async_routes_share_the_sync_labels(self):
+        async_routes = URLResolver(RegexPattern(r"^/api/"), management_urls.async_urlpatterns)
+        for path, view in AsyncReadViewTests.endpoints.items():
+            sync_request, async_request = RequestFactory().get(path), RequestFactory().get(path)
+            sync_request.resolver_match = resolve(path)
+            async_request.resolver_match = async_routes.resolve(path)
+            self.assertIs(async_request.resolver_match.func, view)
+            self.assertEqual(metrics.endpoint_of(async_request), metrics.endpoint_of(sync_request), path)
+
+    def test_login_and_hashing(self):
+        user = User.objects.create_user("login@example.com", "login@example.com", "secret123", role="admin")
+        hashes = self.sample("password_hash_duration_seconds_count", algorithm="pbkdf2_sha256")
+        failures = self.sample("login_duration_seconds_count", outcome="failure")
+
+        response = self.client.post("/api/login/", {"username": user.username, "password": "wrong"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.sample("login_duration_seconds_count", outcome="failure"), failures + 1)
+        self.assertEqual(self.sample("password_hash_duration_seconds_count", algorithm="pbkdf2_sha256"), hashes + 1)
+
+    def test_response_cache_lookups(self):
+        misses = self.sample("response_cache_lookups_total", resource="teachers", outcome="misses")
+        hits = self.sample("response_cache_lookups_total", resource="teachers", outcome="hits")
+        client = self.client_for(self.teacher.user)
+        client.get("/api/teachers/me/")
+        client.get(f"/api/teachers/{self.teacher.pk}/")
+        client.get(f"/api/teachers/{self.teacher.pk}/")
+        self.assertEqual(self.sample("response_cache_lookups_total", resource="teachers", outcome="misses"), misses + 1)
+        self.assertEqual(self.sample("response_cache_lookups_total", resource="teachers", outcome="hits"), hits + 1)
+
+    def test_only_local_clients(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.9").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_token_is_required_when_set(self):
+        # Behind a proxy every request comes from loopback; only the token tells them apart
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").status_code, 200)
+        self.assertEqual(
+            self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret", REMOTE_ADDR="203.0.113.9").status_code,
+            403,
+        )
+
+    def test_processes_are_added_up(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        worker = (
+            "import django; django.setup();"
+            "from django.test.utils import setup_test_environment; setup_test_environment();"
+            "from django.test import Client; Client().get('/metrics')"
+        )
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory.name, "DJANGO_SETTINGS_MODULE": "backend.settings"}
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", worker], env=env, cwd=Path(__file__).resolve().parent.parent, check=True)
+
+        with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory.name}):
+            body = metrics.exposition().decode()
+        self.assertIn('http_requests_total{endpoint="metrics.get",method="GET",status="200"} 2.0', body)
+
+
+class RosterSyncTests(Fixtures, TestCase):
+    """PUT/PATCH /api/courses/<id>/roster/ with bulk writes and one change event."""
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.other_teacher = self.make_teacher(1)
+        self.students = [self.make_student(n) for n in range(4)]
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(*self.students[:2])
+        self.url = f"/api/courses/{self.course.pk}/roster/"
+
+    def roster(self):
+        return sorted(self.course.students.values_list("id", flat=True))
+
+    def test_put_replaces_roster(self):
+        ids = [s.pk for s in self.students]
+        response = self.client_for(self.teacher.user).put(self.url, {"studentIds": [ids[1], ids[2], ids[3]]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"added": [ids[2], ids[3]], "removed": [ids[0]]})
+        self.assertEqual(self.roster(), ids[1:])
+
+    def test_patch_adds_and_removes(self):
+        ids = [s.pk for s in self.students]
+        response = self.client_for(self.admin).patch(self.url, {"add": [ids[2], ids[1]], "remove": [ids[0], ids[3]]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        # Already enrolled and never enrolled ids are no-ops
+        self.assertEqual(response.data, {"added": [ids[2]], "removed": [ids[0]]})
+        self.assertEqual(self.roster(), [ids[1], ids[2]])
+
+    def test_invalid_ids_change_nothing(self):
+        client = self.client_for(self.teacher.user)
+        ids = [s.pk for s in self.students]
+        before = self.roster()
+
+        response = client.put(self.url, {"studentIds": [ids[2], 999999]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("999999", response.data["studentIds"])
+        self.assertEqual(client.patch(self.url, {"add": [ids[2]], "remove": [ids[2]]}, format="json").status_code, 400)
+        for bad in ("x", 2 ** 70, 1.9, True):
+            self.assertEqual(client.patch(self.url, {"add": [bad]}, format="json").status_code, 400, bad)
+            self.assertEqual(client.put(self.url, {"studentIds": [bad]}, format="json").status_code, 400, bad)
+        self.assertEqual(client.put(self.url, {}, format="json").status_code, 400)
+        self.assertEqual(self.roster(), before)
+
+    def test_permissions(self):
+        body = {"studentIds": []}
+        self.assertEqual(self.client_for(self.students[0].user).put(self.url, body, format="json").status_code, 403)
+        self.assertEqual(self.client_for(self.other_teacher.user).put(self.url, body, format="json").status_code, 404)
+        self.assertEqual(len(self.roster()), 2)
+
+    def test_queries_do_not_grow_with_roster(self):
+        client = self.client_for(self.teacher.user)
+        extra = [self.make_student(n) for n in range(4, 40)]
+
+        def count(ids):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.put(self.url, {"studentIds": ids}, format="json")
+            self.assertEqual(response.status_code, 200)
+            return len(ctx)
+
+        small = count([self.students[2].pk])
+        large = count([s.pk for s in extra])
+        self.assertEqual(small, large)
+
+    def test_one_change_event(self):
+        ids = [s.pk for s in self.students]
+        events = []
+
+        def listener(sender, course, added, removed, **kwargs):
+            events.append((course.pk, added, removed))
+
+        m2m = mock.Mock()
+        signals.roster_changed.connect(listener, sender=Course)
+        m2m_changed.connect(m2m, sender=Course.students.through)
+        self.addCleanup(signals.roster_changed.disconnect, listener, sender=Course)
+        self.addCleanup(m2m_changed.disconnect, m2m, sender=Course.students.through)
+
+        self.client_for(self.teacher.user).put(self.url, {"studentIds": ids[2:]}, format="json")
+        self.client_for(self.teacher.user).put(self.url, {"studentIds": ids[2:]}, format="json")
+
+        self.assertEqual(events, [(self.course.pk, ids[2:], ids[:2])])
+        m2m.assert_not_called()
+
+    def test_invalidates_cached_lists(self):
+        newcomer = self.students[3]
+        self.client_for(newcomer.user).get("/api/students/my-courses/")
+        self.client_for(self.teacher.user).get("/api/courses/")
+
+        self.client_for(self.teacher.user).patch(self.url, {"add": [newcomer.pk]}, format="json")
+
+        response = self.client_for(newcomer.user).get("/api/students/my-courses/")
+        self.assertEqual([c["name"] for c in response.json()], ["Maths"])
+        roster = self.client_for(self.teacher.user).get("/api/courses/").json()[0]["studentIds"]
+        self.assertIn(newcomer.pk, roster)
+
+
+class AttendanceCounterTests(Fixtures, TestCase):
+    """Incremental counter maintenance, targeted refresh, and the verify/rebuild command."""
+
+    def setUp(self):
+        self.teacher = self.make_teacher(0)
+        self.student = self.make_student(0)
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.client = self.client_for(self.teacher.user)
+
+    def counter(self):
+        row = AttendanceCounter.objects.get(student=self.student, course=self.course)
+        return {field: getattr(row, field) for field in counters.COUNTER_FIELDS}
+
+    def mark(self, date, status):
+        return self.client.post("/api/attendance/", {
+            "studentId": self.student.pk, "courseId": self.course.pk, "date": date, "status": status,
+        }, format="json")
+
+    def test_track_follows_writes(self):
+        first = self.mark("2024-01-01", "present").data["id"]
+        self.mark("2024-01-02", "absent")
+        self.assertEqual(self.counter(), {"present": 1, "late": 0, "absent": 1, "unmarked": 0})
+
+        self.client.patch(f"/api/attendance/{first}/", {"status": "late"}, format="json")
+        self.assertEqual(self.counter(), {"present": 0, "late": 1, "absent": 1, "unmarked": 0})
+
+        self.client.delete(f"/api/attendance/{first}/")
+        self.assertEqual(self.counter(), {"present": 0, "late": 0, "absent": 1, "unmarked": 0})
+        self.assertEqual(counters.verify(), [])
+
+    def test_plain_saves_and_admin_deletes_are_counted(self):
+        record = AttendanceRecord.objects.create(
+            student=self.student, course=self.course, date="2024-01-01", status=AttendanceRecord.PRESENT
+        )
+        record.status = AttendanceRecord.ABSENT
+        record.save()
+        AttendanceRecord.objects.create(student=self.student, course=self.course, date="2024-01-02", status=AttendanceRecord.LATE)
+        self.assertEqual(self.counter(), {"present": 0, "late": 1, "absent": 1, "unmarked": 0})
+
+        admin = AttendanceRecordAdmin(AttendanceRecord, site)
+        admin.delete_model(None, record)
+        self.assertEqual(self.counter(), {"present": 0, "late": 1, "absent": 0, "unmarked": 0})
+        admin.delete_queryset(None, AttendanceRecord.objects.all())
+        self.assertEqual(self.counter(), {"present": 0, "late": 0, "absent": 0, "unmarked": 0})
+
+    def test_missing_counter_is_recounted(self):
+        first = self.mark("2024-01-01", "present").data["id"]
+        self.mark("2024-01-02", "absent")
+        AttendanceCounter.objects.all().delete()
+
+        self.assertEqual(self.client.delete(f"/api/attendance/{first}/").status_code, 204)
+        self.assertEqual(self.counter(), {"present": 0, "late": 0, "absent": 1, "unmarked": 0})
+
+        # A decrement that would go below zero recounts the pair as well
+        AttendanceCounter.objects.update(absent=0, unmarked=3)
+        AttendanceRecord.objects.get().delete()
+        counters.track(removed=[(self.student.pk, self.course.pk, AttendanceRecord.ABSENT)])
+        self.assertEqual(counters.verify(), [])
+
+    def test_refresh_recomputes_only_given_pairs(self):
+        other = Course.objects.create(name="Art", teacher=self.teacher)
+        AttendanceRecord.objects.create(student=self.student, course=self.course, date="2024-01-01", status=AttendanceRecord.PRESENT)
+        AttendanceRecord.objects.create(student=self.student, course=other, date="2024-01-01", status=AttendanceRecord.LATE)
+        AttendanceCounter.objects.update(late=7)
+
+        counters.refresh([(self.student.pk, self.course.pk)])
+
+        self.assertEqual(self.counter(), {"present": 1, "late": 0, "absent": 0, "unmarked": 0})
+        self.assertEqual(AttendanceCounter.objects.get(course=other).late, 7)
+
+    def test_drift_is_reported_and_rebuilt(self):
+        self.mark("2024-01-01", "present")
+        self.mark("2024-01-02", "absent")
+        # Queryset updates send no signals and leave the counters behind
+        AttendanceRecord.objects.filter(date="2024-01-02").update(status=AttendanceRecord.PRESENT)
+        AttendanceCounter.objects.update(low_attendance=True)
+
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, "1 counter(s)"):
+            call_command("attendance_counters", "--verify", stdout=out)
+        self.assertIn(f"student={self.student.pk} course={self.course.pk}", out.getvalue())
+
+        call_command("attendance_counters", stdout=io.StringIO())
+        self.assertEqual(self.counter(), {"present": 2, "late": 0, "absent": 0, "unmarked": 0})
+        # The alert flag survives a rebuild
+        self.assertTrue(AttendanceCounter.objects.get().low_attendance)
+        call_command("attendance_counters", "--verify", stdout=io.StringIO())
+
+
+class BulkAttendanceTests(Fixtures, TestCase):
+    """POST /api/attendance/bulk/: per-row outcomes, status codes and derived tables."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.teacher = self.make_teacher(0)
+        self.other_teacher = self.make_teacher(1)
+        self.students = [self.make_student(n) for n in range(3)]
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(*self.students[:2])
+        self.other_course = Course.objects.create(name="Art", teacher=self.other_teacher)
+        self.other_course.students.add(self.students[0])
+        self.client = self.client_for(self.teacher.user)
+
+    def row(self, student, course=None, date="2024-01-01", status="present"):
+        return {"studentId": student.pk, "courseId": (course or self.course).pk, "date": date, "status": status}
+
+    def post(self, rows, client=None):
+        return (client or self.client).post("/api/attendance/bulk/", rows, format="json")
+
+    def test_created_updated_and_skipped(self):
+        AttendanceRecord.objects.create(student=self.students[1], course=self.course, date="2024-01-01")
+
+        response = self.post([
+            self.row(self.students[0], status="absent"),
+            self.row(self.students[1], status="late"),
+            self.row(self.students[0], status="present"),
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            {key: response.data[key] for key in ("created", "updated", "skipped", "error")},
+            {"created": 1, "updated": 1, "skipped": 1, "error": 0},
+        )
+        self.assertEqual([r["outcome"] for r in response.data["results"]], ["skipped", "updated", "created"])
+        self.assertEqual(response.data["results"][0]["supersededBy"], 2)
+        self.assertEqual(
+            dict(AttendanceRecord.objects.values_list("student_id", "status")),
+            {self.students[0].pk: AttendanceRecord.PRESENT, self.students[1].pk: AttendanceRecord.LATE},
+        )
+
+    def test_partial_failure_is_207(self):
+        response = self.post([self.row(self.students[0]), {"studentId": "x", "courseId": self.course.pk, "status": "gone"}])
+
+        self.assertEqual(response.status_code, 207)
+        errors = response.data["results"][1]["errors"]
+        self.assertEqual(set(errors), {"studentId", "date", "status"})
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_all_rows_rejected_is_400(self):
+        response = self.post([
+            self.row(self.students[2]),
+            self.row(self.students[0], course=self.other_course),
+            {"studentId": 999999, "courseId": 999999, "date": "2024-01-01", "status": "present"},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        results = response.data["results"]
+        self.assertEqual(results[0]["errors"], {"studentId": "Student is not enrolled in this course"})
+        self.assertEqual(results[1]["errors"], {"courseId": "Course is not taught by you"})
+        self.assertEqual(results[2]["errors"], {"studentId": "Student not found", "courseId": "Course not found"})
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_ids_must_be_in_range_integers(self):
+        bad = [2 ** 70, -1, True, 1.9, "²", None]
+        response = self.post([{**self.row(self.students[0]), "studentId": value} for value in bad])
+
+        self.assertEqual(response.status_code, 400)
+        for result in response.data["results"]:
+            self.assertEqual(result["errors"], {"studentId": "A valid integer is required"})
+        response = self.post([{**self.row(self.students[0]), "studentId": str(self.students[0].pk)}])
+        self.assertEqual(response.status_code, 201)
+
+    def test_admin_is_not_limited_to_own_courses(self):
+        response = self.post([self.row(self.students[0], course=self.other_course)], client=self.client_for(self.admin))
+        self.assertEqual(response.status_code, 201)
+
+    def test_rejects_non_list_and_students(self):
+        self.assertEqual(self.post({"studentId": 1}).status_code, 400)
+        self.assertEqual(self.post([self.row(self.students[0])], client=self.client_for(self.students[0].user)).status_code, 403)
+
+    def test_counters_and_rollups_follow(self):
+        self.post([self.row(self.students[0]), self.row(self.students[1], status="absent")])
+        self.post([self.row(self.students[0], status="late")])
+
+        counter = AttendanceCounter.objects.get(student=self.students[0], course=self.course)
+        self.assertEqual((counter.present, counter.late), (0, 1))
+        rollup = DailyAttendanceRollup.objects.get(course=self.course, date="2024-01-01")
+        self.assertEqual((rollup.present, rollup.late, rollup.absent), (0, 1, 1))
+        self.assertEqual(counters.verify(), [])
+        self.assertEqual(rollups.verify(), [])
+
+
+class KeysetPaginationTests(Fixtures, TestCase):
+    """Opt-in cursor pages: stable order through ties, and 404 for bad cursors."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        teacher = self.make_teacher(0)
+        students = [self.make_student(n) for n in range(3)]
+        course = Course.objects.create(name="Maths", teacher=teacher)
+        course.students.add(*students)
+        # Three records share each date, so pages split inside a tie
+        for date in ("2024-01-01", "2024-01-02"):
+            for student in students:
+                AttendanceRecord.objects.create(student=student, course=course, date=date)
+        self.client = self.client_for(self.admin)
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+            pages += 1
+        return ids, pages
+
+    def cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def test_unpaged_without_parameters(self):
+        self.assertIsInstance(self.client.get("/api/attendance/").data, list)
+
+    def test_first_page(self):
+        response = self.client.get("/api/attendance/?page_size=4")
+        expected = list(AttendanceRecord.objects.order_by("-date", "-id").values_list("id", flat=True))
+        self.assertEqual([row["id"] for row in response.data["results"]], expected[:4])
+        self.assertIn("cursor=", response.data["next"])
+
+    def test_pages_cover_ties_once_in_order(self):
+        expected = list(AttendanceRecord.objects.order_by("-date", "-id").values_list("id", flat=True))
+        self.assertEqual(self.walk("/api/attendance/?page_size=2"), (expected, 3))
+        self.assertEqual(self.walk("/api/attendance/?page_size=4"), (expected, 2))
+
+    def test_created_at_ties(self):
+        stamp = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        for n in range(5):
+            Notification.objects.create(title=f"N{n}", message="Body")
+        Notification.objects.update(created_at=stamp)
+
+        ids, _ = self.walk("/api/notifications/?page_size=2")
+        self.assertEqual(ids, sorted(Notification.objects.values_list("id", flat=True), reverse=True))
+
+    def test_tampered_cursor_is_404(self):
+        for cursor in (
+            "not-base64!",
+            self.cursor({"date": "2024-01-01"}),
+            self.cursor(["2024-01-01"]),
+            self.cursor(["x", "y"]),
+            self.cursor(["2024-01-01", None]),
+            self.cursor(["2024-01-01", [1]]),
+            self.cursor(["2024-01-01", 10 ** 30]),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/api/attendance/?cursor={cursor}")
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data["detail"], "Invalid cursor")
+
+
+class AttendanceExportTests(Fixtures, TestCase):
+    """GET /api/attendance/export/ streams CSV or NDJSON within the caller's scope."""
+
+    url = "/api/attendance/export/"
+
+    def setUp(self):
+        self.teacher = self.make_teacher(0)
+        self.other_teacher = self.make_teacher(1)
+        self.students = [self.make_student(n) for n in range(2)]
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(*self.students)
+        other_course = Course.objects.create(name="Art", teacher=self.other_teacher)
+        other_course.students.add(self.students[0])
+        AttendanceRecord.objects.create(student=self.students[0], course=self.course, date="2024-01-01", status=AttendanceRecord.PRESENT)
+        AttendanceRecord.objects.create(student=self.students[1], course=self.course, date="2024-01-02", status=AttendanceRecord.ABSENT)
+        AttendanceRecord.objects.create(student=self.students[0], course=other_course, date="2024-01-01", status=AttendanceRecord.LATE)
+        self.client = self.client_for(self.teacher.user)
+
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = self.body(response).splitlines()
+        self.assertEqual(lines[0], "id,studentId,studentName,courseId,courseName,date,status")
+        self.assertEqual([line.split(",")[-1] for line in lines[1:]], ["present", "absent"])
+
+    def test_ndjson_with_filters(self):
+        response = self.client.get(self.url, {
+            "type": "ndjson", "courseId": self.course.pk, "studentId": self.students[1].pk,
+            "from": "2024-01-01", "to": "2024-01-31", "status": "absent",
+        })
+        rows = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual([(row["studentId"], row["status"]) for row in rows], [(self.students[1].pk, "absent")])
+
+    def test_student_sees_only_own_records(self):
+        body = self.body(self.client_for(self.students[1].user).get(self.url))
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_bad_parameters_are_400(self):
+        for params in (
+            {"type": "xml"},
+            {"courseId": "²"},
+            {"courseId": "-1"},
+            {"studentId": "9" * 30},
+            {"from": "2024-13-01"},
+            {"status": "gone"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class ImportProfilesTests(Fixtures, TestCase):
+    """CSV onboarding through POST /api/<role>s/import/ and the import_users command."""
+
+    def setUp(self):
+        self.admin = self.make_admin()
+        self.make_student(0)
+        self.client = self.client_for(self.admin)
+
+    def upload(self, text, url="/api/students/import/", encoding="utf-8", **data):
+        upload = SimpleUploadedFile("people.csv", text.encode(encoding), content_type="text/csv")
+        return self.client.post(url, {"file": upload, **data}, format="multipart")
+
+    def test_row_outcomes(self):
+        response = self.upload(
+            "name,dept,email\n"
+            "Ada,CS,ada@example.com\n"
+            "Bad,CS,not-an-email\n"
+            "Ada again,CS,ada@EXAMPLE.com\n"
+            "Taken,CS,student0@example.com\n"
+            "Nodept,,nodept@example.com\n"
+            "Long,CS,long@example.com,extra\n",
+            password_mode="unusable",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 5))
+        results = response.data["results"]
+        self.assertEqual(results[0]["outcome"], "created")
+        self.assertEqual([r["errors"] for r in results[1:]], [
+            {"email": "Enter a valid email address"},
+            {"email": "Duplicate of line 2"},
+            {"email": "User with this email already exists"},
+            {"dept": "This field is required"},
+            {"non_field_errors": "Too many fields"},
+        ])
+        self.assertEqual(results[-1]["line"], 7)
+        ada = Student.objects.get(pk=results[0]["id"])
+        self.assertEqual((ada.name, ada.user.role), ("Ada", "student"))
+        self.assertFalse(ada.user.has_usable_password())
+
+    def test_nothing_created_is_400(self):
+        response = self.upload("name,email\nNodept,nodept@example.com\n", url="/api/teachers/import/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["results"][0]["errors"], {"dept": "This field is required"})
+
+    def test_bad_upload(self):
+        self.assertEqual(self.upload("name,dept,email\nZoë,CS,zoe@example.com\n", encoding="latin-1").data,
+                         {"detail": "CSV file must be UTF-8 encoded"})
+        self.assertEqual(self.client.post("/api/students/import/", {}, format="multipart").status_code, 400)
+        self.assertEqual(self.upload("name,dept,email\n", password_mode="plain").status_code, 400)
+        self.assertFalse(User.objects.filter(email="zoe@example.com").exists())
+
+    def test_request_hashes_without_a_process_pool(self):
+        rows = "".join(f"P{n},CS,p{n}@example.com\n" for n in range(bulk.PARALLEL_HASH_THRESHOLD + 1))
+        with mock.patch.object(bulk, "make_password", return_value="hashed"), \
+                mock.patch.object(bulk, "ProcessPoolExecutor") as pool:
+            response = self.upload("name,dept,email\n" + rows)
+
+        self.assertEqual(response.data["created"], bulk.PARALLEL_HASH_THRESHOLD + 1)
+        pool.assert_not_called()
+
+    def test_command(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "teachers.csv"
+        path.write_text("name,dept,email\nGrace,CS,grace@example.com\nBad,CS,nope\n", encoding="utf-8")
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_users", str(path), "--role", "teacher", "--password-mode", "unusable", stdout=out, stderr=err)
+
+        self.assertIn("Created 1 teacher(s), 1 failed", out.getvalue())
+        self.assertIn("line 3 (nope)", err.getvalue())
+        self.assertTrue(Teacher.objects.filter(user__email="grace@example.com").exists())
+        with self.assertRaises(CommandError):
+            call_command("import_users", str(path) + ".missing", "--role", "teacher", stdout=io.StringIO())
+
+
+class ClaimsAuthenticationTests(Fixtures, TestCase):
+    """Requests authenticate from token claims; refresh is where account changes bite."""
+
+    def setUp(self):
+        self.student = self.make_student(0)
+        self.user = self.student.user
+
+    def refresh(self, token):
+        return self.client.post("/api/token/refresh/", {"refresh": str(token)})
+
+    def test_claims_need_no_queries(self):
+        token = RoleRefreshToken.for_user(self.user).access_token
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        with self.assertNumQueries(0):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+            self.assertEqual((user.role, user.student_id, user.teacher_id), ("student", self.student.pk, None))
+
+    def test_token_without_claims_loads_the_user(self):
+        token = RefreshToken.for_user(self.user).access_token
+        request = AsyncRequestFactory().get("/", headers={"Authorization": f"Bearer {token}"})
+
+        user = async_to_sync(ClaimsJWTAuthentication().aauthenticate)(request)
+
+        self.assertIsInstance(user, User)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.role, user.student_id, user.teacher_id), ("student", self.student.pk, None))
+
+    def test_refresh_rotates_and_blacklists(self):
+        token = RoleRefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data["refresh"], str(token))
+
+        # Reusing the rotated-out token is refused
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(self.refresh(response.data["refresh"]).status_code, 200)
+
+    def test_refresh_fails_after_role_change(self):
+        token = RoleRefreshToken.for_user(self.user)
+        self.user.role = "teacher"
+        self.user.save()
+
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["code"], "account_changed")
+
+    def test_refresh_fails_after_deletion(self):
+        token = RoleRefreshToken.for_user(self.user)
+        self.user.delete()
+
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["code"], "no_active_account")
+
+
+class AttendanceStatusTests(Fixtures, TestCase):
+    """The API speaks status names while the table stores small integer codes."""
+
+    def setUp(self):
+        self.teacher = self.make_teacher(0)
+        self.student = self.make_student(0)
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.client = self.client_for(self.teacher.user)
+
+    def test_names_round_trip(self):
+        for date, name in (("2024-01-01", "present"), ("2024-01-02", "late"), ("2024-01-03", "absent")):
+            response = self.client.post("/api/attendance/", {
+                "studentId": self.student.pk, "courseId": self.course.pk, "date": date, "status": name,
+            }, format="json")
+            self.assertEqual(response.data["status"], name)
+        record = AttendanceRecord.objects.get(date="2024-01-02")
+        self.assertEqual(record.status, AttendanceRecord.LATE)
+
+        response = self.client.patch(f"/api/attendance/{record.pk}/", {"status": "unmarked"}, format="json")
+        self.assertEqual(response.data["status"], "unmarked")
+        record.refresh_from_db()
+        self.assertEqual(record.status, AttendanceRecord.UNMARKED)
+
+        self.assertEqual(
+            {row["date"]: row["status"] for row in self.client.get("/api/attendance/").data},
+            {"2024-01-01": "present", "2024-01-02": "unmarked", "2024-01-03": "absent"},
+        )
+
+    def test_filter_by_name(self):
+        AttendanceRecord.objects.create(student=self.student, course=self.course, date="2024-01-01", status=AttendanceRecord.LATE)
+        AttendanceRecord.objects.create(student=self.student, course=self.course, date="2024-01-02", status=AttendanceRecord.PRESENT)
+
+        response = self.client.get("/api/attendance/export/?type=ndjson&status=late")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row["date"], row["status"]) for row in rows], [("2024-01-01", "late")])
+
+    def test_unknown_name_is_rejected(self):
+        response = self.client.post("/api/attendance/", {
+            "studentId": self.student.pk, "courseId": self.course.pk, "date": "2024-01-01", "status": "PRESENT",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+
+
+class AttendanceStatusMigrationTests(TransactionTestCase):
+    """Migration 0004 turns status names into codes and back, on a database of its own."""
+
+    before = ("management", "0003_attendance_notification_indexes")
+    after = ("management", "0004_integer_attendance_status")
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings["legacy"] = {
+            **connections.settings["default"],
+            "NAME": os.path.join(cls.directory.name, "legacy.sqlite3"),
+        }
+        # Set here rather than on the class, so the test runner leaves the alias alone
+        cls.databases = {"legacy"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["legacy"].close()
+        del connections.settings["legacy"]
+        if hasattr(connections._connections, "legacy"):
+            delattr(connections._connections, "legacy")
+        cls.directory.cleanup()
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connections["legacy"])
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def test_forwards_and_backwards(self):
+        apps = self.migrate(self.before)
+        User_ = apps.get_model("management", "User")
+        Teacher_ = apps.get_model("management", "Teacher")
+        Student_ = apps.get_model("management", "Student")
+        Course_ = apps.get_model("management", "Course")
+        Record = apps.get_model("management", "AttendanceRecord")
+        teacher = Teacher_.objects.using("legacy").create(
+            user=User_.objects.using("legacy").create(username="t"), name="T", dept="CS"
+        )
+        student = Student_.objects.using("legacy").create(
+            user=User_.objects.using("legacy").create(username="s"), name="S", dept="CS"
+        )
+        course = Course_.objects.using("legacy").create(name="Maths", teacher=teacher)
+        for day, name in enumerate(("present", "absent", "late", "unmarked", "excused"), start=1):
+            Record.objects.using("legacy").create(
+                student=student, course=course, date=datetime.date(2024, 1, day), status=name
+            )
+
+        Record = self.migrate(self.after).get_model("management", "AttendanceRecord")
+        self.assertEqual(
+            list(Record.objects.using("legacy").order_by("date").values_list("status", flat=True)),
+            [AttendanceRecord.PRESENT, AttendanceRecord.ABSENT, AttendanceRecord.LATE,
+             AttendanceRecord.UNMARKED, AttendanceRecord.UNMARKED],
+        )
+
+        Record = self.migrate(self.before).get_model("management", "AttendanceRecord")
+        self.assertEqual(
+            list(Record.objects.using("legacy").order_by("date").values_list("status", flat=True)),
+            ["present", "absent", "late", "unmarked", "unmarked"],
+        )
+
+
+class PackedSessionTests(Fixtures, TestCase):
+    """2-bit packed session storage, its counts, and remapping across roster versions."""
+
+    def setUp(self):
+        self.teacher = self.make_teacher(0)
+        self.students = [self.make_student(n) for n in range(4)]
+        self.course = Course.objects.create(name="Maths", teacher=self.teacher)
+        self.course.students.add(*self.students[:3])
+        self.date = datetime.date(2024, 1, 1)
+
+    def test_pack_round_trip(self):
+        codes = [AttendanceRecord.PRESENT, AttendanceRecord.ABSENT, AttendanceRecord.LATE, AttendanceRecord.UNMARKED, AttendanceRecord.LATE]
+        data = packed.pack(codes)
+
+        self.assertEqual(len(data), packed.byte_length(len(codes)))
+        self.assertEqual(len(data), 2)
+        self.assertEqual(packed.unpack(data, len(codes)), codes)
+        self.assertEqual([packed.slot(data, i) for i in range(len(codes))], codes)
+        self.assertEqual(packed.pack([]), b"")
+
+    def test_status_counts(self):
+        codes = [AttendanceRecord.PRESENT] * 3 + [AttendanceRecord.ABSENT] * 2 + [AttendanceRecord.LATE] + [AttendanceRecord.UNMARKED] * 4
+        self.assertEqual(
+            packed.status_counts(packed.pack(codes), len(codes)),
+            {"present": 3, "late": 1, "absent": 2, "unmarked": 4},
+        )
+        self.assertEqual(packed.status_counts(b"", 0), {"present": 0, "late": 0, "absent": 0, "unmarked": 0})
+
+    def test_marks_are_remapped_onto_a_new_roster(self):
+        first, second, third, newcomer = (s.pk for s in self.students)
+        session, rejected = packed.mark_session(self.course.pk, self.date, {
+            first: AttendanceRecord.PRESENT, second: AttendanceRecord.ABSENT, third: AttendanceRecord.LATE, newcomer: AttendanceRecord.PRESENT,
+        })
+        self.assertEqual(rejected, [newcomer])
+        self.assertEqual(session.roster.version, 1)
+
+        self.course.students.remove(self.students[1])
+        self.course.students.add(self.students[3])
+        session, rejected = packed.mark_session(self.course.pk, self.date, {newcomer: AttendanceRecord.ABSENT})
+
+        self.assertEqual(rejected, [])
+        self.assertEqual(session.roster.version, 2)
+        self.assertEqual(session.roster.student_ids, [first, third, newcomer])
+        self.assertEqual(
+            packed.unpack(bytes(session.statuses), 3),
+            [AttendanceRecord.PRESENT, AttendanceRecord.LATE, AttendanceRecord.ABSENT],
+        )
+        # An unchanged roster reuses its snapshot
+        self.assertEqual(packed.current_roster(self.course.pk).version, 2)
+
+    def test_api(self):
+        client = self.client_for(self.teacher.user)
+        response = client.post("/api/attendance-sessions/", {
+            "courseId": self.course.pk, "date": "2024-01-01",
+            "records": [{"studentId": self.students[0].pk, "status": "late"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["counts"], {"present": 0, "late": 1, "absent": 0, "unmarked": 2})
+
+        rows = self.client_for(self.students[0].user).get(f"/api/attendance-sessions/?courseId={self.course.pk}").data
+        self.assertEqual([(row["studentId"], row["status"]) for row in rows], [(self.students[0].pk, "late")])
+        for course_id in ("²", "x", "9" * 30):
+            self.assertEqual(client.get(f"/api/attendance-sessions/?courseId={course_id}").status_code, 400)
+
+
+class SQLiteProductionProfileTests(SimpleTestCase):
+    """DB_PROFILE=production connections come up with the tuned pragmas and queued writers."""
+
+    @classmethod
+    def setUpClass(cls):
+        # A fresh copy of the settings module, evaluated with the production profile
+        path = Path(__file__).resolve().parent.parent / "backend" / "settings.py"
+        spec = importlib.util.spec_from_file_location("production_settings", path)
+        production = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, {"DB_PROFILE": "production"}):
+            spec.loader.exec_module(production)
+        cls.pragmas = production.SQLITE_PRAGMAS
+
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings["production"] = {
+            **connections.settings["default"],
+            **production.DATABASES["default"],
+            "NAME": os.path.join(cls.directory.name, "production.sqlite3"),
+        }
+        # Set here rather than on the class, so the test runner leaves the alias alone
+        cls.databases = {"production"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["production"].close()
+        del connections.settings["production"]
+        if hasattr(connections._connections, "production"):
+            delattr(connections._connections, "production")
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.connection = connections["production"]
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        self.assertEqual(self.connection.vendor, "sqlite")
+        self.assertIsInstance(self.connection, sqlite_base.DatabaseWrapper)
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("busy_timeout"), self.pragmas["busy_timeout"])
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("cache_size"), self.pragmas["cache_size"])
+        self.assertEqual(self.pragma("temp_store"), 2)  # MEMORY
+        self.assertEqual(self.connection.settings_dict["CONN_MAX_AGE"], 600)
+
+    def test_writers_queue_on_the_process_lock(self):
+        self.assertEqual(self.connection.transaction_mode, "IMMEDIATE")
+        with transaction.atomic(using="production"):
+            self.pragma("user_version")
+            self.assertTrue(sqlite_base._write_lock.locked())
+        self.assertFalse(sqlite_base._write_lock.locked())
@@ -1,17 +1,30 @@
+import time
+from datetime import timedelta
 from urllib import request
 from django.contrib.auth import get_user_model
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Notification,Feedback, Student, Teacher, Course, AttendanceRecord
-from .serializers import ResetPasswordSerializer, StudentSerializer, TeacherSerializer, CourseSerializer, AttendanceRecordSerializer, LoginSerializer, FeedbackSerializer, NotificationSerializer
+from rest_framework_simplejwt.views import TokenRefreshView
+from .authentication import ClaimsTokenRefreshSerializer, RoleRefreshToken
+from .models import Notification,Feedback, Student, Teacher, Course, AttendanceRecord, AttendanceCounter, AttendanceSession, ArchivedAttendanceRecord, ArchivedAttendanceTotal, DailyAttendanceRollup, PurgeJob, Term
+from . import bulk, counters, feed, metrics, packed, profiling, pubsub, purge, response_cache, rollups
+from .response_cache import CachedResponseMixin
+from .exports import ATTENDANCE_COLUMNS, EXPORT_FORMATS, stream_export
+from .pagination import AttendancePagination, NewestFirstPagination
+from .parsing import query_int
+from .serializers import ResetPasswordSerializer, StudentSerializer, TeacherSerializer, CourseSerializer, AttendanceRecordSerializer, LoginSerializer, FeedbackSerializer, NotificationSerializer, PurgeJobSerializer, TermSerializer
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.exceptions import TokenError
 from django.db import transaction
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.db.models import Q
+from django.utils.cache import patch_vary_headers
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
 
 
 User = get_user_model()
@@ -19,11 +32,15 @@ class LoginView(APIView):
     permission_classes : list[type] = []
     
     def post(self, request):
+        began = time.perf_counter()
         serializer = LoginSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        valid = serializer.is_valid()
+        metrics.LOGINS.labels("success" if valid else "failure").observe(time.perf_counter() - began)
+        if not valid:
+            raise ValidationError(serializer.errors)
 
         user = serializer.validated_data
-        refresh = RefreshToken.for_user(user)
+        refresh = RoleRefreshToken.for_user(user)
 
         return Response({
             "access": str(refresh.access_token),
@@ -31,6 +48,10 @@ class LoginView(APIView):
             "role": user.role,
             "username": user.username
         })
+
+class ClaimsTokenRefreshView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer
+
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -76,21 +97,80 @@ class ResetPasswordView(APIView):
             status=status.HTTP_200_OK
         )
 
-class StudentViewSet(viewsets.ModelViewSet):
+def import_profiles_response(request, role):
+    """Shared body of the students/teachers CSV import actions."""
+    if request.user.role != "admin":
+        return Response({"detail": "Not allowed"}, status=403)
+
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response(
+            {"detail": "Upload a CSV file in the 'file' field"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    password_mode = request.data.get("password_mode", "default")
+    if password_mode not in bulk.PASSWORD_MODES:
+        return Response(
+            {"detail": f"password_mode must be one of {', '.join(bulk.PASSWORD_MODES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        results = bulk.import_profiles(bulk.read_csv(upload.file), role, password_mode=password_mode)
+    except UnicodeDecodeError:
+        return Response(
+            {"detail": "CSV file must be UTF-8 encoded"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    created = sum(1 for r in results if r["outcome"] == "created")
+    return Response(
+        {"created": created, "failed": len(results) - created, "results": results},
+        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+    )
+
+def purge_response(request, target, message=None):
+    """
+    Shared body of the "delete all" actions.
+
+    Deletes run through purge in chunks. With ``?background=true`` the purge
+    is queued instead and 202 comes back with the job to poll.
+    """
+    if request.user.role != "admin":
+        return Response({"detail": "Not allowed"}, status=403)
+
+    if request.query_params.get("background") in ("1", "true"):
+        job = purge.start_job(target)
+        return Response(PurgeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    purge.purge(target)
+    return Response(
+        {"message": message} if message else None,
+        status=status.HTTP_204_NO_CONTENT
+    )
+
+class StudentViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = StudentSerializer
     queryset = Student.objects.all()
+    cache_resource = "students"
+
+    def cache_scope(self, user):
+        if user.role == "student":
+            return f"student:{user.student_id}"
+        return "all"
 
     def get_queryset(self):
         user = self.request.user
         
 
         if user.role in ["admin", "teacher"]:
-            return Student.objects.all()
+            return StudentSerializer.setup_eager_loading(Student.objects.all())
 
         if user.role == "student":
             try:
-                return Student.objects.filter(user=user)
+                return StudentSerializer.setup_eager_loading(Student.objects.filter(pk=user.student_id))
             except Student.DoesNotExist:
                 return Student.objects.none()
 
@@ -101,31 +181,33 @@ class StudentViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["delete"], url_path="all")
     def delete_all(self, request):
-        if request.user.role != "admin":
-            return Response({"detail": "Not allowed"}, status=403)
+        # ✅ Deletes the student Users, their Student profiles and everything below
+        return purge_response(request, "students", "All students deleted successfully")
 
-        with transaction.atomic():
-            users = User.objects.filter(role="student")
-            users.delete()   # ✅ THIS deletes both User + Student
-
-        return Response(
-            {"message": "All students deleted successfully"},
-            status=status.HTTP_204_NO_CONTENT
-    )
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_csv(self, request):
+        return import_profiles_response(request, "student")
 
     @action(detail=False, methods=["get"], url_path="my-courses")
     def my_courses(self, request):
         if request.user.role != "student":
             return Response({"detail": "Not allowed"}, status=403)
 
-        student = Student.objects.get(user=request.user)
-        serializer = CourseSerializer(student.courses.all(), many=True)
+        courses = CourseSerializer.setup_eager_loading(
+            Course.objects.filter(students=request.user.student_id)
+        )
+        serializer = CourseSerializer(courses, many=True)
         return Response(serializer.data)
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = Teacher.objects.all()
+    queryset = TeacherSerializer.setup_eager_loading(Teacher.objects.all())
     serializer_class = TeacherSerializer
+    cache_resource = "teachers"
+
+    def cache_scope(self, user):
+        # Every role sees the same teachers
+        return "all"
 
     @action(detail=False, methods=["get"], url_path="me")
     def me(self, request):
@@ -136,7 +218,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            teacher = Teacher.objects.get(user=request.user)
+            teacher = Teacher.objects.select_related("user").get(pk=request.user.teacher_id)
         except Teacher.DoesNotExist:
             return Response(
                 {"detail": "Teacher profile not found"},
@@ -146,42 +228,46 @@ class TeacherViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(teacher)
         return Response(serializer.data)
     
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_csv(self, request):
+        return import_profiles_response(request, "teacher")
+
     @action(detail=False,methods=['delete'],url_path='all')
     def delete_all(self,request):
-        if request.user.role!='admin':
-            return Response({"detail": "Not allowed"}, status=403)
-
-        with transaction.atomic():
-            users = User.objects.filter(role="teacher")
-            users.delete() 
-
-        return Response(
-            {"message": "All teachers deleted successfully"},
-            status=status.HTTP_204_NO_CONTENT)
+        return purge_response(request, "teachers", "All teachers deleted successfully")
     
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = CourseSerializer
     queryset = Course.objects.all()
+    cache_resource = "courses"
+
+    def cache_scope(self, user):
+        if user.role == "teacher":
+            return f"teacher:{user.teacher_id}"
+        if user.role == "student":
+            return f"student:{user.student_id}"
+        return "all" if user.role == "admin" else "none"
 
     def get_queryset(self):
+        return CourseSerializer.setup_eager_loading(self.get_scoped_queryset())
+
+    def get_scoped_queryset(self):
         user = self.request.user
 
         if user.role == "admin":
             return Course.objects.all()
 
         if user.role == "teacher":
-            teacher = Teacher.objects.filter(user=user).first()
-            if not teacher:
+            if not user.teacher_id:
                 return Course.objects.none()
-            return Course.objects.filter(teacher=teacher)
+            return Course.objects.filter(teacher_id=user.teacher_id)
 
         if user.role == "student":
-            student = Student.objects.filter(user=user).first()
-            if not student:
+            if not user.student_id:
                 return Course.objects.none()
-            return Course.objects.filter(students=student)
+            return Course.objects.filter(students=user.student_id)
 
         return Course.objects.none()
 
@@ -232,33 +318,54 @@ class CourseViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
-    @action(detail=False, methods=["delete"], url_path="all")
-    def delete_all(self, request):
-        if request.user.role != "admin":
+    @action(detail=True, methods=["put", "patch"], url_path="roster")
+    def roster(self, request, pk=None):
+        """
+        Set the whole roster with PUT ``{"studentIds": [...]}``, or change
+        it with PATCH ``{"add": [...], "remove": [...]}``.
+        """
+        if request.user.role not in ["admin", "teacher"]:
             return Response({"detail": "Not allowed"}, status=403)
 
-        Course.objects.all().delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        course = self.get_object()
+        data = request.data if isinstance(request.data, dict) else {}
+        try:
+            if request.method == "PUT":
+                if "studentIds" not in data:
+                    raise bulk.RosterError({"studentIds": "This field is required"})
+                added, removed = bulk.sync_roster(course, student_ids=data["studentIds"])
+            else:
+                added, removed = bulk.sync_roster(course, add=data.get("add", []), remove=data.get("remove", []))
+        except bulk.RosterError as exc:
+            return Response(exc.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"added": added, "removed": removed})
+
+    @action(detail=False, methods=["delete"], url_path="all")
+    def delete_all(self, request):
+        return purge_response(request, "courses")
 
 
 class AttendanceRecordViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = AttendanceRecord.objects.all()
     serializer_class = AttendanceRecordSerializer
+    pagination_class = AttendancePagination
 
     def get_queryset(self):
+        return AttendanceRecordSerializer.setup_eager_loading(self.get_scoped_queryset())
+
+    def get_scoped_queryset(self):
         user = self.request.user
 
         if user.role == "admin":
             return AttendanceRecord.objects.all()
 
         if user.role == "teacher":
-            teacher = Teacher.objects.get(user=user)
-            return AttendanceRecord.objects.filter(course__teacher=teacher)
+            return AttendanceRecord.objects.filter(course__teacher_id=user.teacher_id)
 
         if user.role == "student":
-            student = Student.objects.get(user=user)
-            return AttendanceRecord.objects.filter(student=student)
+            return AttendanceRecord.objects.filter(student_id=user.student_id)
 
         return AttendanceRecord.objects.none()
 
@@ -276,19 +383,62 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
 
         return super().create(request, *args, **kwargs)
 
+    # post_save updates the counters and rollups, inside these transactions
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            counters.track(removed=[(instance.student_id, instance.course_id, instance.status)])
+            rollups.track(removed=[(instance.course_id, instance.date, instance.status)])
+
     @action(detail=False, methods=["post"], url_path="bulk")
     def bulk_create(self, request):
-        serializer = self.get_serializer(data=request.data, many=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        user = request.user
+
+        if user.role not in ["admin", "teacher"]:
+            return Response({"detail": "Not allowed"}, status=403)
+
+        if not isinstance(request.data, list):
+            return Response(
+                {"detail": "Expected a list of attendance records"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        teacher_id = user.teacher_id if user.role == "teacher" else None
+
+        results = bulk.upsert_attendance(request.data, teacher_id=teacher_id)
+
+        summary = {"created": 0, "updated": 0, "skipped": 0, "error": 0}
+        for result in results:
+            summary[result["outcome"]] += 1
+
+        if summary["error"] == 0:
+            code = status.HTTP_201_CREATED
+        elif summary["created"] or summary["updated"]:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+
+        return Response({**summary, "results": results}, status=code)
     # ✅ ADMIN → DELETE ALL ATTENDANCE
     @action(detail=False, methods=["delete"], url_path="all")
     def delete_all(self, request):
         if request.user.role != "admin":
             return Response({"detail": "Not allowed"}, status=403)
 
-        AttendanceRecord.objects.all().delete()
+        with transaction.atomic():
+            AttendanceRecord.objects.all().delete()
+            ArchivedAttendanceRecord.objects.all().delete()
+            ArchivedAttendanceTotal.objects.all().delete()
+            AttendanceCounter.objects.all().delete()
+            DailyAttendanceRollup.objects.all().delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
     # ✅ TEACHER → DELETE ATTENDANCE BY COURSE
     @action(
@@ -300,15 +450,81 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
         if request.user.role != "teacher":
             return Response({"detail": "Not allowed"}, status=403)
 
-        teacher = Teacher.objects.get(user=request.user)
+        teacher_id = request.user.teacher_id
 
-        AttendanceRecord.objects.filter(
-            course__id=course_id,
-            course__teacher=teacher
-        ).delete()
+        with transaction.atomic():
+            AttendanceRecord.objects.filter(
+                course__id=course_id,
+                course__teacher_id=teacher_id
+            ).delete()
+            AttendanceCounter.objects.filter(
+                course__id=course_id,
+                course__teacher_id=teacher_id
+            ).delete()
+            for model in (ArchivedAttendanceRecord, ArchivedAttendanceTotal, DailyAttendanceRollup):
+                model.objects.filter(
+                    course__id=course_id,
+                    course__teacher_id=teacher_id
+                ).delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
     
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Stream attendance as CSV (default) or NDJSON (?type=ndjson).
+
+        Optional filters: courseId, studentId, from, to (YYYY-MM-DD), status.
+        """
+        params = request.query_params
+        export_format = params.get("type", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"type must be one of {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        qs = self.get_scoped_queryset()
+
+        for param, lookup in (("courseId", "course_id"), ("studentId", "student_id")):
+            value = params.get(param)
+            if value is None:
+                continue
+            number = query_int(value)
+            if number is None:
+                return Response(
+                    {"detail": f"{param} must be an integer"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            qs = qs.filter(**{lookup: number})
+
+        for param, lookup in (("from", "date__gte"), ("to", "date__lte")):
+            value = params.get(param)
+            if value is None:
+                continue
+            try:
+                date = parse_date(value)
+            except ValueError:
+                date = None
+            if date is None:
+                return Response(
+                    {"detail": f"{param} must be a date (YYYY-MM-DD)"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            qs = qs.filter(**{lookup: date})
+
+        if params.get("status"):
+            code = AttendanceRecord.STATUS_CODES.get(params["status"])
+            if code is None:
+                return Response(
+                    {"detail": f"status must be one of {', '.join(AttendanceRecord.STATUS_CODES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            qs = qs.filter(status=code)
+
+        qs = qs.order_by("date", "id")
+        return stream_export(qs, ATTENDANCE_COLUMNS, export_format, "attendance")
+
     @action(detail=False, methods=["get"], url_path="summary")
     def summary(self, request):
         user = request.user
@@ -316,36 +532,177 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
         if user.role != "student":
             return Response({"detail": "Only students allowed"}, status=403)
 
-        student = Student.objects.get(user=user)
+        student_id = user.student_id
+        if not student_id:
+            return Response({"detail": "Student profile not found"}, status=404)
 
-        records = AttendanceRecord.objects.filter(student=student)
+        # One row per course the student has any attendance in
+        rows = {
+            row["course_id"]: row
+            for row in AttendanceCounter.objects.filter(student_id=student_id).values(
+                "course_id", *counters.COUNTER_FIELDS
+            )
+        }
+        courses = Course.objects.filter(students=student_id).values_list("id", "name")
+        return Response(counters.summarize(rows, courses))
 
-        total = records.count()
-        present = records.filter(status__in=["present", "late"]).count()
+    @action(detail=False, methods=["get"], url_path="analytics")
+    def analytics(self, request):
+        """
+        Attendance analytics for a teacher's courses (every course for admins).
 
-        overall_percentage = round((present / total) * 100, 1) if total > 0 else 0
+        Lifetime totals per course, plus per-day and per-week rates between
+        ``from`` and ``to`` (YYYY-MM-DD, default the last 30 days). With
+        ``courseId`` the figures cover that one course and include per-student
+        rates.
+        """
+        user = request.user
+        if user.role not in ["admin", "teacher"]:
+            return Response({"detail": "Not allowed"}, status=403)
 
-        subject_data = []
+        params = request.query_params
+        courses = Course.objects.all()
+        if user.role == "teacher":
+            courses = courses.filter(teacher_id=user.teacher_id)
 
-        for course in student.courses.all():
-            course_records = records.filter(course=course)
-            total_c = course_records.count()
-            present_c = course_records.filter(
-                status__in=["present", "late"]
-            ).count()
+        course_id = params.get("courseId")
+        if course_id is not None:
+            course_id = query_int(course_id)
+            if course_id is None:
+                return Response(
+                    {"detail": "courseId must be an integer"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not courses.filter(pk=course_id).exists():
+                return Response({"detail": "Course not found"}, status=404)
+            course_ids = [course_id]
+        else:
+            course_ids = list(courses.values_list("id", flat=True))
 
-            percent = round((present_c / total_c) * 100, 1) if total_c > 0 else 0
+        bounds = {}
+        for param in ("from", "to"):
+            value = params.get(param)
+            if value is None:
+                continue
+            try:
+                bounds[param] = parse_date(value)
+            except ValueError:
+                bounds[param] = None
+            if bounds[param] is None:
+                return Response(
+                    {"detail": f"{param} must be a date (YYYY-MM-DD)"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        end = bounds.get("to") or timezone.localdate()
+        start = bounds.get("from") or end - timedelta(days=rollups.DEFAULT_WINDOW_DAYS - 1)
+        if start > end:
+            return Response(
+                {"detail": "from must not be after to"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            subject_data.append({
-                "courseId": course.id,
-                "courseName": course.name,
-                "percentage": percent
-            })
+        data = {
+            "from": start,
+            "to": end,
+            "courses": rollups.course_totals(course_ids),
+            "daily": rollups.daily(course_ids, start, end),
+            "weekly": rollups.weekly(course_ids, start, end),
+        }
+        if course_id is not None:
+            data["students"] = rollups.students(course_id)
+        return Response(data)
+
+class AttendanceSessionViewSet(viewsets.ViewSet):
+    """
+    Packed, one-row-per-class-meeting attendance storage.
 
-        return Response({
-            "overall": overall_percentage,
-            "subjects": subject_data
-        })
+    Reads come back in the same per-record shape as /attendance/.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_sessions(self, request):
+        user = request.user
+        qs = AttendanceSession.objects.select_related("roster").order_by("date", "id")
+
+        if user.role == "teacher":
+            qs = qs.filter(course__teacher_id=user.teacher_id)
+        elif user.role == "student":
+            qs = qs.filter(course__students=user.student_id)
+        elif user.role != "admin":
+            qs = qs.none()
+
+        course_id = request.query_params.get("courseId")
+        if course_id:
+            number = query_int(course_id)
+            if number is None:
+                raise ValidationError({"courseId": "A valid integer is required"})
+            qs = qs.filter(course_id=number)
+        return qs
+
+    def list(self, request):
+        student_id = request.user.student_id if request.user.role == "student" else None
+        records = packed.iter_records(self.get_sessions(request), student_id=student_id)
+        return Response(list(records))
+
+    def create(self, request):
+        user = request.user
+        if user.role not in ["admin", "teacher"]:
+            return Response({"detail": "Not allowed"}, status=403)
+
+        data = request.data
+        course_id = data.get("courseId")
+        try:
+            date = parse_date(str(data.get("date", "")))
+        except ValueError:
+            date = None
+        records = data.get("records")
+
+        if not isinstance(course_id, int) or date is None or not isinstance(records, list):
+            return Response(
+                {"detail": "courseId, date (YYYY-MM-DD) and a records list are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        course = Course.objects.filter(id=course_id).values("teacher_id").first()
+        if course is None:
+            return Response({"detail": "Course not found"}, status=404)
+        if user.role == "teacher" and course["teacher_id"] != user.teacher_id:
+            return Response({"detail": "Not allowed"}, status=403)
+
+        statuses = {}
+        for record in records:
+            code = AttendanceRecord.STATUS_CODES.get(record.get("status")) if isinstance(record, dict) else None
+            student_id = record.get("studentId") if isinstance(record, dict) else None
+            if code is None or not isinstance(student_id, int):
+                return Response(
+                    {"detail": "Each record needs an integer studentId and a valid status"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            statuses[student_id] = code
+
+        session, rejected = packed.mark_session(course_id, date, statuses)
+        return Response(
+            {
+                "courseId": course_id,
+                "date": date.isoformat(),
+                "rosterVersion": session.roster.version,
+                "counts": packed.session_counts(session),
+                "notEnrolled": rejected,
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=["get"], url_path="summary")
+    def summary(self, request):
+        user = request.user
+
+        if user.role != "student":
+            return Response({"detail": "Only students allowed"}, status=403)
+
+        sessions = self.get_sessions(request)
+        per_course = packed.student_counts(sessions, user.student_id)
+        courses = Course.objects.filter(students=user.student_id).values_list("id", "name")
+        return Response(counters.summarize(per_course, courses))
 
 # This new ViewSet is needed to handle the "deleteAllUsers" call from the frontend
 class UserViewSet(viewsets.ViewSet):
@@ -360,22 +717,95 @@ class UserViewSet(viewsets.ViewSet):
         """
         Deletes all students and teachers, as requested by the frontend.
         """
-        Student.objects.all().delete()
-        Teacher.objects.all().delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return purge_response(request, "profiles")
+
+
+class ResponseCacheStatsView(APIView):
+    """Hit/miss counts of the course/student/teacher response cache, for admins."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != "admin":
+            return Response({"detail": "Not allowed"}, status=403)
+        return Response(response_cache.stats())
+
+
+class PurgeJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress of background "delete all" jobs, for admins."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = PurgeJobSerializer
+    pagination_class = NewestFirstPagination
+
+    def get_queryset(self):
+        if self.request.user.role != "admin":
+            raise PermissionDenied("Not allowed")
+        return PurgeJob.objects.all()
+
+
+class ProfileViewSet(viewsets.ViewSet):
+    """
+    Stored request profiles (management.profiling), for admins. The detail
+    is the ``top`` hottest functions (default 20), sorted by ``sort``:
+    cumulative (default), tottime or calls.
+    """
+    permission_classes = [IsAuthenticated]
+    lookup_value_regex = r"[\w.-]+"
+
+    def check_permissions(self, request):
+        super().check_permissions(request)
+        if request.user.role != "admin":
+            raise PermissionDenied("Not allowed")
+
+    def list(self, request):
+        return Response(profiling.dumps())
+
+    def retrieve(self, request, pk=None):
+        path = profiling.path_of(pk)
+        if path is None:
+            return Response({"detail": "Not found."}, status=404)
+
+        params = request.query_params
+        sort = params.get("sort", "cumulative")
+        if sort not in profiling.SORT_KEYS:
+            raise ValidationError({"sort": f"Must be one of {', '.join(profiling.SORT_KEYS)}"})
+        top = query_int(params.get("top", "20"))
+        if not top:
+            raise ValidationError({"top": "A positive integer is required"})
+
+        return Response({"name": pk, **profiling.summary(path, top=top, sort=sort)})
+
+
+class TermViewSet(viewsets.ModelViewSet):
+    """Academic terms; everyone can read them, admins manage them."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = TermSerializer
+    queryset = Term.objects.all()
+
+    def check_permissions(self, request):
+        super().check_permissions(request)
+        if self.action not in ("list", "retrieve") and request.user.role != "admin":
+            raise PermissionDenied("Not allowed")
+
+    def perform_destroy(self, instance):
+        if instance.status != Term.OPEN:
+            raise ValidationError("An archived term cannot be deleted")
+        instance.delete()
 
 class FeedbackViewSet(viewsets.ModelViewSet):
     serializer_class = FeedbackSerializer
     queryset = Feedback.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = NewestFirstPagination
 
     def get_queryset(self):
         user = self.request.user
         if user.role == "teacher":
-            return Feedback.objects.filter(teacher__user=user).select_related("student", "course")
-        if user.role == "student":
-            return Feedback.objects.filter(student__user=user).select_related("course")
-        return Feedback.objects.none()
+            qs = Feedback.objects.filter(teacher_id=user.teacher_id)
+        elif user.role == "student":
+            qs = Feedback.objects.filter(student_id=user.student_id)
+        else:
+            qs = Feedback.objects.none()
+        return FeedbackSerializer.setup_eager_loading(qs)
 
     def perform_create(self, serializer):
         # student = self.request.user.student
@@ -383,8 +813,12 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         # course = student.courses.first()   # or logic based on context
         # teacher = course.teacher
 
+        student_id = self.request.user.student_id
+        if not student_id:
+            raise PermissionDenied("Only students can send feedback")
+
         serializer.save(
-            student=self.request.user.student,
+            student_id=student_id,
             teacher=serializer.validated_data.get("course").teacher
         )
     
@@ -392,12 +826,19 @@ class FeedbackViewSet(viewsets.ModelViewSet):
     def my_feedback(self, request):
         user = request.user
         if user.role == "student":
-            qs = Feedback.objects.filter(student__user=user)
+            qs = Feedback.objects.filter(student_id=user.student_id)
         elif user.role == "teacher":
-            qs = Feedback.objects.filter(teacher__user=user)
+            qs = Feedback.objects.filter(teacher_id=user.teacher_id)
         else:
             qs = Feedback.objects.none()
 
+        qs = FeedbackSerializer.setup_eager_loading(qs)
+
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
     
@@ -411,7 +852,7 @@ class FeedbackViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        qs = Feedback.objects.filter(course__teacher__user=user)
+        qs = Feedback.objects.filter(course__teacher_id=user.teacher_id)
         count = qs.count()
         qs.delete()
 
@@ -424,6 +865,7 @@ from django.db import models
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     queryset = Notification.objects.all()
+    pagination_class = NewestFirstPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -432,8 +874,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if user.role == "student":
             return Notification.objects.filter(
                 Q(role="all") |
-                Q(role=request.user.role) |
-                Q(recipient=request.user)
+                Q(role=user.role) |
+                Q(recipient_id=user.id)
             ).order_by("-created_at")
 
         # 👨‍🏫 TEACHER
@@ -441,7 +883,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
             return Notification.objects.filter(
                 models.Q(role="teacher") |
                 models.Q(role="all") |
-                models.Q(recipient=user)
+                models.Q(recipient_id=user.id)
             ).order_by("-created_at")
 
         # 👑 ADMIN
@@ -449,17 +891,57 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
     
     def perform_create(self, serializer):
-        serializer.save(recipient=None)  # ✅ broadcast notification
-        
+        notification = serializer.save(recipient=None)  # ✅ broadcast notification
+        feed.bump([notification])
+        pubsub.publish_notification(notification)
+
+    def perform_update(self, serializer):
+        before = Notification(role=serializer.instance.role, recipient_id=serializer.instance.recipient_id)
+        notification = serializer.save()
+        feed.bump([before, notification])
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        feed.bump([instance])
+
     @action(detail=False, methods=["get"], url_path="my")
     def my_notifications(self, request):
-        user = request.user
+        """
+        The caller's feed, newest first.
 
-        qs = Notification.objects.filter(
-            Q(role="all") |
-            Q(role=user.role) |
-            Q(recipient=user)
-        ).order_by("-created_at")
+        ``?since=<id or created_at>`` returns only newer notifications. The
+        response carries an ETag; sending it back in If-None-Match gets a
+        304 without the feed being queried while nothing has changed.
+        """
+        user = request.user
 
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        # Read the versions before the feed, so a concurrent write can only
+        # make the ETag stale, never the body
+        etag = feed.etag_for(user, request)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            qs = feed.notifications_for(user)
+
+            since = request.query_params.get("since")
+            if since:
+                filters = feed.parse_since(since)
+                if filters is None:
+                    return Response(
+                        {"detail": "since must be a notification id or an ISO datetime"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                qs = qs.filter(**filters)
+
+            page = self.paginate_queryset(qs)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                response = self.get_paginated_response(serializer.data)
+            else:
+                serializer = self.get_serializer(qs, many=True)
+                response = Response(serializer.data)
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ["Authorization"])
+        return response
\ No newline at end of file